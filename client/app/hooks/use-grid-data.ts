@@ -1,36 +1,17 @@
 import { kodyZadaniowe } from '~/mocks/kody-zadaniowe';
-import { useDzialy } from '../queries';
-import { useRozdzialy } from '../queries';
-import { useParagrafy } from '../queries';
-import { useGrupyWydatkow } from '../queries';
-import { useCzesciBudzetowe } from '../queries';
-import { useZrodlaFinansowania } from '../queries';
+import { useSlowniki } from '../queries';
 
 export const useGridData = () => {
-  const { data: dzialy, isLoading: isLoadingDzialy } = useDzialy();
-  const { data: rozdzialy, isLoading: isLoadingRozdzialy } = useRozdzialy();
-  const { data: paragrafy, isLoading: isLoadingParagrafy } = useParagrafy();
-  const { data: grupyWydatkow, isLoading: isLoadingGrupyWydatkow } =
-    useGrupyWydatkow();
-  const { data: czesciBudzetowe, isLoading: isLoadingCzesciBudzetowe } =
-    useCzesciBudzetowe();
-  const { data: zrodlaFinansowania, isLoading: isLoadingZrodlaFinansowania } =
-    useZrodlaFinansowania();
+  const { data: slowniki, isLoading } = useSlowniki();
 
   return {
-    dzialy,
-    rozdzialy,
-    paragrafy,
-    grupyWydatkow,
-    czesciBudzetowe,
-    zrodlaFinansowania,
+    dzialy: slowniki?.dzialy,
+    rozdzialy: slowniki?.rozdzialy,
+    paragrafy: slowniki?.paragrafy,
+    grupyWydatkow: slowniki?.grupy_wydatkow,
+    czesciBudzetowe: slowniki?.czesci_budzetowe,
+    zrodlaFinansowania: slowniki?.zrodla_finansowania,
     kodyZadaniowe,
-    isLoading:
-      isLoadingDzialy ||
-      isLoadingRozdzialy ||
-      isLoadingParagrafy ||
-      isLoadingGrupyWydatkow ||
-      isLoadingCzesciBudzetowe ||
-      isLoadingZrodlaFinansowania,
+    isLoading,
   };
 };
@@ -8,6 +8,8 @@ export { useParagrafy } from './paragrafy';
 export { useGrupyWydatkow } from './grupy-wydatkow';
 export { useCzesciBudzetowe } from './czesci-budzetowe';
 export { useZrodlaFinansowania } from './zrodla-finansowania';
+export { useSlowniki } from './slowniki';
+export type { Slowniki } from './slowniki';
 
 // Export planowanie budzetu functions
 export { createPlanowanieBudzetu, getPlanowanieBudzetu, updatePlanowanieBudzetuCell } from './planowanie-budzetu';
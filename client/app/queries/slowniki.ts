@@ -0,0 +1,32 @@
+import { useQuery } from '@tanstack/react-query';
+import { apiClient } from './client';
+import type {
+  CzescBudzetowa,
+  Dzial,
+  GrupaWydatkow,
+  Paragraf,
+  Rozdzial,
+  ZrodloFinansowania,
+} from '~/schema';
+
+export interface Slowniki {
+  dzialy: Dzial[];
+  rozdzialy: Rozdzial[];
+  paragrafy: Paragraf[];
+  grupy_wydatkow: GrupaWydatkow[];
+  czesci_budzetowe: CzescBudzetowa[];
+  zrodla_finansowania: ZrodloFinansowania[];
+}
+
+// All dictionaries in one request; the server redirects to a compressed bundle
+// that the browser caches under its content hash
+export const useSlowniki = () => {
+  return useQuery({
+    queryKey: ['slowniki'],
+    queryFn: async (): Promise<Slowniki> => {
+      const response = await apiClient.get('/slowniki');
+      return response.data;
+    },
+    staleTime: 5 * 60 * 1000,
+  });
+};
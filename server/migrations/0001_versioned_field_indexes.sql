@@ -0,0 +1,18 @@
+-- Covering lookup indexes for the versioned field tables.
+-- Serve get_latest_version_for_field, has_field_history and check_field_conflict
+-- without sequential scans. Built CONCURRENTLY so writes are not blocked.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_versioned_string_fields_lookup
+    ON versioned_string_fields (entity_type, entity_id, field_name, timestamp DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_versioned_numeric_fields_lookup
+    ON versioned_numeric_fields (entity_type, entity_id, field_name, timestamp DESC, id DESC)
+    INCLUDE (value);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_versioned_foreign_key_fields_lookup
+    ON versioned_foreign_key_fields (entity_type, entity_id, field_name, timestamp DESC, id DESC)
+    INCLUDE (value_string, value_int);
+
+ANALYZE versioned_string_fields;
+ANALYZE versioned_numeric_fields;
+ANALYZE versioned_foreign_key_fields;
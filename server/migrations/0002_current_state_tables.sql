@@ -0,0 +1,28 @@
+-- Current state projection tables (see src/current_state.py) for databases created
+-- before they existed. Fill them afterwards with: python -m src.current_state
+
+CREATE TABLE IF NOT EXISTS planowanie_budzetu_current (
+    planowanie_budzetu_id INTEGER PRIMARY KEY REFERENCES planowanie_budzetu (id),
+    nazwa_projektu VARCHAR(2000),
+    nazwa_zadania VARCHAR(2000),
+    szczegolowe_uzasadnienie_realizacji VARCHAR(2000),
+    budzet VARCHAR(2000),
+    czesc_budzetowa_kod VARCHAR(10),
+    dzial_kod VARCHAR(10),
+    rozdzial_kod VARCHAR(10),
+    paragraf_kod VARCHAR(10),
+    zrodlo_finansowania_kod VARCHAR(10),
+    grupa_wydatkow_id INTEGER,
+    komorka_organizacyjna_id INTEGER,
+    user_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS rok_budzetowy_current (
+    rok_budzetowy_id INTEGER PRIMARY KEY REFERENCES rok_budzetowy (id),
+    "limit" NUMERIC(15, 2),
+    potrzeba NUMERIC(15, 2)
+);
+
+-- Lets list endpoints read only the rows of the user's komorka_organizacyjna, in id order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_planowanie_budzetu_current_komorka
+    ON planowanie_budzetu_current (komorka_organizacyjna_id, planowanie_budzetu_id);
@@ -0,0 +1,4 @@
+-- Rok budzetowy lists and embedded years are joined on planowanie_budzetu_id
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rok_budzetowy_planowanie_budzetu_id
+    ON rok_budzetowy (planowanie_budzetu_id);
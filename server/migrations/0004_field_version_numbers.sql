@@ -0,0 +1,108 @@
+-- Per-cell version numbers (1, 2, 3... per entity_type, entity_id, field_name) used for
+-- optimistic concurrency, and their current values in the current state projections.
+
+ALTER TABLE versioned_string_fields ADD COLUMN IF NOT EXISTS version_number INTEGER;
+
+ALTER TABLE versioned_numeric_fields ADD COLUMN IF NOT EXISTS version_number INTEGER;
+
+ALTER TABLE versioned_foreign_key_fields ADD COLUMN IF NOT EXISTS version_number INTEGER;
+
+-- Existing versions are numbered in the order they were written
+
+UPDATE versioned_string_fields v
+SET version_number = numbered.version_number
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY entity_type, entity_id, field_name ORDER BY timestamp, id) AS version_number
+    FROM versioned_string_fields
+) numbered
+WHERE v.id = numbered.id AND v.version_number IS NULL;
+
+UPDATE versioned_numeric_fields v
+SET version_number = numbered.version_number
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY entity_type, entity_id, field_name ORDER BY timestamp, id) AS version_number
+    FROM versioned_numeric_fields
+) numbered
+WHERE v.id = numbered.id AND v.version_number IS NULL;
+
+UPDATE versioned_foreign_key_fields v
+SET version_number = numbered.version_number
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY entity_type, entity_id, field_name ORDER BY timestamp, id) AS version_number
+    FROM versioned_foreign_key_fields
+) numbered
+WHERE v.id = numbered.id AND v.version_number IS NULL;
+
+-- Tables created from the models (src.load_fixtures) already have the constraints
+
+DO $$
+BEGIN
+    ALTER TABLE versioned_string_fields ALTER COLUMN version_number SET NOT NULL;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_versioned_string_fields_version') THEN
+        ALTER TABLE versioned_string_fields
+            ADD CONSTRAINT uq_versioned_string_fields_version UNIQUE (entity_type, entity_id, field_name, version_number);
+    END IF;
+END
+$$;
+
+DO $$
+BEGIN
+    ALTER TABLE versioned_numeric_fields ALTER COLUMN version_number SET NOT NULL;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_versioned_numeric_fields_version') THEN
+        ALTER TABLE versioned_numeric_fields
+            ADD CONSTRAINT uq_versioned_numeric_fields_version UNIQUE (entity_type, entity_id, field_name, version_number);
+    END IF;
+END
+$$;
+
+DO $$
+BEGIN
+    ALTER TABLE versioned_foreign_key_fields ALTER COLUMN version_number SET NOT NULL;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_versioned_foreign_key_fields_version') THEN
+        ALTER TABLE versioned_foreign_key_fields
+            ADD CONSTRAINT uq_versioned_foreign_key_fields_version UNIQUE (entity_type, entity_id, field_name, version_number);
+    END IF;
+END
+$$;
+
+ALTER TABLE planowanie_budzetu_current ADD COLUMN IF NOT EXISTS field_versions JSONB;
+
+ALTER TABLE rok_budzetowy_current ADD COLUMN IF NOT EXISTS field_versions JSONB;
+
+UPDATE planowanie_budzetu_current c
+SET field_versions = latest.field_versions
+FROM (
+    SELECT entity_id, jsonb_object_agg(field_name, version_number) AS field_versions
+    FROM (
+        SELECT entity_id, field_name, max(version_number) AS version_number
+        FROM (
+            SELECT entity_id, field_name, version_number FROM versioned_string_fields WHERE entity_type = 'planowanie_budzetu'
+            UNION ALL
+            SELECT entity_id, field_name, version_number FROM versioned_numeric_fields WHERE entity_type = 'planowanie_budzetu'
+            UNION ALL
+            SELECT entity_id, field_name, version_number FROM versioned_foreign_key_fields WHERE entity_type = 'planowanie_budzetu'
+        ) versions
+        GROUP BY entity_id, field_name
+    ) cells
+    GROUP BY entity_id
+) latest
+WHERE c.planowanie_budzetu_id = latest.entity_id;
+
+UPDATE rok_budzetowy_current c
+SET field_versions = latest.field_versions
+FROM (
+    SELECT entity_id, jsonb_object_agg(field_name, version_number) AS field_versions
+    FROM (
+        SELECT entity_id, field_name, max(version_number) AS version_number
+        FROM (
+            SELECT entity_id, field_name, version_number FROM versioned_string_fields WHERE entity_type = 'rok_budzetowy'
+            UNION ALL
+            SELECT entity_id, field_name, version_number FROM versioned_numeric_fields WHERE entity_type = 'rok_budzetowy'
+            UNION ALL
+            SELECT entity_id, field_name, version_number FROM versioned_foreign_key_fields WHERE entity_type = 'rok_budzetowy'
+        ) versions
+        GROUP BY entity_id, field_name
+    ) cells
+    GROUP BY entity_id
+) latest
+WHERE c.rok_budzetowy_id = latest.entity_id;
@@ -0,0 +1,14 @@
+-- Responses of write requests sent with an Idempotency-Key header (see src/idempotency.py)
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    key VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+
+-- Expired keys are deleted by created_at
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idempotency_keys_created_at
+    ON idempotency_keys (created_at);
@@ -1,11 +1,15 @@
+import os
+
 from fastapi import Header, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from typing import Optional, List
 
+from src.cache import TTLCache
 from src.database import get_db
+from src.ownership import get_planowanie_komorki, get_rok_planowania
 from src.schemas.users import User
-from src.schemas.planowanie_budzetu import PlanowanieBudzetu
-from src.versioning_utils import get_latest_version_for_field
+from src.schemas.current_state import PlanowanieBudzetuCurrent
 
 
 async def get_current_user_id(authorization: Optional[str] = Header(None)) -> int:
@@ -24,14 +28,64 @@ async def get_current_user_id(authorization: Optional[str] = Header(None)) -> in
     return user_id
 
 
-async def get_current_user(
+# Users looked up by get_current_user, cached per process; the TTL bounds how long another
+# worker's change to a user can go unnoticed (0 disables the cache)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_users(user_id: Optional[int] = None) -> None:
+    """Drop one or all users from the cache; they are loaded again on the next request."""
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    # Invalidate at flush and again at commit, so a request that reads the user
+    # in between cannot cache the not yet committed old row
+    invalidate_users(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_users(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
+
+
+def get_current_user(
     user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get current user from database and validate existence."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    """
+    Get current user and validate existence.
+    Users are cached (see USER_CACHE_TTL_SECONDS) as detached copies holding only the
+    column attributes, so relationships like `komorka_organizacyjna` cannot be loaded from them.
+    """
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    loaded = db.query(User).filter(User.id == user_id).first()
+    if not loaded:
         raise HTTPException(status_code=401, detail="User not found")
+
+    user = User(**{column.key: getattr(loaded, column.key) for column in User.__mapper__.column_attrs})
+    make_transient_to_detached(user)
+    _user_cache.set(user_id, user)
     return user
 
 
@@ -43,26 +97,42 @@ def validate_planowanie_access(
     """
     Validate that user has access to PlanowanieBudzetu.
     User must be in the same komorka_organizacyjna as the planowanie.
+    Owners come from the ownership index (src/ownership.py), usually without a query.
     """
-    planowanie = db.query(PlanowanieBudzetu).filter(
-        PlanowanieBudzetu.id == planowanie_id
-    ).first()
-    
-    if not planowanie:
+    validate_planowanie_access_bulk([planowanie_id], user, db)
+
+
+def validate_planowanie_access_bulk(
+    planowanie_ids: List[int],
+    user: User,
+    db: Session
+) -> None:
+    """
+    Validate that user has access to all given PlanowanieBudzetu with at most one query.
+    Same rules and errors as validate_planowanie_access.
+    """
+    komorki = get_planowanie_komorki(db, planowanie_ids)
+
+    if len(komorki) != len(set(planowanie_ids)):
         raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
     
-    # Get current komorka_organizacyjna_id for this planowanie
-    planowanie_komorka_id = get_latest_version_for_field(
-        db, "planowanie_budzetu", planowanie_id, "komorka_organizacyjna_id", "fk_int"
-    )
-    
-    if planowanie_komorka_id != user.komorka_organizacyjna_id:
+    if any(komorka_id != user.komorka_organizacyjna_id for komorka_id in komorki.values()):
         raise HTTPException(
             status_code=403,
             detail="Access denied: User's organizational unit does not match planowanie's organizational unit"
         )
 
 
+def visible_planowanie_ids(user: User):
+    """
+    Subquery of PlanowanieBudzetu ids the user has access to (same komorka_organizacyjna).
+    Join against it to filter whole lists in a single query instead of validating row by row.
+    """
+    return select(PlanowanieBudzetuCurrent.planowanie_budzetu_id).where(
+        PlanowanieBudzetuCurrent.komorka_organizacyjna_id == user.komorka_organizacyjna_id
+    ).subquery()
+
+
 def validate_rok_budzetowy_access(
     rok_id: int,
     user: User,
@@ -71,11 +141,26 @@ def validate_rok_budzetowy_access(
     """
     Validate that user has access to RokBudzetowy through its parent PlanowanieBudzetu.
     """
-    from src.schemas.rok_budzetowy import RokBudzetowy
+    validate_rok_budzetowy_access_bulk([rok_id], user, db)
+
+
+def validate_rok_budzetowy_access_bulk(
+    rok_ids: List[int],
+    user: User,
+    db: Session
+) -> None:
+    """
+    Validate that user has access to all given RokBudzetowy through their parent
+    PlanowanieBudzetu, from the ownership index.
+    """
+    planowania = get_rok_planowania(db, rok_ids)
     
-    rok = db.query(RokBudzetowy).filter(RokBudzetowy.id == rok_id).first()
-    if not rok:
+    if len(planowania) != len(set(rok_ids)):
         raise HTTPException(status_code=404, detail="RokBudzetowy not found")
     
-    # Validate access through parent planowanie
-    validate_planowanie_access(rok.planowanie_budzetu_id, user, db)
+    komorki = get_planowanie_komorki(db, planowania.values())
+    if any(komorki.get(planowanie_id) != user.komorka_organizacyjna_id for planowanie_id in planowania.values()):
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied: User's organizational unit does not match planowanie's organizational unit"
+        )
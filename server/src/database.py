@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 import os
+import threading
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -12,7 +16,99 @@ if not DATABASE_URL:
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
+
+
+def env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before QueuePool raises TimeoutError
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds after which a connection is replaced, so it outlives no failover or server-side timeout
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections on checkout, dropping the ones broken by a failover
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", True)
+# Behind PgBouncer in transaction mode PgBouncer does the pooling: every session gets
+# a fresh connection, which is given back when the session ends
+DB_PGBOUNCER = env_flag("DB_PGBOUNCER", False)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that also records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def recreate(self):
+        # Keep the statistics when the pool is recreated, e.g. by engine.dispose()
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait_total, pool.wait_max = self.wait_total, self.wait_max
+        return pool
+
+
+def create_db_engine(url: str):
+    """Engine with the pool configured by the DB_* environment variables."""
+    if DB_PGBOUNCER:
+        return create_engine(url, poolclass=NullPool, pool_pre_ping=DB_POOL_PRE_PING)
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+def pool_status() -> dict:
+    """Current statistics of the engine's connection pool."""
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+
+    with pool._stats_lock:
+        checkouts, timeouts = pool.checkouts, pool.timeouts
+        wait_total, wait_max = pool.wait_total, pool.wait_max
+    return {
+        "pool": "QueuePool",
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "timeouts": timeouts,
+        "wait_avg_ms": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        "wait_max_ms": round(wait_max * 1000, 3),
+    }
+
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -27,7 +123,11 @@ def init_db():
 
 
 def get_db():
-    """Dependency for getting database session"""
+    """
+    Dependency for getting database session.
+    The Session is synchronous, so routes and dependencies using it are plain `def`:
+    FastAPI runs them in its threadpool instead of blocking the event loop.
+    """
     db = SessionLocal()
     try:
         yield db
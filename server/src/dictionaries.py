@@ -0,0 +1,185 @@
+"""
+In-process cache of the classification dictionaries (dzialy, rozdzialy, paragrafy...).
+
+The dictionaries change about once a year, so each one is kept as a pre-serialized JSON
+body with a strong ETag, and all of them together as a precompressed bundle addressed by
+a hash of its content. The cache is filled at startup (or on the first request) and
+emptied with `invalidate_dictionaries()` after the dictionary tables change.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import Dict, Optional
+
+import brotli
+from fastapi import Response
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+from src.schemas.czesci_budzetowe import CzescBudzetowa
+from src.schemas.dzialy import Dzial
+from src.schemas.grupy_wydatkow import GrupaWydatkow
+from src.schemas.paragrafy import Paragraf
+from src.schemas.rozdzialy import Rozdzial
+from src.schemas.zrodla_finansowania import ZrodloFinansowania
+
+# Served dictionaries: model, columns returned (in order) and the column rows are sorted by
+DICTIONARIES = {
+    "dzialy": (Dzial, ["kod", "nazwa", "PKD"], "kod"),
+    "rozdzialy": (Rozdzial, ["kod", "nazwa", "dzial"], "kod"),
+    "paragrafy": (Paragraf, ["kod", "tresc"], "kod"),
+    "grupy_wydatkow": (GrupaWydatkow, ["id", "nazwa", "paragrafy"], "id"),
+    "czesci_budzetowe": (CzescBudzetowa, ["kod", "nazwa"], "kod"),
+    "zrodla_finansowania": (ZrodloFinansowania, ["kod", "nazwa", "opis"], "kod"),
+}
+
+
+class CachedDictionary:
+    """Serialized JSON body of a dictionary and its ETag."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class DictionaryBundle:
+    """All dictionaries in one JSON object ({name: rows}), precompressed, with its content hash."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        # Content-Encoding -> compressed body, in order of preference
+        self.encoded = {
+            "br": brotli.compress(body, quality=11),
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        }
+
+
+# The bundle is immutable under its hash, so it can be cached by clients for a year
+BUNDLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_cache: Dict[str, CachedDictionary] = {}
+_bundle: Optional[DictionaryBundle] = None
+_lock = threading.RLock()
+
+
+def serialize_dictionary(db: Session, name: str) -> bytes:
+    """JSON body of the dictionary, serialized like FastAPI's JSONResponse."""
+    model, columns, order_by = DICTIONARIES[name]
+    rows = db.query(*(getattr(model, column) for column in columns)).order_by(getattr(model, order_by)).all()
+    return json.dumps(
+        [dict(zip(columns, row)) for row in rows],
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def get_dictionary(db: Session, name: str) -> CachedDictionary:
+    """Cached dictionary, loaded with `db` when it is not cached yet."""
+    cached = _cache.get(name)
+    if cached is None:
+        with _lock:
+            cached = _cache.get(name)
+            if cached is None:
+                cached = _cache[name] = CachedDictionary(serialize_dictionary(db, name))
+    return cached
+
+
+def get_bundle(db: Session) -> DictionaryBundle:
+    """Cached bundle of all dictionaries, built and compressed when it is not cached yet."""
+    global _bundle
+    bundle = _bundle
+    if bundle is None:
+        with _lock:
+            bundle = _bundle
+            if bundle is None:
+                body = b"{" + b",".join(
+                    json.dumps(name).encode("utf-8") + b":" + get_dictionary(db, name).body
+                    for name in DICTIONARIES
+                ) + b"}"
+                bundle = _bundle = DictionaryBundle(body)
+    return bundle
+
+
+def load_dictionaries(db: Session) -> None:
+    """Fill the cache with all dictionaries and the compressed bundle (at startup)."""
+    get_bundle(db)
+
+
+def invalidate_dictionaries(name: Optional[str] = None) -> None:
+    """Drop one or all dictionaries from the cache; they are loaded again on the next request."""
+    global _bundle
+    with _lock:
+        if name is None:
+            _cache.clear()
+        else:
+            _cache.pop(name, None)
+        _bundle = None
+
+
+def strip_weak(etag: str) -> str:
+    """Opaque tag of an entity tag, without the `W/` prefix of weak validators."""
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value lists the ETag (or is `*`). Uses weak comparison
+    (RFC 9110 §13.1.2), so a validator a compressing proxy turned into `W/"..."` still matches.
+    """
+    if not if_none_match:
+        return False
+    candidates = [strip_weak(candidate) for candidate in if_none_match.split(",")]
+    return "*" in candidates or strip_weak(etag) in candidates
+
+
+def dictionary_response(db: Session, name: str, if_none_match: Optional[str]) -> Response:
+    """
+    Response with the cached dictionary, or 304 Not Modified when the client already has it.
+    Clients revalidate on every use (no-cache), which costs no database query.
+    """
+    cached = get_dictionary(db, name)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """First of the available encodings the Accept-Encoding header allows, or None for identity."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        weight = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            if coding and float(weight) > 0:
+                accepted.add(coding.lower())
+        except ValueError:
+            continue
+    for encoding in available:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def bundle_response(db: Session, bundle_hash: Optional[str], accept_encoding: Optional[str]) -> Response:
+    """
+    The bundle under its hash, compressed as the client accepts, cacheable as immutable.
+    Without a hash, or with the hash of an older bundle, redirects to the current one.
+    """
+    bundle = get_bundle(db)
+    if bundle_hash != bundle.hash:
+        return RedirectResponse(
+            f"/api/slowniki/{bundle.hash}",
+            status_code=302,
+            headers={"Cache-Control": "no-cache"}
+        )
+
+    headers = {"ETag": f'"{bundle.hash}"', "Cache-Control": BUNDLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    encoding = choose_encoding(accept_encoding, bundle.encoded)
+    if encoding is None:
+        return Response(content=bundle.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=bundle.encoded[encoding], media_type="application/json", headers=headers)
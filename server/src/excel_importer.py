@@ -0,0 +1,301 @@
+"""
+Import wierszy planowania budżetu z arkusza Excel.
+
+Arkusz ma układ tworzony przez `excel_creator.export_entries_to_excel`: pierwszy wiersz
+to nagłówki kolumn, kolejne to wpisy. Kolumny są rozpoznawane po nagłówkach, więc
+ukryte sekcje (`ExportOptions`) i inna kolejność kolumn nie przeszkadzają.
+
+Plik jest czytany strumieniowo (openpyxl `read_only`), kody klasyfikacji są sprawdzane
+w słownikach trzymanych w pamięci, a poprawne wiersze zapisywane partiami po
+`IMPORT_BATCH_SIZE` wielowierszowymi INSERT-ami. Błędne wiersze są pomijane i raportowane
+z numerem wiersza arkusza.
+"""
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import openpyxl
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from src.current_state import CURRENT_STATE_FIELDS
+from src.excel_creator import BudgetEntry, DaneFinansoweRoku
+from src.schemas.czesci_budzetowe import CzescBudzetowa
+from src.schemas.dzialy import Dzial
+from src.schemas.grupy_wydatkow import GrupaWydatkow
+from src.schemas.paragrafy import Paragraf
+from src.schemas.planowanie_budzetu import PlanowanieBudzetu
+from src.schemas.rok_budzetowy import RokBudzetowy
+from src.schemas.rozdzialy import Rozdzial
+from src.schemas.users import User
+from src.schemas.zrodla_finansowania import ZrodloFinansowania
+from src.versioning_utils import create_versions_bulk
+
+
+IMPORT_BATCH_SIZE = 500
+MAX_TEXT_LENGTH = 2000
+
+# Column header -> BudgetEntry attribute (inverse of export_entries_to_excel)
+HEADER_ATTRIBUTES = {
+    "Część": "czesc_budzetowa",
+    "Dział": "dzial",
+    "Rozdział": "rozdzial",
+    "Paragraf": "paragraf",
+    "Źródło fin.": "zrodlo_finansowania",
+    "Grupa wydatków": "grupa_wydatkow",
+    "BZ (Pełny)": "bz_pelna_szczegolowosc",
+    "BZ (Kody)": "bz_kody",
+    "Program/Projekt": "nazwa_programu_projektu",
+    "Komórka Org.": "nazwa_komorki_org",
+    "Plan WI": "plan_wi",
+    "Dysponent": "dysponent_srodkow",
+    "Budżet": "budzet",
+    "Nazwa Zadania": "nazwa_zadania",
+    "Uzasadnienie": "szczegolowe_uzasadnienie",
+    "Obszar działania": "obszar_dzialalnosci",
+}
+
+# Year column suffix -> (BudgetEntry attribute, offset from year N)
+YEAR_COLUMNS = {
+    "N": ("n", 0),
+    "N+1": ("n1", 1),
+    "N+2": ("n2", 2),
+    "N+3": ("n3", 3),
+}
+
+# Column header -> (year suffix, DaneFinansoweRoku attribute)
+YEAR_HEADERS = {
+    f"{label} ({suffix})": (suffix, attribute)
+    for suffix in YEAR_COLUMNS
+    for label, attribute in (("Potrzeby", "potrzeby"), ("Limit", "limit"), ("Niezabezpieczone", "niezabezpieczone"))
+}
+
+REQUIRED_HEADERS = ["Część", "Dział", "Rozdział", "Paragraf", "Źródło fin.", "Grupa wydatków"]
+
+# Width of codes that lose leading zeros when Excel stores them as numbers
+CODE_WIDTHS = {
+    "czesc_budzetowa": 2,
+    "dzial": 3,
+    "rozdzial": 5,
+}
+
+
+class ImportFileError(ValueError):
+    """The uploaded file cannot be imported at all (not a workbook, missing columns)."""
+
+
+@dataclass
+class ImportDictionaries:
+    """Classification dictionaries used to validate imported rows, loaded once per import."""
+    czesci: set
+    dzialy: set
+    rozdzialy: Dict[str, str]  # kod -> dzial
+    paragrafy: set
+    zrodla: set
+    grupy_ids: set
+    grupy_by_name: Dict[str, int]
+
+    @classmethod
+    def load(cls, db: Session) -> "ImportDictionaries":
+        grupy = db.query(GrupaWydatkow.id, GrupaWydatkow.nazwa).all()
+        return cls(
+            czesci=set(db.scalars(select(CzescBudzetowa.kod))),
+            dzialy=set(db.scalars(select(Dzial.kod))),
+            rozdzialy=dict(db.query(Rozdzial.kod, Rozdzial.dzial).all()),
+            paragrafy=set(db.scalars(select(Paragraf.kod))),
+            zrodla=set(db.scalars(select(ZrodloFinansowania.kod))),
+            grupy_ids={g.id for g in grupy},
+            grupy_by_name={g.nazwa.strip().lower(): g.id for g in grupy},
+        )
+
+
+def cell_text(value: Any, width: Optional[int] = None) -> str:
+    """Cell value as text; whole numbers lose the '.0' and numeric codes get their leading zeros back."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and width:
+        return str(value).zfill(width)
+    return str(value).strip()
+
+
+def cell_number(value: Any, header: str) -> float:
+    """Cell value as a number, empty cells are 0."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 0.0
+    try:
+        return float(str(value).replace(" ", "").replace(",", ".")) if isinstance(value, str) else float(value)
+    except ValueError:
+        raise ValueError(f"Invalid number in column '{header}': {value!r}")
+
+
+def parse_row(headers: List[Optional[str]], values: Tuple[Any, ...]) -> Tuple[BudgetEntry, List[str]]:
+    """
+    Map a sheet row back to BudgetEntry.
+    Returns the entry and suffixes of years with non-zero Potrzeby or Limit;
+    the export writes 0 for years without data.
+    """
+    entry = BudgetEntry()
+    for header, value in zip(headers, values):
+        if header in HEADER_ATTRIBUTES:
+            attribute = HEADER_ATTRIBUTES[header]
+            setattr(entry, attribute, cell_text(value, CODE_WIDTHS.get(attribute)))
+        elif header in YEAR_HEADERS:
+            suffix, attribute = YEAR_HEADERS[header]
+            setattr(getattr(entry, YEAR_COLUMNS[suffix][0]), attribute, cell_number(value, header))
+
+    years = [
+        suffix for suffix, (attribute, _) in YEAR_COLUMNS.items()
+        if getattr(entry, attribute).potrzeby or getattr(entry, attribute).limit
+    ]
+    return entry, years
+
+
+def entry_fields(entry: BudgetEntry, dictionaries: ImportDictionaries, user: User) -> Dict[str, Any]:
+    """Values of the versioned PlanowanieBudzetu fields for an entry, raising ValueError when invalid."""
+    if entry.czesc_budzetowa not in dictionaries.czesci:
+        raise ValueError(f"Unknown czesc budzetowa: {entry.czesc_budzetowa!r}")
+    if entry.dzial not in dictionaries.dzialy:
+        raise ValueError(f"Unknown dzial: {entry.dzial!r}")
+    if dictionaries.rozdzialy.get(entry.rozdzial) != entry.dzial:
+        raise ValueError(f"Unknown rozdzial {entry.rozdzial!r} in dzial {entry.dzial!r}")
+    # The 4th digit of a paragraf is the financing marker, the dictionary holds 3-digit codes
+    if entry.paragraf[:3] not in dictionaries.paragrafy:
+        raise ValueError(f"Unknown paragraf: {entry.paragraf!r}")
+    if entry.zrodlo_finansowania not in dictionaries.zrodla:
+        raise ValueError(f"Unknown zrodlo finansowania: {entry.zrodlo_finansowania!r}")
+
+    grupa = entry.grupa_wydatkow
+    grupa_id = int(grupa) if grupa.isdigit() else dictionaries.grupy_by_name.get(grupa.lower())
+    if grupa_id not in dictionaries.grupy_ids:
+        raise ValueError(f"Unknown grupa wydatkow: {grupa!r}")
+
+    texts = {
+        "nazwa_projektu": entry.nazwa_programu_projektu,
+        "nazwa_zadania": entry.nazwa_zadania,
+        "szczegolowe_uzasadnienie_realizacji": entry.szczegolowe_uzasadnienie,
+        "budzet": entry.budzet,
+    }
+    for field_name, text in texts.items():
+        if len(text) > MAX_TEXT_LENGTH:
+            raise ValueError(f"Field {field_name} is longer than {MAX_TEXT_LENGTH} characters")
+
+    return {
+        **{field_name: text or None for field_name, text in texts.items()},
+        "czesc_budzetowa_kod": entry.czesc_budzetowa,
+        "dzial_kod": entry.dzial,
+        "rozdzial_kod": entry.rozdzial,
+        "paragraf_kod": entry.paragraf,
+        "zrodlo_finansowania_kod": entry.zrodlo_finansowania,
+        "grupa_wydatkow_id": grupa_id,
+        # Rows are always imported into the unit of the importing user
+        "komorka_organizacyjna_id": user.komorka_organizacyjna_id,
+        "user_id": user.id,
+    }
+
+
+def allocate_ids(db: Session, model, count: int) -> List[int]:
+    """Take `count` ids from the serial sequence of the model's table in one query."""
+    sequence = func.pg_get_serial_sequence(model.__tablename__, "id")
+    return list(db.scalars(select(func.nextval(sequence)).select_from(func.generate_series(1, count))))
+
+
+def write_batch(
+    db: Session,
+    batch: List[Tuple[Dict[str, Any], List[Tuple[int, DaneFinansoweRoku]]]],
+    user: User
+) -> int:
+    """
+    Insert a batch of (fields, [(rok, dane)]) rows: PlanowanieBudzetu, RokBudzetowy and
+    all their versions with a constant number of statements. Returns number of inserted years.
+    """
+    planowanie_ids = allocate_ids(db, PlanowanieBudzetu, len(batch))
+    db.execute(insert(PlanowanieBudzetu.__table__), [{"id": planowanie_id} for planowanie_id in planowanie_ids])
+
+    fields = CURRENT_STATE_FIELDS["planowanie_budzetu"]
+    create_versions_bulk(db, "planowanie_budzetu", [
+        (planowanie_id, field_name, field_type, values[field_name])
+        for planowanie_id, (values, _) in zip(planowanie_ids, batch)
+        for field_name, field_type in fields.items()
+    ], user.id)
+
+    lata = [
+        (planowanie_id, rok, dane)
+        for planowanie_id, (_, years) in zip(planowanie_ids, batch)
+        for rok, dane in years
+    ]
+    if lata:
+        rok_ids = allocate_ids(db, RokBudzetowy, len(lata))
+        db.execute(insert(RokBudzetowy.__table__), [
+            {"id": rok_id, "planowanie_budzetu_id": planowanie_id, "rok": rok}
+            for rok_id, (planowanie_id, rok, _) in zip(rok_ids, lata)
+        ])
+        create_versions_bulk(db, "rok_budzetowy", [
+            version
+            for rok_id, (_, _, dane) in zip(rok_ids, lata)
+            for version in ((rok_id, "limit", "numeric", dane.limit), (rok_id, "potrzeba", "numeric", dane.potrzeby))
+        ], user.id)
+
+    return len(lata)
+
+
+def import_planowanie_budzetu(
+    db: Session,
+    file: BinaryIO,
+    rok_n: int,
+    user: User
+) -> Dict[str, Any]:
+    """
+    Import planowanie rows of the workbook into the user's komorka in one transaction.
+    Year columns N, N+1... become RokBudzetowy of years rok_n, rok_n + 1...
+    Returns counts of imported rows and years and a list of {"row", "message"} errors.
+    Raises ImportFileError when the file is not a workbook or lacks required columns.
+    """
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFileError("File is not a valid .xlsx workbook")
+
+    dictionaries = ImportDictionaries.load(db)
+    imported = 0
+    lata_imported = 0
+    errors = []
+    batch = []
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header_row = next(rows, None) or ()
+        headers = [str(h).strip() if h is not None else None for h in header_row]
+        missing = [header for header in REQUIRED_HEADERS if header not in headers]
+        if missing:
+            raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None or (isinstance(value, str) and not value.strip()) for value in values):
+                continue
+
+            try:
+                entry, years = parse_row(headers, values)
+                fields = entry_fields(entry, dictionaries, user)
+            except ValueError as e:
+                errors.append({"row": row_number, "message": str(e)})
+                continue
+
+            batch.append((fields, [
+                (rok_n + YEAR_COLUMNS[suffix][1], getattr(entry, YEAR_COLUMNS[suffix][0]))
+                for suffix in years
+            ]))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                lata_imported += write_batch(db, batch, user)
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            lata_imported += write_batch(db, batch, user)
+            imported += len(batch)
+    finally:
+        workbook.close()
+
+    db.commit()
+    return {"imported": imported, "lata_imported": lata_imported, "errors": errors}
@@ -0,0 +1,105 @@
+"""Idempotency-Key support for write endpoints: a retried request gets the original response."""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.auth import get_current_user_id
+from src.database import get_db
+from src.schemas.idempotency_keys import IdempotencyKey
+
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# How long a stored response is returned for retries of the request
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 60 * 60)))
+
+
+class IdempotentRequest:
+    """
+    Write request that may carry an Idempotency-Key. Endpoints call `begin()` before writing
+    and return its result when it is not None, then finish with `commit(response)`, which
+    stores the response in the same transaction as the written data.
+    Without the header both are no-ops apart from the commit.
+    """
+
+    def __init__(self, db: Session, user_id: int, key: Optional[str], request_hash: str, response: Response):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.request_hash = request_hash
+        self.response = response
+        self.claim: Optional[IdempotencyKey] = None
+
+    def begin(self) -> Optional[dict]:
+        """
+        Return the stored response when the request was already handled, otherwise claim
+        the key and return None. The claim is flushed right away, so a concurrent retry
+        waits on it until this transaction ends and then replays its response.
+        """
+        if self.key is None:
+            return None
+
+        expired_before = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+        self.db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.created_at < expired_before
+        ))
+
+        stored = self._stored()
+        if stored is None:
+            try:
+                with self.db.begin_nested():
+                    self.claim = IdempotencyKey(user_id=self.user_id, key=self.key, request_hash=self.request_hash)
+                    self.db.add(self.claim)
+                return None
+            except IntegrityError:
+                # A concurrent request with the same key committed first
+                self.claim = None
+                stored = self._stored()
+
+        if stored is None or stored.response is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        if stored.request_hash != self.request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+        self.response.headers[IDEMPOTENT_REPLAYED_HEADER] = "true"
+        return stored.response
+
+    def commit(self, response: dict) -> dict:
+        """Store the response with the claimed key, commit the transaction and return the response."""
+        if self.claim is not None:
+            self.claim.response = jsonable_encoder(response)
+        self.db.commit()
+        return response
+
+    def _stored(self) -> Optional[IdempotencyKey]:
+        return self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.key == self.key
+        ).populate_existing().first()
+
+
+async def idempotent_request(
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+) -> IdempotentRequest:
+    """Dependency giving write endpoints their IdempotentRequest."""
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_KEY_HEADER} must have 1 to {MAX_KEY_LENGTH} characters")
+
+    request_hash = hashlib.sha256()
+    request_hash.update(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    request_hash.update(await request.body())
+
+    return IdempotentRequest(db, user_id, idempotency_key, request_hash.hexdigest(), response)
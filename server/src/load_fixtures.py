@@ -67,11 +67,8 @@ from src.schemas.planowanie_budzetu import PlanowanieBudzetu
 from src.schemas.rok_budzetowy import RokBudzetowy
 from src.schemas.komorki_organizacyjne import KomorkaOrganizacyjna
 from src.schemas.users import User
-from src.versioning_utils import (
-    create_string_version,
-    create_numeric_version,
-    create_fk_version
-)
+from src.current_state import CURRENT_STATE_FIELDS
+from src.versioning_utils import create_versions_bulk
 
 
 def load_json_fixture(filename: str) -> list[dict]:
@@ -202,32 +199,25 @@ def load_planowanie_budzetu(session: Session) -> None:
         session.add(planowanie)
         session.flush()  # Get the ID
         
-        # Create versioned fields for planowanie_budzetu
-        create_string_version(session, "planowanie_budzetu", planowanie.id, "nazwa_projektu", item.get("nazwa_projektu"), user_id)
-        create_string_version(session, "planowanie_budzetu", planowanie.id, "nazwa_zadania", item.get("nazwa_zadania"), user_id)
-        create_string_version(session, "planowanie_budzetu", planowanie.id, "szczegolowe_uzasadnienie_realizacji", item.get("szczegolowe_uzasadnienie_realizacji"), user_id)
-        create_string_version(session, "planowanie_budzetu", planowanie.id, "budzet", item.get("budzet"), user_id)
-        
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "czesc_budzetowa_kod", value_string=item.get("czesc_budzetowa_kod"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "dzial_kod", value_string=item.get("dzial_kod"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "rozdzial_kod", value_string=item.get("rozdzial_kod"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "paragraf_kod", value_string=item.get("paragraf_kod"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "zrodlo_finansowania_kod", value_string=item.get("zrodlo_finansowania_kod"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "grupa_wydatkow_id", value_int=item.get("grupa_wydatkow_id"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "komorka_organizacyjna_id", value_int=item.get("komorka_organizacyjna_id"), user_id=user_id)
-        create_fk_version(session, "planowanie_budzetu", planowanie.id, "user_id", value_int=user_id, user_id=user_id)
+        # Create versioned fields for planowanie_budzetu, one insert per versioned table
+        create_versions_bulk(session, "planowanie_budzetu", [
+            (planowanie.id, field_name, field_type, item.get(field_name))
+            for field_name, field_type in CURRENT_STATE_FIELDS["planowanie_budzetu"].items()
+        ], user_id)
         
         # Create RokBudzetowy records with versioned fields
-        for rok_data in lata_budzetowe:
-            rok = RokBudzetowy(
-                planowanie_budzetu_id=planowanie.id,
-                rok=rok_data["rok"]
-            )
-            session.add(rok)
-            session.flush()  # Get the ID
-            
-            create_numeric_version(session, "rok_budzetowy", rok.id, "limit", rok_data.get("limit"), user_id)
-            create_numeric_version(session, "rok_budzetowy", rok.id, "potrzeba", rok_data.get("potrzeba"), user_id)
+        lata = [
+            RokBudzetowy(planowanie_budzetu_id=planowanie.id, rok=rok_data["rok"])
+            for rok_data in lata_budzetowe
+        ]
+        session.add_all(lata)
+        session.flush()  # Get the IDs
+        
+        create_versions_bulk(session, "rok_budzetowy", [
+            (rok.id, field_name, "numeric", rok_data.get(field_name))
+            for rok, rok_data in zip(lata, lata_budzetowe)
+            for field_name in ("limit", "potrzeba")
+        ], user_id)
     
     session.commit()
     print(f"Loaded {len(data)} planowanie budżetu records")
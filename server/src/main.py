@@ -1,25 +1,25 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, APIRouter, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import List, Optional
 from contextlib import asynccontextmanager
 import json
 import uvicorn
 from fastapi import Depends
 from sqlalchemy.orm import Session
 
-from src.database import get_db, init_db
-from src.schemas.dzialy import Dzial
-from src.schemas.rozdzialy import Rozdzial
-from src.schemas.paragrafy import Paragraf
-from src.schemas.grupy_wydatkow import GrupaWydatkow
-from src.schemas.czesci_budzetowe import CzescBudzetowa
-from src.schemas.zrodla_finansowania import ZrodloFinansowania
+from src.auth import get_current_user_id
+from src.database import SessionLocal, get_db, init_db, pool_status
+from src.dictionaries import bundle_response, dictionary_response, invalidate_dictionaries, load_dictionaries
 from src.tabela import router as tabela_router
+from src.pagination import NEXT_CURSOR_HEADER
+from src.idempotency import IDEMPOTENT_REPLAYED_HEADER
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    with SessionLocal() as db:
+        load_dictionaries(db)
     yield
 
 
@@ -30,6 +30,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAYED_HEADER, "ETag"],
 )
 
 
@@ -43,7 +44,7 @@ async def root():
 
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     """Health check endpoint that verifies database connection"""
     try:
         # Simple query to check DB connection
@@ -53,76 +54,66 @@ async def health_check(db: Session = Depends(get_db)):
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
 
+@app.get("/internal/pool", include_in_schema=False)
+async def get_pool_status(user_id: int = Depends(get_current_user_id)):
+    """
+    Connection pool statistics (administrator only). Does not use a connection,
+    so it answers even when the pool is exhausted.
+    """
+    if user_id != 0:
+        raise HTTPException(status_code=403, detail="Access denied. Only administrator (ID 0) can access this data.")
+    return pool_status()
+
+
 @api_router.get("/dzialy")
-async def get_dzialy(db: Session = Depends(get_db)):
-    dzialy = db.query(Dzial).all()
-    return [
-        {
-            "kod": d.kod,
-            "nazwa": d.nazwa,
-            "PKD": d.PKD
-        }
-        for d in dzialy
-    ]
+def get_dzialy(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "dzialy", if_none_match)
 
 
 @api_router.get("/rozdzialy")
-async def get_rozdzialy(db: Session = Depends(get_db)):
-    rozdzialy = db.query(Rozdzial).all()
-    return [
-        {
-            "kod": r.kod,
-            "nazwa": r.nazwa,
-            "dzial": r.dzial
-        }
-        for r in rozdzialy
-    ]
+def get_rozdzialy(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "rozdzialy", if_none_match)
+
 
 @api_router.get("/paragrafy")
-async def get_paragrafy(db: Session = Depends(get_db)):
-    paragrafy = db.query(Paragraf).all()
-    return [
-        {
-            "kod": p.kod,
-            "tresc": p.tresc
-        }
-        for p in paragrafy
-    ]
+def get_paragrafy(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "paragrafy", if_none_match)
+
 
 @api_router.get("/grupy_wydatkow")
-async def get_grupy_wydatkow(db: Session = Depends(get_db)):
-    grupy = db.query(GrupaWydatkow).all()
-    return [
-        {
-            "id": g.id,
-            "nazwa": g.nazwa,
-            "paragrafy": g.paragrafy
-        }
-        for g in grupy
-    ]
+def get_grupy_wydatkow(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "grupy_wydatkow", if_none_match)
+
 
 @api_router.get("/czesci_budzetowe")
-async def get_czesci_budzetowe(db: Session = Depends(get_db)):
-    czesci = db.query(CzescBudzetowa).all()
-    return [
-        {
-            "kod": c.kod,
-            "nazwa": c.nazwa
-        }
-        for c in czesci
-    ]
+def get_czesci_budzetowe(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "czesci_budzetowe", if_none_match)
+
 
 @api_router.get("/zrodla_finansowania")
-async def get_zrodla_finansowania(db: Session = Depends(get_db)):
-    zrodla = db.query(ZrodloFinansowania).all()
-    return [
-        {
-            "kod": z.kod,
-            "nazwa": z.nazwa,
-            "opis": z.opis
-        }
-        for z in zrodla
-    ]
+def get_zrodla_finansowania(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return dictionary_response(db, "zrodla_finansowania", if_none_match)
+
+
+@api_router.get("/slowniki")
+def get_slowniki(db: Session = Depends(get_db)):
+    """Redirect to the current bundle of all dictionaries, see get_slowniki_bundle."""
+    return bundle_response(db, None, None)
+
+
+@api_router.get("/slowniki/{bundle_hash}")
+def get_slowniki_bundle(bundle_hash: str, accept_encoding: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """All six dictionaries in one precompressed JSON object, immutable under the content hash."""
+    return bundle_response(db, bundle_hash, accept_encoding)
+
+
+@app.post("/internal/dictionaries/invalidate", include_in_schema=False)
+async def invalidate_dictionary_cache(user_id: int = Depends(get_current_user_id)):
+    """Reload the dictionaries on the next request, after the dictionary tables changed (administrator only)."""
+    if user_id != 0:
+        raise HTTPException(status_code=403, detail="Access denied. Only administrator (ID 0) can access this data.")
+    invalidate_dictionaries()
+    return {"status": "invalidated"}
 
 # Include the API router
 app.include_router(api_router)
@@ -23,6 +23,17 @@ class CellUpdate(BaseModel):
     value: Optional[str | int | float] = None
     # If you want to check for merge conflict, pass here the last time you have pulled the information
     last_known_timestamp: Optional[datetime] = None
+    # Or, preferably, the version of the cell you have seen (`versions` in responses)
+    expected_version: Optional[int] = None
+
+
+class BatchCellUpdate(CellUpdate):
+    # id of the planowanie_budzetu / rok_budzetowy the cell belongs to
+    id: int
+
+
+class BatchCellUpdateRequest(BaseModel):
+    updates: List[BatchCellUpdate]
 
 
 class RokBudzetowyCreate(BaseModel):
@@ -32,6 +43,16 @@ class RokBudzetowyCreate(BaseModel):
     potrzeba: float
 
 
+class RokBudzetowyValues(BaseModel):
+    rok: int
+    limit: float
+    potrzeba: float
+
+
+class LataBudzetoweUpdate(BaseModel):
+    lata: List[RokBudzetowyValues]
+
+
 # Base response models
 class MessageResponse(BaseModel):
     id: int
@@ -43,6 +64,44 @@ class UpdateResponse(BaseModel):
     field: str
     value: Optional[str | int | float]
     message: str
+    # New version of the cell
+    version: Optional[int] = None
+    # False when the cell already held the value and no version was written
+    changed: bool = True
+
+
+class ConflictingChange(BaseModel):
+    value: Optional[str | int | float]
+    timestamp: datetime
+    user_id: Optional[int] = None
+    version: Optional[int] = None
+
+
+class BatchCellResult(BaseModel):
+    id: int
+    field: str
+    value: Optional[str | int | float]
+    # "updated", "unchanged", "conflict" or "error"
+    status: str
+    message: str
+    version: Optional[int] = None
+    changes: Optional[List[ConflictingChange]] = None
+
+
+class BatchUpdateResponse(BaseModel):
+    results: List[BatchCellResult]
+
+
+class ImportRowError(BaseModel):
+    # Row number in the sheet, header is row 1
+    row: int
+    message: str
+
+
+class ImportResponse(BaseModel):
+    imported: int
+    lata_imported: int
+    errors: List[ImportRowError]
 
 
 # PlanowanieBudzetu response models
@@ -59,6 +118,10 @@ class PlanowanieBudzetuResponse(BaseModel):
     zrodlo_finansowania_kod: Optional[str] = None
     grupa_wydatkow_id: Optional[int] = None
     komorka_organizacyjna_id: Optional[int] = None
+    # Current version of each field, echo as expected_version when updating (not returned with as_of)
+    versions: Optional[Dict[str, int]] = None
+    # Only returned with ?include=lata
+    lata_budzetowe: Optional[List["RokBudzetowyResponse"]] = None
 
 
 class FieldHistoryEntry(BaseModel):
@@ -76,6 +139,11 @@ class FieldsHistoryStatusResponse(BaseModel):
     fields: Dict[str, bool]
 
 
+class FieldsHistoryStatusBulkResponse(BaseModel):
+    """Response showing which fields have history, for many entities at once"""
+    entities: Dict[int, Dict[str, bool]]
+
+
 # RokBudzetowy response models
 class RokBudzetowyResponse(BaseModel):
     id: int
@@ -83,3 +151,5 @@ class RokBudzetowyResponse(BaseModel):
     rok: int
     limit: Optional[float] = None
     potrzeba: Optional[float] = None
+    # Current version of each field, echo as expected_version when updating (not returned with as_of)
+    versions: Optional[Dict[str, int]] = None
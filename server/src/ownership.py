@@ -0,0 +1,109 @@
+"""
+In-process index of which komorka_organizacyjna owns each PlanowanieBudzetu, used by the
+access checks in src/auth.py instead of querying on every request.
+
+Ownership is the current komorka_organizacyjna_id of the planowanie. Writes of that field to
+the current state projection invalidate the entry (see update_current_state_bulk), at write
+time and again when the transaction ends, so the index stays exact within a worker. Other
+workers see the change once OWNERSHIP_CACHE_TTL_SECONDS runs out.
+"""
+import os
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.cache import TTLCache
+from src.schemas.current_state import PlanowanieBudzetuCurrent
+from src.schemas.planowanie_budzetu import PlanowanieBudzetu
+from src.schemas.rok_budzetowy import RokBudzetowy
+
+
+OWNERSHIP_CACHE_TTL_SECONDS = float(os.getenv("OWNERSHIP_CACHE_TTL_SECONDS", "300"))
+OWNERSHIP_CACHE_SIZE = int(os.getenv("OWNERSHIP_CACHE_SIZE", "100000"))
+
+# planowanie_budzetu_id -> komorka_organizacyjna_id
+_planowanie_komorki = TTLCache(OWNERSHIP_CACHE_SIZE, OWNERSHIP_CACHE_TTL_SECONDS)
+# rok_budzetowy_id -> planowanie_budzetu_id, which never changes
+_rok_planowania = TTLCache(OWNERSHIP_CACHE_SIZE, OWNERSHIP_CACHE_TTL_SECONDS)
+
+
+def get_planowanie_komorki(db: Session, planowanie_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """
+    komorka_organizacyjna_id of each existing planowanie ({planowanie_id: komorka_id}),
+    with one query for those not cached. Missing planowania are left out.
+    """
+    komorki = {}
+    missing = []
+    for planowanie_id in set(planowanie_ids):
+        komorka_id = _planowanie_komorki.get(planowanie_id)
+        if komorka_id is None:
+            missing.append(planowanie_id)
+        else:
+            komorki[planowanie_id] = komorka_id
+
+    if missing:
+        rows = db.query(
+            PlanowanieBudzetu.id,
+            PlanowanieBudzetuCurrent.komorka_organizacyjna_id
+        ).outerjoin(
+            PlanowanieBudzetuCurrent,
+            PlanowanieBudzetuCurrent.planowanie_budzetu_id == PlanowanieBudzetu.id
+        ).filter(
+            PlanowanieBudzetu.id.in_(missing)
+        ).all()
+        for planowanie_id, komorka_id in rows:
+            komorki[planowanie_id] = komorka_id
+            # Not cached while the planowanie has no komorka yet
+            if komorka_id is not None:
+                _planowanie_komorki.set(planowanie_id, komorka_id)
+
+    return komorki
+
+
+def get_rok_planowania(db: Session, rok_ids: Iterable[int]) -> Dict[int, int]:
+    """planowanie_budzetu_id of each existing RokBudzetowy ({rok_id: planowanie_id})."""
+    planowania = {}
+    missing = []
+    for rok_id in set(rok_ids):
+        planowanie_id = _rok_planowania.get(rok_id)
+        if planowanie_id is None:
+            missing.append(rok_id)
+        else:
+            planowania[rok_id] = planowanie_id
+
+    if missing:
+        rows = db.query(RokBudzetowy.id, RokBudzetowy.planowanie_budzetu_id).filter(
+            RokBudzetowy.id.in_(missing)
+        ).all()
+        for rok_id, planowanie_id in rows:
+            planowania[rok_id] = planowanie_id
+            _rok_planowania.set(rok_id, planowanie_id)
+
+    return planowania
+
+
+def invalidate_ownership(planowanie_ids: Optional[Iterable[int]] = None, db: Optional[Session] = None) -> None:
+    """
+    Drop the owners of the given planowania (or the whole index) from the cache.
+    With `db`, they are dropped again when its transaction commits or rolls back, so no
+    request caches the value seen before the change was committed.
+    """
+    if planowanie_ids is None:
+        _planowanie_komorki.clear()
+        _rok_planowania.clear()
+        return
+
+    planowanie_ids = set(planowanie_ids)
+    for planowanie_id in planowanie_ids:
+        _planowanie_komorki.invalidate(planowanie_id)
+    if db is not None:
+        db.info.setdefault("changed_owner_ids", set()).update(planowanie_ids)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_changed_owners(session: Session) -> None:
+    changed = session.info.pop("changed_owner_ids", None)
+    if changed:
+        invalidate_ownership(changed)
@@ -0,0 +1,144 @@
+"""Keyset (cursor) pagination with server-side sorting for list endpoints."""
+import base64
+import json
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Numeric, and_, or_
+from sqlalchemy.orm import Query
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Encode position after the last returned row as an opaque cursor."""
+    if isinstance(value, Decimal):
+        value = str(value)
+    payload = json.dumps([sort, value, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str, sort: str, column=None):
+    """
+    Decode cursor into (value, id), rejecting malformed cursors and cursors of another sort.
+    With `column`, the value is converted to the column's type; values that do not fit it
+    are rejected as invalid cursors.
+    """
+    try:
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor_sort != sort or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort")
+
+    if value is not None:
+        try:
+            value = cursor_value(column, value)
+        except (ValueError, TypeError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return value, row_id
+
+
+def cursor_value(column, value: Any) -> Any:
+    """Cursor value converted to the Python type of the column, ValueError if it does not fit."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"Unsupported cursor value: {value!r}")
+    if column is None:
+        return value
+
+    if isinstance(column.type, Numeric):
+        value = Decimal(str(value))
+        if not value.is_finite():
+            raise ValueError(f"Unsupported cursor value: {value!r}")
+        return value
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is int and not isinstance(value, int):
+        raise ValueError(f"Unsupported cursor value: {value!r}")
+    if python_type is str and not isinstance(value, str):
+        raise ValueError(f"Unsupported cursor value: {value!r}")
+    return value
+
+
+def keyset_filter(column, id_column, descending: bool, value: Any, row_id: int):
+    """
+    Condition selecting rows after (value, row_id) in the order
+    `column ASC NULLS LAST, id ASC` or its exact reverse when descending.
+    """
+    if column is id_column:
+        return id_column < row_id if descending else id_column > row_id
+
+    if value is None:
+        if descending:
+            return or_(column.isnot(None), and_(column.is_(None), id_column < row_id))
+        return and_(column.is_(None), id_column > row_id)
+
+    if descending:
+        return or_(column < value, and_(column == value, id_column < row_id))
+    return or_(column > value, and_(column == value, id_column > row_id), column.is_(None))
+
+
+def sort_query(
+    query: Query,
+    sort_columns: Dict[str, Any],
+    id_column,
+    sort: str,
+    after: Optional[str] = None
+) -> Query:
+    """
+    Sort query by `sort` (column name, `-` prefix for descending) with id as tie-breaker
+    and skip rows up to and including cursor `after`.
+    """
+    descending = sort.startswith("-")
+    sort_name = sort.lstrip("-")
+    if sort_name not in sort_columns:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort_name}")
+    column = sort_columns[sort_name]
+
+    if after:
+        value, row_id = decode_cursor(after, sort, column)
+        query = query.filter(keyset_filter(column, id_column, descending, value, row_id))
+
+    if column is id_column:
+        order = [id_column.desc()] if descending else [id_column.asc()]
+    elif descending:
+        order = [column.desc().nulls_first(), id_column.desc()]
+    else:
+        order = [column.asc().nulls_last(), id_column.asc()]
+
+    return query.order_by(*order)
+
+
+def paginate(
+    query: Query,
+    sort_columns: Dict[str, Any],
+    id_column,
+    sort: str,
+    limit: Optional[int],
+    after: Optional[str],
+    response: Response
+) -> List[Dict[str, Any]]:
+    """
+    Return the page of sorted query after cursor `after` (see sort_query). When more rows
+    follow, the cursor of the next page is set in the X-Next-Cursor response header.
+    """
+    query = sort_query(query, sort_columns, id_column, sort, after)
+
+    if limit is None:
+        return [row._asdict() for row in query.all()]
+
+    rows = [row._asdict() for row in query.limit(limit + 1).all()]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, last[sort.lstrip("-")], last["id"])
+
+    return rows
@@ -0,0 +1,78 @@
+"""
+Cache of serialized list responses, keyed by request parameters and validated against a
+change marker of the version tables.
+
+Every edit inserts a version row, so the highest id of each versioned table changes whenever
+any value does. Version rows are only deleted when coalescing replaces them (see
+create_versions_bulk), and the replacing row is inserted in the same transaction, also when an
+edit is undone. A request compares the marker (one query on the primary key indexes) with the
+one its cached response was built under and, if they match, returns the cached bytes.
+"""
+import os
+from typing import Dict, Hashable, Optional
+
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from src.cache import TTLCache
+from src.schemas.versioned_fields import (
+    VersionedStringField,
+    VersionedNumericField,
+    VersionedForeignKeyField
+)
+
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "32"))
+
+_responses = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+
+class CachedResponse:
+    """JSON body of a response, its headers and the change marker it was built under."""
+
+    def __init__(self, marker: tuple, body: bytes, headers: Dict[str, str]):
+        self.marker = marker
+        self.body = body
+        self.headers = headers
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+def get_versions_marker(db: Session) -> tuple[tuple, bool]:
+    """
+    Highest version id of each versioned table, and whether the marker is stable.
+    Ids are taken when a version is inserted, not when it is committed: while a transaction
+    older than the last committed one is still in progress, a lower id may yet become visible
+    without changing the marker, so responses built then are not stored.
+    """
+    snapshot = func.pg_current_snapshot()
+    row = db.execute(select(
+        select(func.max(VersionedStringField.id)).scalar_subquery(),
+        select(func.max(VersionedNumericField.id)).scalar_subquery(),
+        select(func.max(VersionedForeignKeyField.id)).scalar_subquery(),
+        func.pg_snapshot_xmin(snapshot) == func.pg_snapshot_xmax(snapshot)
+    )).one()
+    return tuple(row[:3]), bool(row[3])
+
+
+def get_cached_response(key: Hashable, marker: tuple) -> Optional[Response]:
+    """The cached response for `key` if it was built under `marker`."""
+    cached = _responses.get(key)
+    if cached is None or cached.marker != marker:
+        return None
+    return cached.to_response()
+
+
+def cache_response(key: Hashable, marker: tuple, stable: bool, body: bytes, headers: Dict[str, str]) -> Response:
+    """Response with the body, stored under `key` when the marker is stable."""
+    cached = CachedResponse(marker, body, headers)
+    if stable:
+        _responses.set(key, cached)
+    return cached.to_response()
+
+
+def invalidate_responses() -> None:
+    _responses.clear()
@@ -18,6 +18,8 @@ from src.schemas.versioned_fields import (
 )
 from src.schemas.planowanie_budzetu import PlanowanieBudzetu
 from src.schemas.rok_budzetowy import RokBudzetowy
+from src.schemas.current_state import PlanowanieBudzetuCurrent, RokBudzetowyCurrent
+from src.schemas.idempotency_keys import IdempotencyKey
 
 __all__ = [
     "Base",
@@ -34,4 +36,7 @@ __all__ = [
     "VersionedForeignKeyField",
     "PlanowanieBudzetu",
     "RokBudzetowy",
+    "PlanowanieBudzetuCurrent",
+    "RokBudzetowyCurrent",
+    "IdempotencyKey",
 ]
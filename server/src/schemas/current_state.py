@@ -0,0 +1,61 @@
+from sqlalchemy import String, Integer, ForeignKey, Numeric, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class PlanowanieBudzetuCurrent(Base):
+    """
+    Current values of all versioned fields of PlanowanieBudzetu, one row per entity.
+    Maintained by versioning_utils on every new version, rebuilt by src/current_state.py.
+    """
+    __tablename__ = "planowanie_budzetu_current"
+    __table_args__ = (
+        # List endpoints are scoped to the user's komorka and ordered by id
+        Index("ix_planowanie_budzetu_current_komorka", "komorka_organizacyjna_id", "planowanie_budzetu_id"),
+    )
+
+    planowanie_budzetu_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("planowanie_budzetu.id"),
+        primary_key=True
+    )
+    nazwa_projektu: Mapped[str | None] = mapped_column(String(2000), nullable=True)
+    nazwa_zadania: Mapped[str | None] = mapped_column(String(2000), nullable=True)
+    szczegolowe_uzasadnienie_realizacji: Mapped[str | None] = mapped_column(String(2000), nullable=True)
+    budzet: Mapped[str | None] = mapped_column(String(2000), nullable=True)
+    czesc_budzetowa_kod: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    dzial_kod: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    rozdzial_kod: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    paragraf_kod: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    zrodlo_finansowania_kod: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    grupa_wydatkow_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    komorka_organizacyjna_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Current version_number of each field, {field_name: version_number}
+    field_versions: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"PlanowanieBudzetuCurrent(planowanie_budzetu_id={self.planowanie_budzetu_id!r})"
+
+
+class RokBudzetowyCurrent(Base):
+    """
+    Current values of all versioned fields of RokBudzetowy, one row per entity.
+    Maintained by versioning_utils on every new version, rebuilt by src/current_state.py.
+    """
+    __tablename__ = "rok_budzetowy_current"
+
+    rok_budzetowy_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("rok_budzetowy.id"),
+        primary_key=True
+    )
+    limit: Mapped[float | None] = mapped_column(Numeric(15, 2), nullable=True)
+    potrzeba: Mapped[float | None] = mapped_column(Numeric(15, 2), nullable=True)
+    # Current version_number of each field, {field_name: version_number}
+    field_versions: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"RokBudzetowyCurrent(rok_budzetowy_id={self.rok_budzetowy_id!r})"
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Response of a write request sent with an Idempotency-Key header, returned again
+    when the request is retried with the same key. See src/idempotency.py.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # sha256 of method, path and body, so a key cannot be reused for another request
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # None until the request that claimed the key commits
+    response: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"IdempotencyKey(user_id={self.user_id!r}, key={self.key!r})"
@@ -12,7 +12,8 @@ class RokBudzetowy(Base):
     planowanie_budzetu_id: Mapped[int] = mapped_column(
         Integer,
         ForeignKey("planowanie_budzetu.id"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     rok: Mapped[int] = mapped_column(Integer, nullable=False)
     
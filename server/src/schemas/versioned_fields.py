@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, ForeignKey, Numeric, DateTime
+from sqlalchemy import String, Integer, ForeignKey, Numeric, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -7,6 +7,9 @@ from .base import Base
 
 class VersionedStringField(Base):
     __tablename__ = "versioned_string_fields"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "field_name", "version_number", name="uq_versioned_string_fields_version"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     entity_type: Mapped[str] = mapped_column(String(50), nullable=False)  # 'planowanie_budzetu', 'rok_budzetowy'
@@ -14,6 +17,8 @@ class VersionedStringField(Base):
     field_name: Mapped[str] = mapped_column(String(100), nullable=False)
     value: Mapped[str | None] = mapped_column(String(2000), nullable=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # 1, 2, 3... per cell; unique, so two writers cannot both create the next version
+    version_number: Mapped[int] = mapped_column(Integer, nullable=False)
     created_by_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
 
     created_by: Mapped["User"] = relationship("User", foreign_keys=[created_by_user_id])
@@ -24,6 +29,9 @@ class VersionedStringField(Base):
 
 class VersionedNumericField(Base):
     __tablename__ = "versioned_numeric_fields"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "field_name", "version_number", name="uq_versioned_numeric_fields_version"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     entity_type: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -31,6 +39,8 @@ class VersionedNumericField(Base):
     field_name: Mapped[str] = mapped_column(String(100), nullable=False)
     value: Mapped[float] = mapped_column(Numeric(15, 2), nullable=False)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # 1, 2, 3... per cell; unique, so two writers cannot both create the next version
+    version_number: Mapped[int] = mapped_column(Integer, nullable=False)
     created_by_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
 
     created_by: Mapped["User"] = relationship("User", foreign_keys=[created_by_user_id])
@@ -41,6 +51,9 @@ class VersionedNumericField(Base):
 
 class VersionedForeignKeyField(Base):
     __tablename__ = "versioned_foreign_key_fields"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "field_name", "version_number", name="uq_versioned_foreign_key_fields_version"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     entity_type: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -49,9 +62,44 @@ class VersionedForeignKeyField(Base):
     value_string: Mapped[str | None] = mapped_column(String(10), nullable=True)  # for kod-based FKs
     value_int: Mapped[int | None] = mapped_column(Integer, nullable=True)  # for id-based FKs
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # 1, 2, 3... per cell; unique, so two writers cannot both create the next version
+    version_number: Mapped[int] = mapped_column(Integer, nullable=False)
     created_by_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
 
     created_by: Mapped["User"] = relationship("User", foreign_keys=[created_by_user_id])
 
     def __repr__(self) -> str:
         return f"VersionedForeignKeyField(id={self.id!r}, field_name={self.field_name!r})"
+
+
+# Latest-value lookups filter on (entity_type, entity_id, field_name) and order by timestamp DESC.
+# Value columns are included so those lookups can be answered by index-only scans. The string
+# value (up to 2000 characters) is left out, it could exceed the maximum btree index row size.
+Index(
+    "ix_versioned_string_fields_lookup",
+    VersionedStringField.entity_type,
+    VersionedStringField.entity_id,
+    VersionedStringField.field_name,
+    VersionedStringField.timestamp.desc(),
+    VersionedStringField.id.desc(),
+)
+
+Index(
+    "ix_versioned_numeric_fields_lookup",
+    VersionedNumericField.entity_type,
+    VersionedNumericField.entity_id,
+    VersionedNumericField.field_name,
+    VersionedNumericField.timestamp.desc(),
+    VersionedNumericField.id.desc(),
+    postgresql_include=["value"],
+)
+
+Index(
+    "ix_versioned_foreign_key_fields_lookup",
+    VersionedForeignKeyField.entity_type,
+    VersionedForeignKeyField.entity_id,
+    VersionedForeignKeyField.field_name,
+    VersionedForeignKeyField.timestamp.desc(),
+    VersionedForeignKeyField.id.desc(),
+    postgresql_include=["value_string", "value_int"],
+)
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import desc, insert, values as values_clause, column, and_, Integer, String, DateTime
+from typing import Optional, List, Dict
+from datetime import datetime, timezone
 
 from src.database import get_db
 from src.schemas.planowanie_budzetu import PlanowanieBudzetu
 from src.schemas.rok_budzetowy import RokBudzetowy
 from src.schemas.users import User
+from src.schemas.current_state import PlanowanieBudzetuCurrent, RokBudzetowyCurrent
 from src.schemas.versioned_fields import (
     VersionedStringField,
     VersionedNumericField,
@@ -16,25 +20,201 @@ from src.schemas.versioned_fields import (
 from src.models.tabela_models import (
     PlanowanieBudzetuCreate,
     CellUpdate,
+    BatchCellUpdate,
+    LataBudzetoweUpdate,
+    BatchCellUpdateRequest,
+    BatchUpdateResponse,
+    ImportResponse,
     RokBudzetowyCreate,
     MessageResponse,
     UpdateResponse,
     PlanowanieBudzetuResponse,
     FieldHistoryResponse,
     FieldsHistoryStatusResponse,
+    FieldsHistoryStatusBulkResponse,
     RokBudzetowyResponse
 )
-from src.auth import get_current_user, validate_planowanie_access, validate_rok_budzetowy_access
+from src.auth import (
+    get_current_user,
+    validate_planowanie_access,
+    validate_planowanie_access_bulk,
+    validate_rok_budzetowy_access,
+    validate_rok_budzetowy_access_bulk,
+    visible_planowanie_ids
+)
+from src.excel_importer import ImportFileError, import_planowanie_budzetu
+from src.idempotency import IdempotentRequest, idempotent_request
+from src.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, sort_query
+from src.response_cache import cache_response, get_cached_response, get_versions_marker
 from src.versioning_utils import (
-    create_string_version,
-    create_numeric_version,
-    create_fk_version,
-    get_latest_version_for_field,
-    has_field_history
+    FIELD_TYPE_COLUMNS,
+    create_versions_bulk,
+    get_field_versions,
+    get_fields_history_status,
+    latest_values_subquery
 )
 
 router = APIRouter()
 
+# Versioned fields returned in responses, mapped to their field_type
+PLANOWANIE_BUDZETU_FIELDS = {
+    "nazwa_projektu": "string",
+    "nazwa_zadania": "string",
+    "szczegolowe_uzasadnienie_realizacji": "string",
+    "budzet": "string",
+    "czesc_budzetowa_kod": "fk_string",
+    "dzial_kod": "fk_string",
+    "rozdzial_kod": "fk_string",
+    "paragraf_kod": "fk_string",
+    "zrodlo_finansowania_kod": "fk_string",
+    "grupa_wydatkow_id": "fk_int",
+    "komorka_organizacyjna_id": "fk_int",
+}
+
+ROK_BUDZETOWY_FIELDS = {
+    "limit": "numeric",
+    "potrzeba": "numeric",
+}
+
+# Fields that can be changed with cell updates
+PLANOWANIE_BUDZETU_EDITABLE_FIELDS = {
+    **PLANOWANIE_BUDZETU_FIELDS,
+    "user_id": "fk_int",
+}
+
+
+def to_utc_naive(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Convert client timestamp to naive UTC, the way version timestamps are stored."""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def query_planowanie_budzetu_rows(
+    db: Session,
+    as_of: Optional[datetime] = None,
+    entity_ids: Optional[List[int]] = None
+):
+    """
+    Query response rows of PlanowanieBudzetu together with the columns they can be sorted by.
+    Values come from the current state projection, together with the `versions` of the cells,
+    or, with `as_of`, from the version tables as they stood at that moment (planowania created
+    later are left out, and no versions are returned).
+    """
+    if as_of is None:
+        values = {field_name: getattr(PlanowanieBudzetuCurrent, field_name) for field_name in PLANOWANIE_BUDZETU_FIELDS}
+        source, join_condition, outer = PlanowanieBudzetuCurrent, PlanowanieBudzetuCurrent.planowanie_budzetu_id == PlanowanieBudzetu.id, True
+        extra = [PlanowanieBudzetuCurrent.field_versions.label("versions")]
+    else:
+        snapshot = latest_values_subquery("planowanie_budzetu", PLANOWANIE_BUDZETU_FIELDS, entity_ids, to_utc_naive(as_of))
+        values = {field_name: snapshot.c[field_name] for field_name in PLANOWANIE_BUDZETU_FIELDS}
+        source, join_condition, outer = snapshot, snapshot.c.entity_id == PlanowanieBudzetu.id, False
+        extra = []
+
+    query = db.query(PlanowanieBudzetu.id, *values.values(), *extra).join(source, join_condition, isouter=outer)
+
+    if entity_ids is not None:
+        query = query.filter(PlanowanieBudzetu.id.in_(entity_ids))
+
+    return query, {"id": PlanowanieBudzetu.id, **values}
+
+
+def query_rok_budzetowy_rows(
+    db: Session,
+    as_of: Optional[datetime] = None,
+    entity_ids: Optional[List[int]] = None
+):
+    """
+    Query response rows of RokBudzetowy together with the columns they can be sorted by.
+    Values come from the current state projection, together with the `versions` of the cells,
+    or, with `as_of`, from the version tables as they stood at that moment (lata created later
+    are left out, and no versions are returned).
+    """
+    if as_of is None:
+        values = {field_name: getattr(RokBudzetowyCurrent, field_name) for field_name in ROK_BUDZETOWY_FIELDS}
+        source, join_condition, outer = RokBudzetowyCurrent, RokBudzetowyCurrent.rok_budzetowy_id == RokBudzetowy.id, True
+        extra = [RokBudzetowyCurrent.field_versions.label("versions")]
+    else:
+        snapshot = latest_values_subquery("rok_budzetowy", ROK_BUDZETOWY_FIELDS, entity_ids, to_utc_naive(as_of))
+        values = {field_name: snapshot.c[field_name] for field_name in ROK_BUDZETOWY_FIELDS}
+        source, join_condition, outer = snapshot, snapshot.c.entity_id == RokBudzetowy.id, False
+        extra = []
+
+    query = db.query(
+        RokBudzetowy.id,
+        RokBudzetowy.planowanie_budzetu_id,
+        RokBudzetowy.rok,
+        *values.values(),
+        *extra
+    ).join(source, join_condition, isouter=outer)
+
+    if entity_ids is not None:
+        query = query.filter(RokBudzetowy.id.in_(entity_ids))
+
+    sort_columns = {
+        "id": RokBudzetowy.id,
+        "planowanie_budzetu_id": RokBudzetowy.planowanie_budzetu_id,
+        "rok": RokBudzetowy.rok,
+        **values
+    }
+    return query, sort_columns
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+
+def stream_ndjson(query, response_model, prepare_batch=None):
+    """
+    Yield query rows as NDJSON, validated through response_model.
+    Rows are fetched from a server-side cursor in batches, so memory stays flat.
+    `prepare_batch` may complete each batch of row dicts before serialization.
+    """
+    def serialize(batch):
+        if prepare_batch:
+            prepare_batch(batch)
+        lines = [response_model.model_validate(row).model_dump_json(exclude_unset=True) for row in batch]
+        return "\n".join(lines) + "\n"
+
+    batch = []
+    for row in query.execution_options(yield_per=STREAM_BATCH_SIZE):
+        batch.append(row._asdict())
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield serialize(batch)
+            batch = []
+    if batch:
+        yield serialize(batch)
+
+
+# Related collections planowanie endpoints can embed with ?include=
+PLANOWANIE_BUDZETU_INCLUDES = {"lata"}
+
+
+def parse_include(include: Optional[str]) -> set:
+    """Parse comma separated ?include= value, rejecting unknown names."""
+    names = {name.strip() for name in include.split(",") if name.strip()} if include else set()
+    unknown = names - PLANOWANIE_BUDZETU_INCLUDES
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return names
+
+
+def attach_lata_budzetowe(db: Session, rows: List[dict], as_of: Optional[datetime] = None) -> List[dict]:
+    """
+    Embed lata_budzetowe of each planowanie row with their values.
+    Years of all rows are loaded with one query, whatever the number of rows.
+    """
+    lata = {row["id"]: [] for row in rows}
+    if lata:
+        query, _ = query_rok_budzetowy_rows(db, as_of)
+        query = query.filter(RokBudzetowy.planowanie_budzetu_id.in_(lata)).order_by(RokBudzetowy.rok, RokBudzetowy.id)
+        for rok in query:
+            lata[rok.planowanie_budzetu_id].append(rok._asdict())
+
+    for row in rows:
+        row["lata_budzetowe"] = lata[row["id"]]
+    return rows
+
 
 def check_field_conflict(
         db: Session,
@@ -48,63 +228,287 @@ def check_field_conflict(
     Checks if there are any versions of the field created AFTER the client_timestamp.
     If yes, raises HTTP 409 Conflict with the list of changes.
     """
-    conflicting_changes = []
+    conflicts = find_field_conflicts(db, entity_type, [(entity_id, field_name, field_type, client_timestamp)])
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Data has been modified by another user.",
+                "field": field_name,
+                "changes": jsonable_encoder(conflicts[(entity_id, field_name)])
+            }
+        )
 
-    if field_type == "string":
-        query = db.query(VersionedStringField).filter(
-            VersionedStringField.entity_type == entity_type,
-            VersionedStringField.entity_id == entity_id,
-            VersionedStringField.field_name == field_name,
-            VersionedStringField.timestamp > client_timestamp
-        ).order_by(desc(VersionedStringField.timestamp))
-
-        results = query.all()
-        conflicting_changes = [{"value": r.value, "timestamp": r.timestamp, "user_id": r.created_by} for r in results]
-
-    elif field_type == "numeric":
-        query = db.query(VersionedNumericField).filter(
-            VersionedNumericField.entity_type == entity_type,
-            VersionedNumericField.entity_id == entity_id,
-            VersionedNumericField.field_name == field_name,
-            VersionedNumericField.timestamp > client_timestamp
-        ).order_by(desc(VersionedNumericField.timestamp))
-
-        results = query.all()
-        conflicting_changes = [{"value": float(r.value), "timestamp": r.timestamp, "user_id": r.created_by} for r in
-                               results]
-
-    elif field_type in ["fk_string", "fk_int"]:
-        query = db.query(VersionedForeignKeyField).filter(
-            VersionedForeignKeyField.entity_type == entity_type,
-            VersionedForeignKeyField.entity_id == entity_id,
-            VersionedForeignKeyField.field_name == field_name,
-            VersionedForeignKeyField.timestamp > client_timestamp
-        ).order_by(desc(VersionedForeignKeyField.timestamp))
-
-        results = query.all()
-        for r in results:
-            val = r.value_int if field_type == "fk_int" else r.value_string
-            conflicting_changes.append({"value": val, "timestamp": r.timestamp, "user_id": r.created_by})
-
-    if conflicting_changes:
+
+def check_version_conflict(
+        db: Session,
+        entity_type: str,
+        entity_id: int,
+        field_name: str,
+        field_type: str,
+        expected_version: int
+):
+    """
+    Checks that the field is still at expected_version (one primary key lookup in the
+    current state projection). If not, raises HTTP 409 Conflict with the newer versions.
+    """
+    conflicts = find_version_conflicts(db, entity_type, [(entity_id, field_name, field_type, expected_version)])
+    if conflicts:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={
                 "message": "Data has been modified by another user.",
                 "field": field_name,
-                "changes": conflicting_changes
+                "changes": jsonable_encoder(conflicts[(entity_id, field_name)])
             }
         )
 
 
-@router.get("/admin/planowanie_budzetu", response_model=List[PlanowanieBudzetuResponse])
-async def get_admin_all_planowanie_budzetu(
+def find_field_conflicts(
+        db: Session,
+        entity_type: str,
+        cells: List[tuple[int, str, str, datetime | int]],
+        bound: str = "timestamp"
+) -> Dict[tuple[int, str], List[dict]]:
+    """
+    Set-based check_field_conflict for many cells given as
+    (entity_id, field_name, field_type, client_timestamp), or with bound="version_number"
+    as (entity_id, field_name, field_type, expected_version).
+    Runs one query per versioned table joining the cells as a VALUES list.
+    Returns {(entity_id, field_name): [changes]} for conflicting cells only.
+    """
+    # The earliest client timestamp (lowest expected version) of a cell decides
+    earliest = {}
+    for entity_id, field_name, field_type, seen in cells:
+        key = (entity_id, field_name)
+        if bound == "timestamp":
+            seen = to_utc_naive(seen)
+        if key not in earliest or seen < earliest[key][1]:
+            earliest[key] = (field_type, seen)
+
+    by_model = {}
+    for (entity_id, field_name), (field_type, seen) in earliest.items():
+        model, _ = FIELD_TYPE_COLUMNS[field_type]
+        by_model.setdefault(model, []).append((entity_id, field_name, seen))
+
+    conflicts = {}
+    for model, rows in by_model.items():
+        cells_values = values_clause(
+            column("entity_id", Integer),
+            column("field_name", String),
+            column("seen", DateTime if bound == "timestamp" else Integer),
+            name="cells"
+        ).data(rows)
+
+        versions = db.query(model).join(
+            cells_values,
+            and_(
+                cells_values.c.entity_id == model.entity_id,
+                cells_values.c.field_name == model.field_name,
+                getattr(model, bound) > cells_values.c.seen
+            )
+        ).filter(
+            model.entity_type == entity_type
+        ).order_by(desc(model.timestamp), desc(model.version_number)).all()
+
+        for v in versions:
+            key = (v.entity_id, v.field_name)
+            _, value_column = FIELD_TYPE_COLUMNS[earliest[key][0]]
+            value = getattr(v, value_column)
+            conflicts.setdefault(key, []).append({
+                "value": float(value) if model is VersionedNumericField else value,
+                "timestamp": v.timestamp,
+                "user_id": v.created_by_user_id,
+                "version": v.version_number
+            })
+
+    return conflicts
+
+
+def find_version_conflicts(
+        db: Session,
+        entity_type: str,
+        cells: List[tuple[int, str, str, int]]
+) -> Dict[tuple[int, str], List[dict]]:
+    """
+    Conflicts of cells given as (entity_id, field_name, field_type, expected_version).
+    The expected versions are compared with field_versions of the current state projection;
+    the newer versions are loaded only for the cells that are actually stale.
+    Returns {(entity_id, field_name): [changes]} for conflicting cells only.
+    """
+    current = get_field_versions(db, entity_type, {entity_id for entity_id, _, _, _ in cells})
+    stale = [
+        cell for cell in cells
+        if current.get(cell[0], {}).get(cell[1], 0) != cell[3]
+    ]
+    if not stale:
+        return {}
+
+    changes = find_field_conflicts(db, entity_type, stale, bound="version_number")
+    # A stale expected_version (e.g. ahead of the cell) is a conflict even without newer versions
+    return {(entity_id, field_name): changes.get((entity_id, field_name), []) for entity_id, field_name, _, _ in stale}
+
+
+def write_cell_versions(
+        db: Session,
+        entity_type: str,
+        versions: List[tuple[int, str, str, object]],
+        user_id: int,
+        expected_versions: Optional[List[Optional[int]]] = None
+) -> List[tuple[int, bool]]:
+    """
+    create_versions_bulk, returning (version_number, changed) of each cell; the caller commits.
+    When another transaction wrote one of the cells after the conflict check, either the
+    unique version_number constraint fails or the version is not the expected one
+    (expected_version + 1, or expected_version for an unchanged value);
+    the transaction is then rolled back and HTTP 409 Conflict raised.
+    """
+    try:
+        written = create_versions_bulk(db, entity_type, versions, user_id)
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        written = None
+
+    if written is not None and expected_versions:
+        if any(
+            expected is not None and number != expected + (1 if changed else 0)
+            for (number, changed), expected in zip(written, expected_versions)
+        ):
+            db.rollback()
+            written = None
+
+    if written is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Data has been modified by another user.", "changes": []}
+        )
+
+    return written
+
+
+def coerce_cell_value(field_name: str, field_type: str, value, current_user: User):
+    """Convert a CellUpdate value to the type of the field, raising HTTPException for invalid values."""
+    if field_type == "string":
+        return str(value) if value is not None else None
+
+    if value is None:
+        raise HTTPException(status_code=400, detail=f"Field {field_name} cannot be null")
+
+    try:
+        if field_type == "numeric":
+            return float(value)
+        if field_type == "fk_string":
+            return str(value)
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid value for field {field_name}")
+
+    # Validate komorka_organizacyjna_id changes
+    if field_name == "komorka_organizacyjna_id" and value != current_user.komorka_organizacyjna_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Cannot change planowanie to a different organizational unit"
+        )
+    return value
+
+
+def apply_cell_updates(
+        db: Session,
+        entity_type: str,
+        editable_fields: Dict[str, str],
+        updates: List[BatchCellUpdate],
+        current_user: User
+) -> List[dict]:
+    """
+    Apply many cell updates and return a result per update; the caller commits.
+    Cells with an unknown field, invalid value or conflicting newer version (checked by
+    expected_version, or last_known_timestamp when no version is given) are reported and
+    skipped; all other cells are written with create_versions_bulk, which reports cells
+    already holding the value as "unchanged".
+    A cell updated more than once is written once with the last value, checked against the
+    first expected_version (last_known_timestamp) given for it; all its updates get its result.
+    Access to the entities must be validated by the caller.
+    """
+    cells = {}
+    for u in updates:
+        first = cells.get((u.id, u.field))
+        if first is not None:
+            u = u.model_copy(update={
+                "expected_version": first.expected_version if first.expected_version is not None else u.expected_version,
+                "last_known_timestamp": first.last_known_timestamp or u.last_known_timestamp,
+            })
+        cells[(u.id, u.field)] = u
+
+    conflicts = find_version_conflicts(db, entity_type, [
+        (u.id, u.field, editable_fields[u.field], u.expected_version)
+        for u in cells.values()
+        if u.field in editable_fields and u.expected_version is not None
+    ])
+    conflicts.update(find_field_conflicts(db, entity_type, [
+        (u.id, u.field, editable_fields[u.field], u.last_known_timestamp)
+        for u in cells.values()
+        if u.field in editable_fields and u.expected_version is None and u.last_known_timestamp
+    ]))
+
+    results = {}
+    pending = []
+    expected_versions = []
+    for key, u in cells.items():
+        result = {"id": u.id, "field": u.field, "value": u.value}
+        try:
+            if u.field not in editable_fields:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {u.field}")
+
+            if key in conflicts:
+                results[key] = {
+                    **result,
+                    "status": "conflict",
+                    "message": "Data has been modified by another user.",
+                    "changes": conflicts[key]
+                }
+                continue
+
+            value = coerce_cell_value(u.field, editable_fields[u.field], u.value, current_user)
+        except HTTPException as e:
+            results[key] = {**result, "status": "error", "message": e.detail}
+            continue
+
+        pending.append((u.id, u.field, editable_fields[u.field], value))
+        expected_versions.append(u.expected_version)
+        results[key] = {**result, "status": "updated", "message": "Updated successfully"}
+
+    if pending:
+        written = write_cell_versions(db, entity_type, pending, current_user.id, expected_versions)
+        updated = [result for result in results.values() if result["status"] == "updated"]
+        for result, (version, changed) in zip(updated, written):
+            result["version"] = version
+            if not changed:
+                result.update(status="unchanged", message="Value unchanged")
+
+    return [results[(u.id, u.field)] for u in updates]
+
+
+@router.get("/admin/planowanie_budzetu", response_model=List[PlanowanieBudzetuResponse], response_model_exclude_unset=True)
+def get_admin_all_planowanie_budzetu(
+        response: Response,
+        sort: str = "id",
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+        as_of: Optional[datetime] = None,
+        include: Optional[str] = None,
+        accept: Optional[str] = Header(None),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """
     Admin endpoint (user_id=0 only).
     Returns budget planning for ALL organizational units without filtering.
+    Supports sorting and keyset pagination, see src/pagination.py.
+    With `as_of` returns the values as they stood at that moment.
+    With `include=lata` every row embeds its lata_budzetowe.
+    With `Accept: application/x-ndjson` rows are streamed one JSON object per line.
+    Without `as_of` the JSON response is cached until a new version is written, see src/response_cache.py.
     """
     # 1. Authorization Check
     if current_user.id != 0:
@@ -113,42 +517,50 @@ async def get_admin_all_planowanie_budzetu(
             detail="Access denied. Only administrator (ID 0) can access this data."
         )
 
-    # 2. Get All Records
-    planowania = db.query(PlanowanieBudzetu).all()
-    result = []
-
-    # 3. Construct Response (Fetching latest versions for all fields)
-    for p in planowania:
-        result.append({
-            "id": p.id,
-            "nazwa_projektu": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_projektu", "string"),
-            "nazwa_zadania": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_zadania", "string"),
-            "szczegolowe_uzasadnienie_realizacji": get_latest_version_for_field(db, "planowanie_budzetu", p.id,
-                                                                                "szczegolowe_uzasadnienie_realizacji",
-                                                                                "string"),
-            "budzet": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "budzet", "string"),
-            "czesc_budzetowa_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "czesc_budzetowa_kod",
-                                                                "fk_string"),
-            "dzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "dzial_kod", "fk_string"),
-            "rozdzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "rozdzial_kod", "fk_string"),
-            "paragraf_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "paragraf_kod", "fk_string"),
-            "zrodlo_finansowania_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id,
-                                                                    "zrodlo_finansowania_kod", "fk_string"),
-            "grupa_wydatkow_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "grupa_wydatkow_id",
-                                                              "fk_int"),
-            "komorka_organizacyjna_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id,
-                                                                     "komorka_organizacyjna_id", "fk_int")
-        })
-
-    return result
+    includes = parse_include(include)
+    query, sort_columns = query_planowanie_budzetu_rows(db, as_of)
+
+    # 2. Stream rows from a server-side cursor for ETL consumers
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        query = sort_query(query, sort_columns, PlanowanieBudzetu.id, sort, after)
+        if limit is not None:
+            query = query.limit(limit)
+        prepare_batch = (lambda batch: attach_lata_budzetowe(db, batch, as_of)) if "lata" in includes else None
+        return StreamingResponse(
+            stream_ndjson(query, PlanowanieBudzetuResponse, prepare_batch),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    # 3. Dashboards poll this list, serve it from cache while no version was written
+    if as_of is None:
+        cache_key = ("admin/planowanie_budzetu", sort, limit, after, frozenset(includes))
+        marker, stable = get_versions_marker(db)
+        cached = get_cached_response(cache_key, marker)
+        if cached is not None:
+            return cached
+
+    # 4. Get All Records with values of all fields
+    rows = paginate(query, sort_columns, PlanowanieBudzetu.id, sort, limit, after, response)
+    if "lata" in includes:
+        attach_lata_budzetowe(db, rows, as_of)
+    if as_of is not None:
+        return rows
+
+    body = b"[" + b",".join(
+        PlanowanieBudzetuResponse.model_validate(row).model_dump_json(exclude_unset=True).encode("utf-8")
+        for row in rows
+    ) + b"]"
+    headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else {}
+    return cache_response(cache_key, marker, stable, body, headers)
 
 
 # PlanowanieBudzetu endpoints
 @router.post("/planowanie_budzetu", response_model=MessageResponse)
-async def create_planowanie_budzetu(
+def create_planowanie_budzetu(
     data: PlanowanieBudzetuCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     # Validate that user belongs to the specified komorka_organizacyjna
     if current_user.komorka_organizacyjna_id != data.komorka_organizacyjna_id:
@@ -156,162 +568,190 @@ async def create_planowanie_budzetu(
             status_code=403,
             detail="Cannot create planowanie for a different organizational unit"
         )
+
+    # A retry of an already handled request gets the original response
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
     
     # Create main record
     planowanie = PlanowanieBudzetu()
     db.add(planowanie)
     db.flush()
     
-    # Create versioned fields
-    create_string_version(db, "planowanie_budzetu", planowanie.id, "nazwa_projektu", data.nazwa_projektu, current_user.id)
-    create_string_version(db, "planowanie_budzetu", planowanie.id, "nazwa_zadania", data.nazwa_zadania, current_user.id)
-    create_string_version(db, "planowanie_budzetu", planowanie.id, "szczegolowe_uzasadnienie_realizacji", data.szczegolowe_uzasadnienie_realizacji, current_user.id)
-    create_string_version(db, "planowanie_budzetu", planowanie.id, "budzet", data.budzet, current_user.id)
-    
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "czesc_budzetowa_kod", value_string=data.czesc_budzetowa_kod, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "dzial_kod", value_string=data.dzial_kod, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "rozdzial_kod", value_string=data.rozdzial_kod, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "paragraf_kod", value_string=data.paragraf_kod, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "zrodlo_finansowania_kod", value_string=data.zrodlo_finansowania_kod, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "grupa_wydatkow_id", value_int=data.grupa_wydatkow_id, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "komorka_organizacyjna_id", value_int=data.komorka_organizacyjna_id, user_id=current_user.id)
-    create_fk_version(db, "planowanie_budzetu", planowanie.id, "user_id", value_int=current_user.id, user_id=current_user.id)
+    # Create versioned fields, one insert per versioned table
+    versions = [
+        (planowanie.id, field_name, field_type, getattr(data, field_name))
+        for field_name, field_type in PLANOWANIE_BUDZETU_FIELDS.items()
+    ]
+    versions.append((planowanie.id, "user_id", "fk_int", current_user.id))
+    create_versions_bulk(db, "planowanie_budzetu", versions, current_user.id)
     
-    db.commit()
-    db.refresh(planowanie)
-    
-    return {"id": planowanie.id, "message": "Created successfully"}
+    return idempotency.commit({"id": planowanie.id, "message": "Created successfully"})
+
+
+@router.post("/planowanie_budzetu/import", response_model=ImportResponse)
+def import_planowanie_budzetu_excel(
+    file: UploadFile = File(...),
+    rok: int = Query(..., description="Year of the N columns (Potrzeby (N), Limit (N)) in the sheet"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import planowanie rows from an .xlsx sheet in the export_entries_to_excel layout into
+    the user's komorka. Invalid rows are skipped and reported, see src/excel_importer.py.
+    """
+    try:
+        return import_planowanie_budzetu(db, file.file, rok, current_user)
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/planowanie_budzetu:batch", response_model=BatchUpdateResponse)
+def update_planowanie_budzetu_cells(
+        data: BatchCellUpdateRequest,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        idempotency: IdempotentRequest = Depends(idempotent_request)
+):
+    """
+    Update many cells (e.g. a paste from Excel) in one transaction.
+    Returns a result per cell; cells in conflict or with invalid values are not written.
+    """
+    # Validate access once per planowanie
+    validate_planowanie_access_bulk({u.id for u in data.updates}, current_user, db)
+
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
+
+    results = apply_cell_updates(db, "planowanie_budzetu", PLANOWANIE_BUDZETU_EDITABLE_FIELDS, data.updates, current_user)
+    return idempotency.commit({"results": results})
 
 
 @router.patch("/planowanie_budzetu/{planowanie_id}", response_model=UpdateResponse)
-async def update_planowanie_budzetu_cell(
+def update_planowanie_budzetu_cell(
         planowanie_id: int,
         data: CellUpdate,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(get_current_user),
+        idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     # Validate access
     validate_planowanie_access(planowanie_id, current_user, db)
 
-    planowanie = db.query(PlanowanieBudzetu).filter(PlanowanieBudzetu.id == planowanie_id).first()
-    if not planowanie:
-        raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
 
-    # Define field categories
-    string_fields = ["nazwa_projektu", "nazwa_zadania", "szczegolowe_uzasadnienie_realizacji", "budzet"]
-    fk_string_fields = ["czesc_budzetowa_kod", "dzial_kod", "rozdzial_kod", "paragraf_kod", "zrodlo_finansowania_kod"]
-    fk_int_fields = ["grupa_wydatkow_id", "komorka_organizacyjna_id", "user_id"]
+    field_type = PLANOWANIE_BUDZETU_EDITABLE_FIELDS.get(data.field)
 
     # --- Conflict Detection Logic ---
-    if data.last_known_timestamp:
-        field_type = None
-        if data.field in string_fields:
-            field_type = "string"
-        elif data.field in fk_string_fields:
-            field_type = "fk_string"
-        elif data.field in fk_int_fields:
-            field_type = "fk_int"
-
-        if field_type:
-            check_field_conflict(
-                db=db,
-                entity_type="planowanie_budzetu",
-                entity_id=planowanie_id,
-                field_name=data.field,
-                field_type=field_type,
-                client_timestamp=data.last_known_timestamp
-            )
+    if data.expected_version is not None and field_type:
+        check_version_conflict(
+            db=db,
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name=data.field,
+            field_type=field_type,
+            expected_version=data.expected_version
+        )
+    elif data.last_known_timestamp and field_type:
+        check_field_conflict(
+            db=db,
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name=data.field,
+            field_type=field_type,
+            client_timestamp=data.last_known_timestamp
+        )
     # -------------------------------
 
-    if data.field in string_fields:
-        create_string_version(db, "planowanie_budzetu", planowanie_id, data.field, str(data.value) if data.value is not None else None, current_user.id)
-    elif data.field in fk_string_fields:
-        if data.value is None:
-            raise HTTPException(status_code=400, detail=f"Field {data.field} cannot be null")
-        create_fk_version(db, "planowanie_budzetu", planowanie_id, data.field, value_string=str(data.value), user_id=current_user.id)
-    elif data.field in fk_int_fields:
-        if data.value is None:
-            raise HTTPException(status_code=400, detail=f"Field {data.field} cannot be null")
-
-        # Validate komorka_organizacyjna_id changes
-        if data.field == "komorka_organizacyjna_id" and int(data.value) != current_user.komorka_organizacyjna_id:
-            raise HTTPException(
-                status_code=403,
-                detail="Cannot change planowanie to a different organizational unit"
-            )
-        
-        create_fk_version(db, "planowanie_budzetu", planowanie_id, data.field, value_int=int(data.value), user_id=current_user.id)
-    else:
+    if not field_type:
         raise HTTPException(status_code=400, detail=f"Unknown field: {data.field}")
 
-    db.commit()
+    value = coerce_cell_value(data.field, field_type, data.value, current_user)
+    [(version, changed)] = write_cell_versions(
+        db, "planowanie_budzetu", [(planowanie_id, data.field, field_type, value)], current_user.id, [data.expected_version]
+    )
 
-    return {"id": planowanie_id, "field": data.field, "value": data.value, "message": "Updated successfully"}
+    return idempotency.commit({
+        "id": planowanie_id,
+        "field": data.field,
+        "value": data.value,
+        "message": "Updated successfully" if changed else "Value unchanged",
+        "version": version,
+        "changed": changed
+    })
 
-@router.get("/planowanie_budzetu", response_model=List[PlanowanieBudzetuResponse])
-async def get_all_planowanie_budzetu(
+@router.get("/planowanie_budzetu", response_model=List[PlanowanieBudzetuResponse], response_model_exclude_unset=True)
+def get_all_planowanie_budzetu(
+    response: Response,
+    sort: str = "id",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    include: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get all planowania
-    planowania = db.query(PlanowanieBudzetu).all()
-    result = []
-    
-    for p in planowania:
-        # Filter by user's komorka_organizacyjna
-        komorka_id = get_latest_version_for_field(db, "planowanie_budzetu", p.id, "komorka_organizacyjna_id", "fk_int")
-        if komorka_id != current_user.komorka_organizacyjna_id:
-            continue
-        
-        result.append({
-            "id": p.id,
-            "nazwa_projektu": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_projektu", "string"),
-            "nazwa_zadania": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_zadania", "string"),
-            "szczegolowe_uzasadnienie_realizacji": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "szczegolowe_uzasadnienie_realizacji", "string"),
-            "budzet": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "budzet", "string"),
-            "czesc_budzetowa_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "czesc_budzetowa_kod", "fk_string"),
-            "dzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "dzial_kod", "fk_string"),
-            "rozdzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "rozdzial_kod", "fk_string"),
-            "paragraf_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "paragraf_kod", "fk_string"),
-            "zrodlo_finansowania_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "zrodlo_finansowania_kod", "fk_string"),
-            "grupa_wydatkow_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "grupa_wydatkow_id", "fk_int"),
-            "komorka_organizacyjna_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "komorka_organizacyjna_id", "fk_int")
-        })
+    includes = parse_include(include)
+    query, sort_columns = query_planowanie_budzetu_rows(db, as_of)
+
+    # Filter by user's komorka_organizacyjna
+    if as_of is None:
+        query = query.filter(
+            PlanowanieBudzetuCurrent.komorka_organizacyjna_id == current_user.komorka_organizacyjna_id
+        )
+    else:
+        visible = visible_planowanie_ids(current_user)
+        query = query.join(visible, visible.c.planowanie_budzetu_id == PlanowanieBudzetu.id)
+
+    rows = paginate(query, sort_columns, PlanowanieBudzetu.id, sort, limit, after, response)
+    if "lata" in includes:
+        attach_lata_budzetowe(db, rows, as_of)
+    return rows
+
+
+@router.get("/planowanie_budzetu/fields_history_status", response_model=FieldsHistoryStatusBulkResponse)
+def get_planowanie_budzetu_fields_history_status_bulk(
+    ids: List[int] = Query(..., max_length=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get status of which fields have history for many planowania (?ids=1&ids=2...)"""
+    # Validate access
+    validate_planowanie_access_bulk(ids, current_user, db)
     
-    return result
+    return {"entities": get_fields_history_status(db, "planowanie_budzetu", set(ids), PLANOWANIE_BUDZETU_FIELDS)}
 
 
-@router.get("/planowanie_budzetu/{planowanie_id}", response_model=PlanowanieBudzetuResponse)
-async def get_planowanie_budzetu(
+@router.get("/planowanie_budzetu/{planowanie_id}", response_model=PlanowanieBudzetuResponse, response_model_exclude_unset=True)
+def get_planowanie_budzetu(
     planowanie_id: int,
+    as_of: Optional[datetime] = None,
+    include: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    includes = parse_include(include)
+
     # Validate access
     validate_planowanie_access(planowanie_id, current_user, db)
     
-    p = db.query(PlanowanieBudzetu).filter(PlanowanieBudzetu.id == planowanie_id).first()
-    if not p:
+    query, _ = query_planowanie_budzetu_rows(db, as_of, [planowanie_id])
+    row = query.first()
+    if not row:
         raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
     
-    return {
-        "id": p.id,
-        "nazwa_projektu": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_projektu", "string"),
-        "nazwa_zadania": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "nazwa_zadania", "string"),
-        "szczegolowe_uzasadnienie_realizacji": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "szczegolowe_uzasadnienie_realizacji", "string"),
-        "budzet": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "budzet", "string"),
-        "czesc_budzetowa_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "czesc_budzetowa_kod", "fk_string"),
-        "dzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "dzial_kod", "fk_string"),
-        "rozdzial_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "rozdzial_kod", "fk_string"),
-        "paragraf_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "paragraf_kod", "fk_string"),
-        "zrodlo_finansowania_kod": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "zrodlo_finansowania_kod", "fk_string"),
-        "grupa_wydatkow_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "grupa_wydatkow_id", "fk_int"),
-        "komorka_organizacyjna_id": get_latest_version_for_field(db, "planowanie_budzetu", p.id, "komorka_organizacyjna_id", "fk_int")
-    }
+    row = row._asdict()
+    if "lata" in includes:
+        attach_lata_budzetowe(db, [row], as_of)
+    return row
 
 
 @router.get("/planowanie_budzetu/{planowanie_id}/fields_history_status", response_model=FieldsHistoryStatusResponse)
-async def get_planowanie_budzetu_fields_history_status(
+def get_planowanie_budzetu_fields_history_status(
     planowanie_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -320,29 +760,15 @@ async def get_planowanie_budzetu_fields_history_status(
     # Validate access
     validate_planowanie_access(planowanie_id, current_user, db)
     
-    p = db.query(PlanowanieBudzetu).filter(PlanowanieBudzetu.id == planowanie_id).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
-    
-    fields_status = {
-        "nazwa_projektu": has_field_history(db, "planowanie_budzetu", planowanie_id, "nazwa_projektu", "string"),
-        "nazwa_zadania": has_field_history(db, "planowanie_budzetu", planowanie_id, "nazwa_zadania", "string"),
-        "szczegolowe_uzasadnienie_realizacji": has_field_history(db, "planowanie_budzetu", planowanie_id, "szczegolowe_uzasadnienie_realizacji", "string"),
-        "budzet": has_field_history(db, "planowanie_budzetu", planowanie_id, "budzet", "string"),
-        "czesc_budzetowa_kod": has_field_history(db, "planowanie_budzetu", planowanie_id, "czesc_budzetowa_kod", "fk_string"),
-        "dzial_kod": has_field_history(db, "planowanie_budzetu", planowanie_id, "dzial_kod", "fk_string"),
-        "rozdzial_kod": has_field_history(db, "planowanie_budzetu", planowanie_id, "rozdzial_kod", "fk_string"),
-        "paragraf_kod": has_field_history(db, "planowanie_budzetu", planowanie_id, "paragraf_kod", "fk_string"),
-        "zrodlo_finansowania_kod": has_field_history(db, "planowanie_budzetu", planowanie_id, "zrodlo_finansowania_kod", "fk_string"),
-        "grupa_wydatkow_id": has_field_history(db, "planowanie_budzetu", planowanie_id, "grupa_wydatkow_id", "fk_int"),
-        "komorka_organizacyjna_id": has_field_history(db, "planowanie_budzetu", planowanie_id, "komorka_organizacyjna_id", "fk_int")
-    }
+    fields_status = get_fields_history_status(
+        db, "planowanie_budzetu", [planowanie_id], PLANOWANIE_BUDZETU_FIELDS
+    )[planowanie_id]
     
     return {"fields": fields_status}
 
 
 @router.get("/planowanie_budzetu/{planowanie_id}/field_history/{field_name}", response_model=FieldHistoryResponse)
-async def get_planowanie_budzetu_field_history(
+def get_planowanie_budzetu_field_history(
     planowanie_id: int,
     field_name: str,
     db: Session = Depends(get_db),
@@ -351,10 +777,6 @@ async def get_planowanie_budzetu_field_history(
     # Validate access
     validate_planowanie_access(planowanie_id, current_user, db)
     
-    p = db.query(PlanowanieBudzetu).filter(PlanowanieBudzetu.id == planowanie_id).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
-    
     string_fields = ["nazwa_projektu", "nazwa_zadania", "szczegolowe_uzasadnienie_realizacji", "budzet"]
     fk_string_fields = ["czesc_budzetowa_kod", "dzial_kod", "rozdzial_kod", "paragraf_kod", "zrodlo_finansowania_kod"]
     fk_int_fields = ["grupa_wydatkow_id", "komorka_organizacyjna_id"]
@@ -394,19 +816,84 @@ async def get_planowanie_budzetu_field_history(
 
 
 # RokBudzetowy endpoints
+def lock_planowanie(db: Session, planowanie_id: int) -> None:
+    """
+    Lock the planowanie row until the end of the transaction, so that requests creating
+    lata budzetowe of it run one at a time and cannot both create the same year.
+    """
+    db.query(PlanowanieBudzetu.id).filter(PlanowanieBudzetu.id == planowanie_id).with_for_update().one()
+
+
+@router.put("/planowanie_budzetu/{planowanie_id}/lata_budzetowe", response_model=List[RokBudzetowyResponse])
+def put_lata_budzetowe(
+        planowanie_id: int,
+        data: LataBudzetoweUpdate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Create or update many lata budzetowe of a planowanie (e.g. years N to N+3) in one transaction.
+    Years the planowanie already has are matched by `rok` and get versions of the changed
+    values; the others are created. Years not in the request are left as they are.
+    Returns all the years from the request with their current values.
+    """
+    # Validate access (and that the planowanie exists) once for all years
+    validate_planowanie_access(planowanie_id, current_user, db)
+
+    years = [rok.rok for rok in data.lata]
+    if len(set(years)) != len(years):
+        raise HTTPException(status_code=400, detail="Each rok can be given only once")
+
+    lock_planowanie(db, planowanie_id)
+
+    rok_ids = dict(db.query(RokBudzetowy.rok, RokBudzetowy.id).filter(
+        RokBudzetowy.planowanie_budzetu_id == planowanie_id,
+        RokBudzetowy.rok.in_(years)
+    ).all())
+
+    # New years with one multi-row insert
+    new_years = [rok for rok in years if rok not in rok_ids]
+    if new_years:
+        table = RokBudzetowy.__table__
+        created = db.execute(
+            insert(table).returning(table.c.rok, table.c.id, sort_by_parameter_order=True),
+            [{"planowanie_budzetu_id": planowanie_id, "rok": rok} for rok in new_years]
+        )
+        rok_ids.update(created.all())
+
+    # A concurrent PATCH of one of the cells ends in 409 Conflict
+    write_cell_versions(db, "rok_budzetowy", [
+        (rok_ids[rok.rok], field_name, field_type, getattr(rok, field_name))
+        for rok in data.lata
+        for field_name, field_type in ROK_BUDZETOWY_FIELDS.items()
+    ], current_user.id)
+    db.commit()
+
+    query, _ = query_rok_budzetowy_rows(db, entity_ids=list(rok_ids.values()))
+    return [row._asdict() for row in query.order_by(RokBudzetowy.rok)]
+
+
 @router.post("/rok_budzetowy", response_model=MessageResponse)
-async def create_rok_budzetowy(
+def create_rok_budzetowy(
     data: RokBudzetowyCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     # Validate access to parent planowanie
     validate_planowanie_access(data.planowanie_budzetu_id, current_user, db)
-    
-    # Verify planowanie_budzetu exists
-    planowanie = db.query(PlanowanieBudzetu).filter(PlanowanieBudzetu.id == data.planowanie_budzetu_id).first()
-    if not planowanie:
-        raise HTTPException(status_code=404, detail="PlanowanieBudzetu not found")
+
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
+
+    lock_planowanie(db, data.planowanie_budzetu_id)
+    existing = db.query(RokBudzetowy.id).filter(
+        RokBudzetowy.planowanie_budzetu_id == data.planowanie_budzetu_id,
+        RokBudzetowy.rok == data.rok
+    ).first()
+    if existing:
+        raise HTTPException(status_code=409, detail=f"Rok {data.rok} already exists for this planowanie")
     
     # Create main record with rok field
     rok = RokBudzetowy(
@@ -417,105 +904,146 @@ async def create_rok_budzetowy(
     db.flush()
     
     # Create versioned fields
-    create_numeric_version(db, "rok_budzetowy", rok.id, "limit", data.limit, current_user.id)
-    create_numeric_version(db, "rok_budzetowy", rok.id, "potrzeba", data.potrzeba, current_user.id)
-    
-    db.commit()
-    db.refresh(rok)
+    create_versions_bulk(db, "rok_budzetowy", [
+        (rok.id, field_name, field_type, getattr(data, field_name))
+        for field_name, field_type in ROK_BUDZETOWY_FIELDS.items()
+    ], current_user.id)
     
-    return {"id": rok.id, "message": "Created successfully"}
+    return idempotency.commit({"id": rok.id, "message": "Created successfully"})
+
+
+@router.patch("/rok_budzetowy:batch", response_model=BatchUpdateResponse)
+def update_rok_budzetowy_cells(
+        data: BatchCellUpdateRequest,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        idempotency: IdempotentRequest = Depends(idempotent_request)
+):
+    """
+    Update many cells of lata budzetowe in one transaction.
+    Returns a result per cell; cells in conflict or with invalid values are not written.
+    """
+    # Validate access once per rok
+    validate_rok_budzetowy_access_bulk({u.id for u in data.updates}, current_user, db)
+
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
+
+    results = apply_cell_updates(db, "rok_budzetowy", ROK_BUDZETOWY_FIELDS, data.updates, current_user)
+    return idempotency.commit({"results": results})
 
 
 @router.patch("/rok_budzetowy/{rok_id}", response_model=UpdateResponse)
-async def update_rok_budzetowy_cell(
+def update_rok_budzetowy_cell(
         rok_id: int,
         data: CellUpdate,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(get_current_user),
+        idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     # Validate access
     validate_rok_budzetowy_access(rok_id, current_user, db)
 
-    rok = db.query(RokBudzetowy).filter(RokBudzetowy.id == rok_id).first()
-    if not rok:
-        raise HTTPException(status_code=404, detail="RokBudzetowy not found")
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
 
-    numeric_fields = ["limit", "potrzeba"]
+    field_type = ROK_BUDZETOWY_FIELDS.get(data.field)
 
     # --- Conflict Detection Logic ---
-    if data.last_known_timestamp:
-        if data.field in numeric_fields:
-            check_field_conflict(
-                db=db,
-                entity_type="rok_budzetowy",
-                entity_id=rok_id,
-                field_name=data.field,
-                field_type="numeric",
-                client_timestamp=data.last_known_timestamp
-            )
+    if data.expected_version is not None and field_type:
+        check_version_conflict(
+            db=db,
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name=data.field,
+            field_type=field_type,
+            expected_version=data.expected_version
+        )
+    elif data.last_known_timestamp and field_type:
+        check_field_conflict(
+            db=db,
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name=data.field,
+            field_type=field_type,
+            client_timestamp=data.last_known_timestamp
+        )
     # -------------------------------
 
-    if data.field in numeric_fields:
-        if data.value is None:
-            raise HTTPException(status_code=400, detail=f"Field {data.field} cannot be null")
-        create_numeric_version(db, "rok_budzetowy", rok_id, data.field, float(data.value), current_user.id)
-    else:
+    if not field_type:
         raise HTTPException(status_code=400, detail=f"Unknown field: {data.field}")
 
-    db.commit()
+    value = coerce_cell_value(data.field, field_type, data.value, current_user)
+    [(version, changed)] = write_cell_versions(
+        db, "rok_budzetowy", [(rok_id, data.field, field_type, value)], current_user.id, [data.expected_version]
+    )
 
-    return {"id": rok_id, "field": data.field, "value": data.value, "message": "Updated successfully"}
+    return idempotency.commit({
+        "id": rok_id,
+        "field": data.field,
+        "value": data.value,
+        "message": "Updated successfully" if changed else "Value unchanged",
+        "version": version,
+        "changed": changed
+    })
 
 @router.get("/rok_budzetowy", response_model=List[RokBudzetowyResponse])
-async def get_all_rok_budzetowy(
+def get_all_rok_budzetowy(
+    response: Response,
+    sort: str = "id",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    as_of: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lata = db.query(RokBudzetowy).all()
-    result = []
+    query, sort_columns = query_rok_budzetowy_rows(db, as_of)
+
+    # Only rok of planowania the user has access to
+    visible = visible_planowanie_ids(current_user)
+    query = query.join(
+        visible,
+        visible.c.planowanie_budzetu_id == RokBudzetowy.planowanie_budzetu_id
+    )
     
-    for rok in lata:
-        # Check if user has access to the parent planowanie
-        try:
-            validate_planowanie_access(rok.planowanie_budzetu_id, current_user, db)
-        except HTTPException:
-            continue  # Skip this rok if no access
-        
-        result.append({
-            "id": rok.id,
-            "planowanie_budzetu_id": rok.planowanie_budzetu_id,
-            "rok": rok.rok,
-            "limit": get_latest_version_for_field(db, "rok_budzetowy", rok.id, "limit", "numeric"),
-            "potrzeba": get_latest_version_for_field(db, "rok_budzetowy", rok.id, "potrzeba", "numeric")
-        })
+    return paginate(query, sort_columns, RokBudzetowy.id, sort, limit, after, response)
+
+
+@router.get("/rok_budzetowy/fields_history_status", response_model=FieldsHistoryStatusBulkResponse)
+def get_rok_budzetowy_fields_history_status_bulk(
+    ids: List[int] = Query(..., max_length=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get status of which fields have history for many lata budzetowe (?ids=1&ids=2...)"""
+    # Validate access
+    validate_rok_budzetowy_access_bulk(ids, current_user, db)
     
-    return result
+    return {"entities": get_fields_history_status(db, "rok_budzetowy", set(ids), ROK_BUDZETOWY_FIELDS)}
 
 
 @router.get("/rok_budzetowy/{rok_id}", response_model=RokBudzetowyResponse)
-async def get_rok_budzetowy(
+def get_rok_budzetowy(
     rok_id: int,
+    as_of: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # Validate access
     validate_rok_budzetowy_access(rok_id, current_user, db)
     
-    rok = db.query(RokBudzetowy).filter(RokBudzetowy.id == rok_id).first()
-    if not rok:
+    query, _ = query_rok_budzetowy_rows(db, as_of, [rok_id])
+    row = query.first()
+    if not row:
         raise HTTPException(status_code=404, detail="RokBudzetowy not found")
     
-    return {
-        "id": rok.id,
-        "planowanie_budzetu_id": rok.planowanie_budzetu_id,
-        "rok": rok.rok,
-        "limit": get_latest_version_for_field(db, "rok_budzetowy", rok.id, "limit", "numeric"),
-        "potrzeba": get_latest_version_for_field(db, "rok_budzetowy", rok.id, "potrzeba", "numeric")
-    }
+    return row._asdict()
 
 
 @router.get("/rok_budzetowy/{rok_id}/fields_history_status", response_model=FieldsHistoryStatusResponse)
-async def get_rok_budzetowy_fields_history_status(
+def get_rok_budzetowy_fields_history_status(
     rok_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -524,20 +1052,15 @@ async def get_rok_budzetowy_fields_history_status(
     # Validate access
     validate_rok_budzetowy_access(rok_id, current_user, db)
     
-    rok = db.query(RokBudzetowy).filter(RokBudzetowy.id == rok_id).first()
-    if not rok:
-        raise HTTPException(status_code=404, detail="RokBudzetowy not found")
-    
-    fields_status = {
-        "limit": has_field_history(db, "rok_budzetowy", rok_id, "limit", "numeric"),
-        "potrzeba": has_field_history(db, "rok_budzetowy", rok_id, "potrzeba", "numeric")
-    }
+    fields_status = get_fields_history_status(
+        db, "rok_budzetowy", [rok_id], ROK_BUDZETOWY_FIELDS
+    )[rok_id]
     
     return {"fields": fields_status}
 
 
 @router.get("/rok_budzetowy/{rok_id}/field_history/{field_name}", response_model=FieldHistoryResponse)
-async def get_rok_budzetowy_field_history(
+def get_rok_budzetowy_field_history(
     rok_id: int,
     field_name: str,
     db: Session = Depends(get_db),
@@ -546,10 +1069,6 @@ async def get_rok_budzetowy_field_history(
     # Validate access
     validate_rok_budzetowy_access(rok_id, current_user, db)
     
-    rok = db.query(RokBudzetowy).filter(RokBudzetowy.id == rok_id).first()
-    if not rok:
-        raise HTTPException(status_code=404, detail="RokBudzetowy not found")
-    
     numeric_fields = ["limit", "potrzeba"]
     
     if field_name in numeric_fields:
@@ -1,13 +1,103 @@
 """Utility functions for versioned fields."""
-from typing import Optional
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Iterable, Dict, Any, List
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, delete, func, select, tuple_, union_all, case, cast, null, String, Numeric, Integer
+from sqlalchemy.dialects.postgresql import insert
 
 from src.schemas.versioned_fields import (
     VersionedStringField,
     VersionedNumericField,
     VersionedForeignKeyField
 )
+from src.schemas.current_state import PlanowanieBudzetuCurrent, RokBudzetowyCurrent
+from src.ownership import invalidate_ownership
+
+
+# Edits of a cell by the same user within this many seconds of their previous edit replace
+# that version instead of adding a new one (0 disables coalescing)
+VERSION_COALESCE_SECONDS = float(os.getenv("VERSION_COALESCE_SECONDS", "0"))
+
+# Current state projection table and its primary key column for each entity_type
+CURRENT_STATE_TABLES = {
+    "planowanie_budzetu": (PlanowanieBudzetuCurrent, "planowanie_budzetu_id"),
+    "rok_budzetowy": (RokBudzetowyCurrent, "rok_budzetowy_id"),
+}
+
+
+def update_current_state(
+    db: Session,
+    entity_type: str,
+    entity_id: int,
+    values: Dict[str, Any],
+    versions: Optional[Dict[str, int]] = None
+) -> None:
+    """
+    Upsert current values of fields into the current state projection of the entity.
+    `versions` are the new version_numbers of the fields, merged into field_versions.
+    Fields without a column in the projection table are ignored.
+    """
+    update_current_state_bulk(db, entity_type, {entity_id: values}, {entity_id: versions} if versions else None)
+
+
+def update_current_state_bulk(
+    db: Session,
+    entity_type: str,
+    values: Dict[int, Dict[str, Any]],
+    versions: Optional[Dict[int, Dict[str, int]]] = None
+) -> None:
+    """
+    Upsert current values of many entities ({entity_id: {field_name: value}}) and optionally
+    their new version_numbers ({entity_id: {field_name: version_number}}) into the current
+    state projection, with one statement per distinct set of fields.
+    """
+    if entity_type not in CURRENT_STATE_TABLES:
+        return
+
+    model, key_column = CURRENT_STATE_TABLES[entity_type]
+    columns = model.__table__.c
+    groups = {}
+    for entity_id, entity_values in values.items():
+        entity_values = {name: value for name, value in entity_values.items() if name in columns and name != key_column}
+        if versions and versions.get(entity_id):
+            entity_values["field_versions"] = versions[entity_id]
+        if entity_values:
+            groups.setdefault(frozenset(entity_values), []).append({key_column: entity_id, **entity_values})
+
+    if entity_type == "planowanie_budzetu":
+        changed_owners = [entity_id for entity_id, entity_values in values.items() if "komorka_organizacyjna_id" in entity_values]
+        if changed_owners:
+            invalidate_ownership(changed_owners, db)
+
+    # executemany is sent as multi-row statements (insertmanyvalues) with a cached compilation
+    for field_names, group_rows in groups.items():
+        stmt = insert(model.__table__)
+        set_ = {name: stmt.excluded[name] for name in field_names}
+        if "field_versions" in set_:
+            # Merge, fields not written keep their version_number
+            set_["field_versions"] = func.coalesce(columns.field_versions, func.jsonb_build_object()).op("||")(
+                stmt.excluded.field_versions
+            )
+        stmt = stmt.on_conflict_do_update(index_elements=[key_column], set_=set_)
+        db.execute(stmt, group_rows)
+
+
+def get_field_versions(db: Session, entity_type: str, entity_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """
+    Current version_number of each field of the entities ({entity_id: {field_name: version_number}}),
+    read from the current state projection by primary key. Fields never written are missing.
+    """
+    model, key_column = CURRENT_STATE_TABLES[entity_type]
+    key = getattr(model, key_column)
+    rows = db.query(key, model.field_versions).filter(key.in_(list(entity_ids))).all()
+    return {entity_id: dict(field_versions or {}) for entity_id, field_versions in rows}
+
+
+def next_version_number(db: Session, entity_type: str, entity_id: int, field_name: str) -> int:
+    """version_number the next version of the field gets."""
+    return get_field_versions(db, entity_type, [entity_id]).get(entity_id, {}).get(field_name, 0) + 1
 
 
 def create_string_version(
@@ -24,10 +114,12 @@ def create_string_version(
         entity_id=entity_id,
         field_name=field_name,
         value=value,
+        version_number=next_version_number(db, entity_type, entity_id, field_name),
         created_by_user_id=user_id
     )
     db.add(version)
     db.flush()
+    update_current_state(db, entity_type, entity_id, {field_name: value}, {field_name: version.version_number})
     return version
 
 
@@ -45,10 +137,12 @@ def create_numeric_version(
         entity_id=entity_id,
         field_name=field_name,
         value=value,
+        version_number=next_version_number(db, entity_type, entity_id, field_name),
         created_by_user_id=user_id
     )
     db.add(version)
     db.flush()
+    update_current_state(db, entity_type, entity_id, {field_name: value}, {field_name: version.version_number})
     return version
 
 
@@ -68,13 +162,208 @@ def create_fk_version(
         field_name=field_name,
         value_string=value_string,
         value_int=value_int,
+        version_number=next_version_number(db, entity_type, entity_id, field_name),
         created_by_user_id=user_id
     )
     db.add(version)
     db.flush()
+    update_current_state(
+        db, entity_type, entity_id,
+        {field_name: value_int if value_int is not None else value_string},
+        {field_name: version.version_number}
+    )
     return version
 
 
+# Versioned table and value column of each field_type
+FIELD_TYPE_COLUMNS = {
+    "string": (VersionedStringField, "value"),
+    "numeric": (VersionedNumericField, "value"),
+    "fk_string": (VersionedForeignKeyField, "value_string"),
+    "fk_int": (VersionedForeignKeyField, "value_int"),
+}
+
+
+def get_current_state(db: Session, entity_type: str, entity_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Current state projection rows of the entities ({entity_id: {column: value}}), read by
+    primary key, with field_versions as a dict. Entities without a row are missing.
+    """
+    model, key_column = CURRENT_STATE_TABLES[entity_type]
+    key = getattr(model, key_column)
+    rows = db.query(model.__table__).filter(key.in_(list(entity_ids))).all()
+    return {
+        row._mapping[key_column]: {**row._mapping, "field_versions": dict(row.field_versions or {})}
+        for row in rows
+    }
+
+
+def is_same_value(field_type: str, current: Any, value: Any) -> bool:
+    """Whether writing `value` over the `current` value of a field would change nothing."""
+    if current is None or value is None:
+        return current is None and value is None
+    if field_type == "numeric":
+        # Numeric(15, 2) columns store the value rounded to cents
+        return round(Decimal(str(value)), 2) == current
+    return current == value
+
+
+def create_versions_bulk(
+    db: Session,
+    entity_type: str,
+    versions: Iterable[tuple[int, str, str, Any]],
+    user_id: Optional[int] = None
+) -> List[tuple[int, bool]]:
+    """
+    Create many versions at once. `versions` are (entity_id, field_name, field_type, value)
+    tuples; for the same cell the later tuple becomes the current value.
+    Returns (version_number, changed) for each tuple. A value equal to the current one is
+    not written (changed is False) and keeps the current version_number.
+
+    Writes one multi-row INSERT per versioned table and one multi-row upsert of the
+    current state projection per set of changed fields, instead of a flush per field.
+    Version numbers continue from the projection; when another transaction wrote the same
+    cell meanwhile, the unique version constraint makes the insert fail with IntegrityError.
+    Within VERSION_COALESCE_SECONDS the user's previous version of a cell is replaced
+    (see coalesce_versions); when that brings the cell back to the value of the version
+    before it, that version is moved to the next version_number and the current time
+    instead of adding another one, so version numbers still only go up.
+    """
+    versions = list(versions)
+    current_state = get_current_state(db, entity_type, {entity_id for entity_id, _, _, _ in versions})
+    field_versions = {entity_id: state["field_versions"] for entity_id, state in current_state.items()}
+
+    # Leave out cells that already hold the value
+    changed = []
+    for entity_id, field_name, field_type, value in versions:
+        state = current_state.setdefault(entity_id, {})
+        unchanged = (
+            field_name in field_versions.get(entity_id, {})
+            and field_name in state
+            and is_same_value(field_type, state[field_name], value)
+        )
+        changed.append(not unchanged)
+        if not unchanged:
+            state[field_name] = value
+    written = [version for version, is_changed in zip(versions, changed) if is_changed]
+
+    remaining = coalesce_versions(db, entity_type, written, field_versions, user_id)
+
+    timestamp = datetime.utcnow()
+    rows = {}
+    moved = {}
+    current = {}
+    results = []
+    for (entity_id, field_name, field_type, value), is_changed in zip(versions, changed):
+        entity_versions = field_versions.setdefault(entity_id, {})
+        previous = entity_versions.get(field_name, 0)
+        if not is_changed:
+            results.append((previous, False))
+            continue
+
+        entity_versions[field_name] = previous + 1
+        results.append((entity_versions[field_name], True))
+
+        model, value_column = FIELD_TYPE_COLUMNS[field_type]
+        author_id = user_id
+        kept = remaining.pop((entity_id, field_name), None)
+        if kept is not None and is_same_value(field_type, kept[1], value):
+            # The replaced version was the only change: the version before it is re-inserted
+            # with the new number, keeping its author and a single version of the value
+            kept_id, value, author_id = kept
+            moved.setdefault(model, []).append(kept_id)
+
+        row = {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "field_name": field_name,
+            "timestamp": timestamp,
+            "version_number": entity_versions[field_name],
+            "created_by_user_id": author_id,
+        }
+        if model is VersionedForeignKeyField:
+            row.update(value_string=None, value_int=None)
+        row[value_column] = value
+        rows.setdefault(model, []).append(row)
+        current.setdefault(entity_id, {})[field_name] = value
+
+    for model, ids in moved.items():
+        db.execute(delete(model.__table__).where(model.id.in_(ids)))
+    for model, model_rows in rows.items():
+        db.execute(insert(model.__table__), model_rows)
+
+    update_current_state_bulk(db, entity_type, current, {
+        entity_id: {field_name: field_versions[entity_id][field_name] for field_name in fields}
+        for entity_id, fields in current.items()
+    })
+    return results
+
+
+def coalesce_versions(
+    db: Session,
+    entity_type: str,
+    versions: List[tuple[int, str, str, Any]],
+    field_versions: Dict[int, Dict[str, int]],
+    user_id: Optional[int]
+) -> Dict[tuple[int, str], tuple[int, Any, Optional[int]]]:
+    """
+    Delete the current versions of the cells about to be written when the same user created
+    them less than VERSION_COALESCE_SECONDS ago, so that the new version replaces them.
+    The new version still gets the next version_number, so clients holding the replaced one
+    see a conflict. The first remaining version of a cell is never replaced.
+    Returns the latest remaining version of each cell whose version was deleted
+    ({(entity_id, field_name): (id, value, created_by_user_id)}).
+    """
+    if VERSION_COALESCE_SECONDS <= 0 or user_id is None:
+        return {}
+
+    cells = {}
+    field_types = {}
+    for entity_id, field_name, field_type, _ in versions:
+        current_version = field_versions.get(entity_id, {}).get(field_name, 0)
+        if current_version > 1:
+            model, _ = FIELD_TYPE_COLUMNS[field_type]
+            cells.setdefault(model, set()).add((entity_id, field_name, current_version))
+            field_types[(entity_id, field_name)] = field_type
+
+    since = datetime.utcnow() - timedelta(seconds=VERSION_COALESCE_SECONDS)
+    remaining = {}
+    for model, model_cells in cells.items():
+        older = model.__table__.alias("older")
+        deleted = db.execute(
+            delete(model.__table__).where(
+                model.entity_type == entity_type,
+                tuple_(model.entity_id, model.field_name, model.version_number).in_(model_cells),
+                model.created_by_user_id == user_id,
+                model.timestamp >= since,
+                select(older.c.id).where(
+                    older.c.entity_type == model.entity_type,
+                    older.c.entity_id == model.entity_id,
+                    older.c.field_name == model.field_name,
+                    older.c.version_number < model.version_number
+                ).exists()
+            ).returning(model.entity_id, model.field_name)
+        ).all()
+        if not deleted:
+            continue
+
+        latest = db.execute(
+            select(model.__table__).where(
+                model.entity_type == entity_type,
+                tuple_(model.entity_id, model.field_name).in_([tuple(cell) for cell in deleted])
+            ).order_by(
+                model.entity_id, model.field_name, desc(model.version_number)
+            ).distinct(model.entity_id, model.field_name)
+        )
+        for version in latest:
+            _, value_column = FIELD_TYPE_COLUMNS[field_types[(version.entity_id, version.field_name)]]
+            remaining[(version.entity_id, version.field_name)] = (
+                version.id, getattr(version, value_column), version.created_by_user_id
+            )
+
+    return remaining
+
+
 def get_latest_version_for_field(db: Session, entity_type: str, entity_id: int, field_name: str, field_type: str):
     """Get latest version for a specific field - optimized to query only latest."""
     if field_type == "string":
@@ -132,3 +421,209 @@ def has_field_history(db: Session, entity_type: str, entity_id: int, field_name:
         return False
     
     return count > 1
+
+
+def get_latest_versions_for_entities(
+    db: Session,
+    entity_type: str,
+    entity_ids: Iterable[int],
+    fields: Dict[str, str],
+    as_of: Optional[datetime] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Get latest versions of many fields for many entities at once.
+
+    `fields` maps field_name to field_type (same types as in get_latest_version_for_field).
+    Runs one DISTINCT ON query per versioned table instead of one query per field and entity.
+    With `as_of` only versions created at or before that moment are considered.
+    Returns {entity_id: {field_name: value}}, fields without any version are None.
+    """
+    entity_ids = list(entity_ids)
+    result = {entity_id: {field_name: None for field_name in fields} for entity_id in entity_ids}
+    if not entity_ids or not fields:
+        return result
+
+    string_fields = [f for f, t in fields.items() if t == "string"]
+    numeric_fields = [f for f, t in fields.items() if t == "numeric"]
+    fk_fields = [f for f, t in fields.items() if t in ("fk_string", "fk_int")]
+
+    for model, field_names in (
+        (VersionedStringField, string_fields),
+        (VersionedNumericField, numeric_fields),
+        (VersionedForeignKeyField, fk_fields),
+    ):
+        if not field_names:
+            continue
+
+        query = db.query(model).filter(
+            model.entity_type == entity_type,
+            model.entity_id.in_(entity_ids),
+            model.field_name.in_(field_names)
+        )
+        if as_of is not None:
+            query = query.filter(model.timestamp <= as_of)
+
+        versions = query.distinct(
+            model.entity_id, model.field_name
+        ).order_by(
+            model.entity_id, model.field_name, desc(model.timestamp), desc(model.id)
+        ).all()
+
+        for version in versions:
+            field_type = fields[version.field_name]
+            if field_type == "string":
+                value = version.value
+            elif field_type == "numeric":
+                value = float(version.value)
+            elif field_type == "fk_string":
+                value = version.value_string
+            else:
+                value = version.value_int
+            result[version.entity_id][version.field_name] = value
+
+    return result
+
+
+def latest_values_subquery(
+    entity_type: str,
+    fields: Dict[str, str],
+    entity_ids: Optional[Iterable[int]] = None,
+    as_of: Optional[datetime] = None
+):
+    """
+    Subquery with one row per entity: `entity_id` and a column with the latest value of each
+    field, considering only versions created at or before `as_of` when given.
+
+    Versions of all involved tables are reduced with a single DISTINCT ON and pivoted into
+    columns, so whole snapshots can be filtered, sorted and paginated in SQL.
+    Entities without any version (e.g. created after `as_of`) have no row.
+    """
+    # Versioned table of each field_type and the column its value ends up in
+    sources = {
+        VersionedStringField: {"string": "value_string"},
+        VersionedNumericField: {"numeric": "value_numeric"},
+        VersionedForeignKeyField: {"fk_string": "value_string", "fk_int": "value_int"},
+    }
+
+    branches = []
+    for model, field_types in sources.items():
+        field_names = [f for f, t in fields.items() if t in field_types]
+        if not field_names:
+            continue
+
+        if model is VersionedStringField:
+            values = (model.value, cast(null(), Numeric(15, 2)), cast(null(), Integer))
+        elif model is VersionedNumericField:
+            values = (cast(null(), String), model.value, cast(null(), Integer))
+        else:
+            values = (model.value_string, cast(null(), Numeric(15, 2)), model.value_int)
+
+        branch = select(
+            model.id,
+            model.entity_id,
+            model.field_name,
+            model.timestamp,
+            values[0].label("value_string"),
+            values[1].label("value_numeric"),
+            values[2].label("value_int")
+        ).where(
+            model.entity_type == entity_type,
+            model.field_name.in_(field_names)
+        )
+        if entity_ids is not None:
+            branch = branch.where(model.entity_id.in_(list(entity_ids)))
+        if as_of is not None:
+            branch = branch.where(model.timestamp <= as_of)
+        branches.append(branch)
+
+    versions = union_all(*branches).subquery() if len(branches) > 1 else branches[0].subquery()
+
+    latest = select(versions).distinct(
+        versions.c.entity_id, versions.c.field_name
+    ).order_by(
+        versions.c.entity_id, versions.c.field_name, desc(versions.c.timestamp), desc(versions.c.id)
+    ).subquery()
+
+    value_columns = {"string": "value_string", "fk_string": "value_string", "numeric": "value_numeric", "fk_int": "value_int"}
+    return select(
+        latest.c.entity_id,
+        *[
+            func.max(case((latest.c.field_name == field_name, latest.c[value_columns[field_type]]))).label(field_name)
+            for field_name, field_type in fields.items()
+        ]
+    ).group_by(latest.c.entity_id).subquery()
+
+
+def get_fields_history_status(
+    db: Session,
+    entity_type: str,
+    entity_ids: Iterable[int],
+    fields: Dict[str, str]
+) -> Dict[int, Dict[str, bool]]:
+    """
+    Check which fields of many entities have more than one version (have history).
+
+    Runs one GROUP BY query per versioned table instead of one COUNT per field and entity.
+    Returns {entity_id: {field_name: has_history}}.
+    """
+    entity_ids = list(entity_ids)
+    result = {entity_id: {field_name: False for field_name in fields} for entity_id in entity_ids}
+    if not entity_ids or not fields:
+        return result
+
+    string_fields = [f for f, t in fields.items() if t == "string"]
+    numeric_fields = [f for f, t in fields.items() if t == "numeric"]
+    fk_fields = [f for f, t in fields.items() if t in ("fk_string", "fk_int")]
+
+    for model, field_names in (
+        (VersionedStringField, string_fields),
+        (VersionedNumericField, numeric_fields),
+        (VersionedForeignKeyField, fk_fields),
+    ):
+        if not field_names:
+            continue
+
+        with_history = db.query(model.entity_id, model.field_name).filter(
+            model.entity_type == entity_type,
+            model.entity_id.in_(entity_ids),
+            model.field_name.in_(field_names)
+        ).group_by(
+            model.entity_id, model.field_name
+        ).having(func.count() > 1).all()
+
+        for entity_id, field_name in with_history:
+            result[entity_id][field_name] = True
+
+    return result
+
+
+def get_latest_version_numbers(
+    db: Session,
+    entity_type: str,
+    entity_ids: Iterable[int],
+    fields: Dict[str, str]
+) -> Dict[int, Dict[str, int]]:
+    """
+    Highest version_number of each field of many entities, one GROUP BY query per versioned table.
+    Returns {entity_id: {field_name: version_number}}, fields without any version are missing.
+    """
+    entity_ids = list(entity_ids)
+    result = {entity_id: {} for entity_id in entity_ids}
+    if not entity_ids:
+        return result
+
+    for model in (VersionedStringField, VersionedNumericField, VersionedForeignKeyField):
+        field_names = [f for f, t in fields.items() if FIELD_TYPE_COLUMNS[t][0] is model]
+        if not field_names:
+            continue
+
+        numbers = db.query(model.entity_id, model.field_name, func.max(model.version_number)).filter(
+            model.entity_type == entity_type,
+            model.entity_id.in_(entity_ids),
+            model.field_name.in_(field_names)
+        ).group_by(model.entity_id, model.field_name).all()
+
+        for entity_id, field_name, version_number in numbers:
+            result[entity_id][field_name] = version_number
+
+    return result
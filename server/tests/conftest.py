@@ -1,11 +1,15 @@
 import pytest
 import os
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from src.main import app
 from src.database import get_db
+from src.auth import invalidate_users
+from src.dictionaries import invalidate_dictionaries
+from src.ownership import invalidate_ownership
+from src.response_cache import invalidate_responses
 from src.schemas.base import Base
 
 
@@ -37,10 +41,42 @@ def client(db_session):
     
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
+        # Dictionaries cached at startup and cached users, owners and responses come from another test's data
+        invalidate_dictionaries()
+        invalidate_users()
+        invalidate_ownership()
+        invalidate_responses()
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_counter():
+    """Count SQL statements executed on the test engine."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def fetched_rows():
+    """Record number of rows returned by each SELECT executed on the test engine."""
+    row_counts = []
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            row_counts.append(cursor.rowcount)
+
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    yield row_counts
+    event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+
 @pytest.fixture
 def test_users(db_session):
     """Create test users in different komorki_organizacyjne."""
@@ -92,3 +128,23 @@ def test_users(db_session):
         db_session.refresh(user)
     
     return users
+
+
+@pytest.fixture
+def planowanie_payload():
+    """Build a valid PlanowanieBudzetu create payload in the user's komorka_organizacyjna."""
+    def build(user, **overrides):
+        return {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id,
+            **overrides
+        }
+
+    return build
@@ -47,6 +47,33 @@ class TestAuthorizationHeader:
         
         assert response.status_code == 200
 
+    def test_current_user_is_cached_until_changed(self, client, db_session, test_users, query_counter):
+        """Test that the user is loaded once and reloaded after its komorka_organizacyjna changes."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id)}
+        payload = {
+            "nazwa_projektu": "Test Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": 1
+        }
+
+        query_counter.clear()
+        client.get("/api/planowanie_budzetu", headers=headers)
+        client.get("/api/planowanie_budzetu", headers=headers)
+        assert len([q for q in query_counter if "FROM users" in q]) == 1
+        assert client.post("/api/planowanie_budzetu", json=payload, headers=headers).status_code == 403
+
+        user.komorka_organizacyjna_id = 1
+        db_session.commit()
+
+        assert client.post("/api/planowanie_budzetu", json=payload, headers=headers).status_code == 200
+
 
 class TestKomorkaOrganizacyjnaAccess:
     """Tests for komorka_organizacyjna based access control."""
@@ -163,6 +190,40 @@ class TestKomorkaOrganizacyjnaAccess:
         assert len(data2) == 1
         assert data2[0]["nazwa_projektu"] == "Project Komorka 1"
 
+    def test_get_all_planowanie_scoped_in_database(self, client, db_session, test_users, fetched_rows):
+        """Test that rows from other komorki are not fetched from the database at all."""
+        user1 = test_users[0]  # Komorka 0
+        user2 = test_users[2]  # Komorka 1
+        
+        for user, count in ((user1, 4), (user2, 1)):
+            for i in range(count):
+                payload = {
+                    "nazwa_projektu": f"Project {i}",
+                    "budzet": "2024",
+                    "czesc_budzetowa_kod": "75",
+                    "dzial_kod": "750",
+                    "rozdzial_kod": "75011",
+                    "paragraf_kod": "4210",
+                    "zrodlo_finansowania_kod": "1",
+                    "grupa_wydatkow_id": 1,
+                    "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+                }
+                client.post(
+                    "/api/planowanie_budzetu",
+                    json=payload,
+                    headers={"Authorization": str(user.id)}
+                )
+        
+        fetched_rows.clear()
+        response = client.get(
+            "/api/planowanie_budzetu",
+            headers={"Authorization": str(user2.id)}
+        )
+        
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        assert max(fetched_rows) == 1
+
     def test_get_single_planowanie_from_different_komorka(self, client, db_session, test_users):
         """Test that user cannot access planowanie from different komorka."""
         user1 = test_users[0]  # Komorka 0
@@ -230,6 +291,86 @@ class TestKomorkaOrganizacyjnaAccess:
         data = response.json()
         assert data["nazwa_projektu"] == "Shared Project"
 
+    def test_planowanie_owner_cached_until_komorka_changes(self, client, db_session, test_users, query_counter):
+        """Test that access checks reuse the cached owner and see a change of komorka_organizacyjna_id."""
+        from src.versioning_utils import create_fk_version
+
+        user1 = test_users[0]  # Komorka 0
+        user3 = test_users[2]  # Komorka 1
+        payload = {
+            "nazwa_projektu": "Moved Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": 0
+        }
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user1.id)}
+        ).json()["id"]
+
+        query_counter.clear()
+        for _ in range(3):
+            client.get(f"/api/planowanie_budzetu/{planowanie_id}", headers={"Authorization": str(user1.id)})
+        owner_lookups = [
+            q for q in query_counter
+            if q.startswith("SELECT planowanie_budzetu.id AS planowanie_budzetu_id, planowanie_budzetu_current.komorka_organizacyjna_id")
+        ]
+        assert len(owner_lookups) == 1
+
+        create_fk_version(
+            db_session, "planowanie_budzetu", planowanie_id, "komorka_organizacyjna_id",
+            value_int=1, user_id=user3.id
+        )
+        db_session.commit()
+
+        response = client.get(f"/api/planowanie_budzetu/{planowanie_id}", headers={"Authorization": str(user1.id)})
+        assert response.status_code == 403
+        response = client.get(f"/api/planowanie_budzetu/{planowanie_id}", headers={"Authorization": str(user3.id)})
+        assert response.status_code == 200
+
+    def test_cell_routes_skip_existence_queries_with_cached_owner(self, client, db_session, test_users, query_counter):
+        """Test that PATCH and field_history rely on the access check for existence."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id)}
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": 0
+        }
+        planowanie_id = client.post("/api/planowanie_budzetu", json=payload, headers=headers).json()["id"]
+        rok_id = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 10.0, "potrzeba": 20.0},
+            headers=headers
+        ).json()["id"]
+        client.get(f"/api/rok_budzetowy/{rok_id}", headers=headers)
+
+        query_counter.clear()
+        responses = [
+            client.patch(f"/api/planowanie_budzetu/{planowanie_id}", json={"field": "budzet", "value": "2025"}, headers=headers),
+            client.patch(f"/api/rok_budzetowy/{rok_id}", json={"field": "limit", "value": 15.0}, headers=headers),
+            client.get(f"/api/planowanie_budzetu/{planowanie_id}/field_history/budzet", headers=headers),
+            client.get(f"/api/rok_budzetowy/{rok_id}/field_history/limit", headers=headers),
+        ]
+        assert [r.status_code for r in responses] == [200] * 4
+        assert not [q for q in query_counter if q.startswith(("SELECT planowanie_budzetu.", "SELECT rok_budzetowy."))]
+
+        assert client.patch("/api/planowanie_budzetu/99999", json={"field": "budzet", "value": "2025"}, headers=headers).status_code == 404
+        assert client.patch("/api/rok_budzetowy/99999", json={"field": "limit", "value": 1.0}, headers=headers).status_code == 404
+        assert client.get("/api/rok_budzetowy/99999/field_history/limit", headers=headers).status_code == 404
+
     def test_update_planowanie_from_different_komorka(self, client, db_session, test_users):
         """Test that user cannot update planowanie from different komorka."""
         user1 = test_users[0]  # Komorka 0
@@ -713,6 +854,62 @@ class TestRokBudzetowyAccess:
         assert len(data2) == 1
         assert data2[0]["planowanie_budzetu_id"] == planowanie_id2
 
+    def test_get_all_rok_access_resolved_in_one_query(self, client, db_session, test_users, query_counter):
+        """Test that get_all rok_budzetowy filters access in a constant number of queries."""
+        user1 = test_users[0]  # Komorka 0
+        user2 = test_users[2]  # Komorka 1
+        
+        def create_planowanie_with_lata(user, lata):
+            planowanie_payload = {
+                "nazwa_projektu": "Project",
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            planowanie_id = client.post(
+                "/api/planowanie_budzetu",
+                json=planowanie_payload,
+                headers={"Authorization": str(user.id)}
+            ).json()["id"]
+            for rok in lata:
+                client.post(
+                    "/api/rok_budzetowy",
+                    json={"planowanie_budzetu_id": planowanie_id, "rok": rok, "limit": 100.0, "potrzeba": 200.0},
+                    headers={"Authorization": str(user.id)}
+                )
+            return planowanie_id
+        
+        planowanie_id1 = create_planowanie_with_lata(user1, [2026, 2027])
+        create_planowanie_with_lata(user2, [2026, 2027, 2028, 2029])
+        
+        query_counter.clear()
+        response = client.get(
+            "/api/rok_budzetowy",
+            headers={"Authorization": str(user1.id)}
+        )
+        queries_small = len(query_counter)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert [rok["rok"] for rok in data] == [2026, 2027]
+        assert all(rok["planowanie_budzetu_id"] == planowanie_id1 for rok in data)
+        
+        create_planowanie_with_lata(user1, [2026, 2027, 2028, 2029])
+        
+        query_counter.clear()
+        response = client.get(
+            "/api/rok_budzetowy",
+            headers={"Authorization": str(user1.id)}
+        )
+        
+        assert len(response.json()) == 6
+        assert len(query_counter) == queries_small
+
     def test_get_rok_field_history_from_different_komorka(self, client, db_session, test_users):
         """Test that user cannot get rok field history from different komorka."""
         user1 = test_users[0]  # Komorka 0
@@ -0,0 +1,98 @@
+from src.current_state import rebuild_current_state
+from src.schemas.current_state import PlanowanieBudzetuCurrent, RokBudzetowyCurrent
+
+
+def create_planowanie(client, user, payload):
+    response = client.post(
+        "/api/planowanie_budzetu",
+        json=payload,
+        headers={"Authorization": str(user.id)}
+    )
+    return response.json()["id"]
+
+
+def create_rok(client, user, planowanie_id, rok=2026, limit=100.0, potrzeba=150.0):
+    response = client.post(
+        "/api/rok_budzetowy",
+        json={"planowanie_budzetu_id": planowanie_id, "rok": rok, "limit": limit, "potrzeba": potrzeba},
+        headers={"Authorization": str(user.id)}
+    )
+    return response.json()["id"]
+
+
+class TestCurrentStateProjection:
+    """Tests for the current state projection tables."""
+
+    def test_projection_created_with_entity(self, client, db_session, test_users, planowanie_payload):
+        """Test that creating entities fills their projection rows."""
+        user = test_users[0]
+        planowanie_id = create_planowanie(client, user, planowanie_payload(user, nazwa_projektu="Created"))
+        rok_id = create_rok(client, user, planowanie_id)
+
+        current = db_session.get(PlanowanieBudzetuCurrent, planowanie_id)
+        assert current.nazwa_projektu == "Created"
+        assert current.dzial_kod == "750"
+        assert current.komorka_organizacyjna_id == user.komorka_organizacyjna_id
+        assert current.user_id == user.id
+
+        rok_current = db_session.get(RokBudzetowyCurrent, rok_id)
+        assert float(rok_current.limit) == 100.0
+        assert float(rok_current.potrzeba) == 150.0
+
+    def test_projection_follows_updates(self, client, db_session, test_users, planowanie_payload):
+        """Test that cell updates are reflected in the projection and read endpoints."""
+        user = test_users[0]
+        planowanie_id = create_planowanie(client, user, planowanie_payload(user))
+        rok_id = create_rok(client, user, planowanie_id)
+
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Updated"},
+            headers={"Authorization": str(user.id)}
+        )
+        client.patch(
+            f"/api/rok_budzetowy/{rok_id}",
+            json={"field": "limit", "value": 250.5},
+            headers={"Authorization": str(user.id)}
+        )
+
+        db_session.expire_all()
+        assert db_session.get(PlanowanieBudzetuCurrent, planowanie_id).nazwa_projektu == "Updated"
+        assert float(db_session.get(RokBudzetowyCurrent, rok_id).limit) == 250.5
+
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.json()["nazwa_projektu"] == "Updated"
+
+        response = client.get(
+            f"/api/rok_budzetowy/{rok_id}",
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.json()["limit"] == 250.5
+
+    def test_rebuild_regenerates_projection(self, client, db_session, test_users, planowanie_payload):
+        """Test that rebuild restores the projection from the version tables."""
+        user = test_users[0]
+        planowanie_id = create_planowanie(client, user, planowanie_payload(user, nazwa_projektu="Original"))
+        rok_id = create_rok(client, user, planowanie_id)
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Latest"},
+            headers={"Authorization": str(user.id)}
+        )
+
+        db_session.query(PlanowanieBudzetuCurrent).delete()
+        db_session.query(RokBudzetowyCurrent).delete()
+        db_session.commit()
+
+        rebuilt = rebuild_current_state(db_session)
+
+        assert rebuilt == {"planowanie_budzetu": 1, "rok_budzetowy": 1}
+        current = db_session.get(PlanowanieBudzetuCurrent, planowanie_id)
+        assert current.nazwa_projektu == "Latest"
+        assert current.field_versions["nazwa_projektu"] == 2
+        assert current.field_versions["dzial_kod"] == 1
+        assert current.komorka_organizacyjna_id == user.komorka_organizacyjna_id
+        assert float(db_session.get(RokBudzetowyCurrent, rok_id).potrzeba) == 150.0
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+from src.database import InstrumentedQueuePool, create_db_engine, pool_status
+from tests.conftest import TEST_DB_URL
+
+
+class TestConnectionPool:
+    """Tests for the configurable connection pool and its statistics."""
+
+    def test_pool_statistics(self, monkeypatch):
+        """Test that checkouts, overflow and timeouts are counted."""
+        monkeypatch.setattr("src.database.DB_POOL_SIZE", 1)
+        monkeypatch.setattr("src.database.DB_MAX_OVERFLOW", 1)
+        monkeypatch.setattr("src.database.DB_POOL_TIMEOUT", 0.1)
+        engine = create_db_engine(TEST_DB_URL)
+        monkeypatch.setattr("src.database.engine", engine)
+        assert isinstance(engine.pool, InstrumentedQueuePool)
+
+        first = engine.connect()
+        second = engine.connect()
+        second.execute(text("SELECT 1"))
+        status = pool_status()
+        assert status["checked_out"] == 2
+        assert status["overflow"] == 1
+
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+        second.close()
+        first.close()
+        status = pool_status()
+        assert status["checked_out"] == 0
+        assert status["checkouts"] == 3
+        assert status["timeouts"] == 1
+        assert status["wait_max_ms"] >= 100
+        engine.dispose()
+
+    def test_pgbouncer_mode(self, monkeypatch):
+        """Test that PgBouncer mode leaves pooling to PgBouncer."""
+        monkeypatch.setattr("src.database.DB_PGBOUNCER", True)
+        engine = create_db_engine(TEST_DB_URL)
+        monkeypatch.setattr("src.database.engine", engine)
+
+        assert isinstance(engine.pool, NullPool)
+        assert pool_status() == {"pool": "NullPool"}
+
+    def test_pool_endpoint_for_admin_only(self, client):
+        """Test that the internal endpoint returns the statistics to the administrator only."""
+        response = client.get("/internal/pool", headers={"Authorization": "0"})
+        assert response.status_code == 200
+        assert response.json()["pool"] == "QueuePool"
+        assert "checked_out" in response.json()
+
+        response = client.get("/internal/pool", headers={"Authorization": "1"})
+        assert response.status_code == 403
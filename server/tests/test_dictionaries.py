@@ -0,0 +1,103 @@
+from src.schemas.dzialy import Dzial
+from src.schemas.grupy_wydatkow import GrupaWydatkow
+
+
+class TestDictionaryCache:
+    """Tests for the cached classification dictionary endpoints."""
+
+    def test_dictionary_served_from_cache_with_etag(self, client, db_session, query_counter):
+        """Test that a dictionary is queried once and revalidated with If-None-Match."""
+        db_session.add_all([
+            Dzial(kod="801", nazwa="Oświata i wychowanie"),
+            Dzial(kod="750", nazwa="Administracja publiczna"),
+        ])
+        db_session.commit()
+
+        query_counter.clear()
+        response = client.get("/api/dzialy")
+        assert response.status_code == 200
+        assert response.json() == [
+            {"kod": "750", "nazwa": "Administracja publiczna", "PKD": None},
+            {"kod": "801", "nazwa": "Oświata i wychowanie", "PKD": None},
+        ]
+        etag = response.headers["ETag"]
+        assert etag.startswith('"')
+
+        response = client.get("/api/dzialy")
+        assert response.headers["ETag"] == etag
+        assert len([q for q in query_counter if "FROM dzialy" in q]) == 1
+
+        response = client.get("/api/dzialy", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = client.get("/api/dzialy", headers={"If-None-Match": '"other"'})
+        assert response.status_code == 200
+
+    def test_weak_etag_revalidation(self, client, db_session):
+        """Test that a weak validator, as rewritten by a compressing proxy, still gets 304."""
+        db_session.add(Dzial(kod="750", nazwa="Administracja publiczna"))
+        db_session.commit()
+        etag = client.get("/api/dzialy").headers["ETag"]
+
+        response = client.get("/api/dzialy", headers={"If-None-Match": f'"other", W/{etag}'})
+        assert response.status_code == 304
+
+        response = client.get("/api/dzialy", headers={"If-None-Match": 'W/"other"'})
+        assert response.status_code == 200
+
+    def test_invalidate_dictionaries(self, client, db_session):
+        """Test that changes are served only after the cache is invalidated by the administrator."""
+        db_session.add(GrupaWydatkow(id=1, nazwa="Wydatki bieżące", paragrafy=["421"]))
+        db_session.commit()
+        etag = client.get("/api/grupy_wydatkow").headers["ETag"]
+
+        db_session.add(GrupaWydatkow(id=2, nazwa="Wydatki majątkowe", paragrafy=["605"]))
+        db_session.commit()
+        assert len(client.get("/api/grupy_wydatkow").json()) == 1
+
+        assert client.post("/internal/dictionaries/invalidate", headers={"Authorization": "1"}).status_code == 403
+        assert client.post("/internal/dictionaries/invalidate", headers={"Authorization": "0"}).status_code == 200
+
+        response = client.get("/api/grupy_wydatkow", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert [g["paragrafy"] for g in response.json()] == [["421"], ["605"]]
+
+    def test_slowniki_bundle(self, client, db_session):
+        """Test that all dictionaries are served in one compressed bundle under its content hash."""
+        db_session.add(Dzial(kod="750", nazwa="Administracja publiczna"))
+        db_session.commit()
+
+        response = client.get("/api/slowniki", follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["Cache-Control"] == "no-cache"
+        url = response.headers["Location"]
+
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "immutable" in response.headers["Cache-Control"]
+        data = response.json()
+        assert set(data) == {
+            "dzialy", "rozdzialy", "paragrafy", "grupy_wydatkow", "czesci_budzetowe", "zrodla_finansowania"
+        }
+        assert data["dzialy"] == [{"kod": "750", "nazwa": "Administracja publiczna", "PKD": None}]
+
+        response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["Content-Encoding"] == "br"
+        assert response.json() == data
+
+        response = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert response.json() == data
+
+        # After a change the old hash leads to the new bundle
+        db_session.add(Dzial(kod="801", nazwa="Oświata i wychowanie"))
+        db_session.commit()
+        client.post("/internal/dictionaries/invalidate", headers={"Authorization": "0"})
+
+        response = client.get(url, follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["Location"] != url
+        assert len(client.get(url).json()["dzialy"]) == 2
@@ -0,0 +1,119 @@
+import pytest
+from src.excel_creator import BudgetEntry, DaneFinansoweRoku, ExportOptions, export_entries_to_excel
+from src.schemas.czesci_budzetowe import CzescBudzetowa
+from src.schemas.dzialy import Dzial
+from src.schemas.grupy_wydatkow import GrupaWydatkow
+from src.schemas.paragrafy import Paragraf
+from src.schemas.rozdzialy import Rozdzial
+from src.schemas.zrodla_finansowania import ZrodloFinansowania
+
+
+@pytest.fixture
+def dictionaries(db_session):
+    """Create the classification codes used by the imported rows."""
+    db_session.add_all([
+        CzescBudzetowa(kod="27", nazwa="Informatyzacja"),
+        Dzial(kod="750", nazwa="Administracja publiczna"),
+        Rozdzial(kod="75001", nazwa="Urzędy naczelnych organów", dzial="750"),
+        Paragraf(kod="421", tresc="Zakup materiałów i wyposażenia"),
+        ZrodloFinansowania(kod="1", nazwa="Środki budżetu państwa"),
+        GrupaWydatkow(id=1, nazwa="Wydatki bieżące jednostek", paragrafy=["421"]),
+    ])
+    db_session.commit()
+
+
+def entry(**overrides):
+    values = {
+        "czesc_budzetowa": "27",
+        "dzial": "750",
+        "rozdzial": "75001",
+        "paragraf": "4210",
+        "zrodlo_finansowania": "1",
+        "grupa_wydatkow": "1",
+        "nazwa_programu_projektu": "Projekt",
+        "nazwa_zadania": "Zadanie",
+        "budzet": "Budżet państwa",
+        **overrides
+    }
+    return BudgetEntry(**values)
+
+
+def upload(client, user, path, rok=2026):
+    with open(path, "rb") as f:
+        return client.post(
+            "/api/planowanie_budzetu/import",
+            params={"rok": rok},
+            files={"file": ("plan.xlsx", f, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            headers={"Authorization": str(user.id)}
+        )
+
+
+class TestExcelImport:
+    """Tests for importing planowanie rows from the exported Excel layout."""
+
+    def test_import_exported_sheet(self, client, db_session, test_users, dictionaries, tmp_path):
+        """Test that a sheet produced by export_entries_to_excel is imported back."""
+        user = test_users[0]
+        path = tmp_path / "plan.xlsx"
+        export_entries_to_excel(str(tmp_path / "missing_template.xlsx"), str(path), [
+            entry(nazwa_zadania="Licencje", n=DaneFinansoweRoku(potrzeby=100.0, limit=80.0),
+                  n1=DaneFinansoweRoku(potrzeby=50.0, limit=50.0)),
+            entry(nazwa_zadania="Zły dział", dzial="999"),
+            entry(nazwa_zadania="Grupa po nazwie", grupa_wydatkow="Wydatki bieżące jednostek"),
+            entry(nazwa_zadania="Zła grupa", grupa_wydatkow="7"),
+        ], options=ExportOptions(show_year_n2=False, show_year_n3=False))
+
+        response = upload(client, user, path)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["imported"] == 2
+        assert data["lata_imported"] == 2
+        assert [error["row"] for error in data["errors"]] == [3, 5]
+        assert "dzial" in data["errors"][0]["message"]
+
+        rows = client.get(
+            "/api/planowanie_budzetu",
+            params={"include": "lata"},
+            headers={"Authorization": str(user.id)}
+        ).json()
+        assert [row["nazwa_zadania"] for row in rows] == ["Licencje", "Grupa po nazwie"]
+        assert rows[0]["dzial_kod"] == "750"
+        assert rows[0]["paragraf_kod"] == "4210"
+        assert rows[0]["komorka_organizacyjna_id"] == user.komorka_organizacyjna_id
+        assert [(rok["rok"], rok["potrzeba"], rok["limit"]) for rok in rows[0]["lata_budzetowe"]] == [
+            (2026, 100.0, 80.0),
+            (2027, 50.0, 50.0),
+        ]
+
+    def test_import_in_batches(self, client, db_session, test_users, dictionaries, tmp_path, monkeypatch):
+        """Test that rows spanning several batches are all imported."""
+        monkeypatch.setattr("src.excel_importer.IMPORT_BATCH_SIZE", 2)
+        user = test_users[0]
+        path = tmp_path / "plan.xlsx"
+        export_entries_to_excel(str(tmp_path / "missing_template.xlsx"), str(path), [
+            entry(nazwa_zadania=f"Zadanie {i}", n=DaneFinansoweRoku(potrzeby=i, limit=i))
+            for i in range(5)
+        ])
+
+        response = upload(client, user, path)
+
+        assert response.json()["imported"] == 5
+        rows = client.get("/api/rok_budzetowy", headers={"Authorization": str(user.id)}).json()
+        # The first entry has only zeros, so no year is created for it
+        assert sorted(row["potrzeba"] for row in rows) == [1.0, 2.0, 3.0, 4.0]
+
+    def test_import_rejects_invalid_file(self, client, db_session, test_users, dictionaries, tmp_path):
+        """Test that non-xlsx files and sheets without classification columns are rejected."""
+        user = test_users[0]
+        path = tmp_path / "plan.xlsx"
+        path.write_text("not a workbook")
+
+        response = upload(client, user, path)
+        assert response.status_code == 400
+
+        export_entries_to_excel(str(tmp_path / "missing_template.xlsx"), str(path), [entry()],
+                                options=ExportOptions(show_classification=False))
+        response = upload(client, user, path)
+        assert response.status_code == 400
+        assert "Część" in response.json()["detail"]
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from src.schemas.idempotency_keys import IdempotencyKey
+from src.schemas.planowanie_budzetu import PlanowanieBudzetu
+from src.schemas.versioned_fields import VersionedStringField
+
+
+class TestIdempotencyKey:
+    """Tests for retrying write requests with an Idempotency-Key header."""
+
+    def test_retried_create_returns_original_response(self, client, db_session, test_users, planowanie_payload):
+        """Test that a retried POST returns the first response without creating another row."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id), "Idempotency-Key": "create-1"}
+
+        first = client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+        retry = client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert db_session.query(PlanowanieBudzetu).count() == 1
+
+        # Another key is another request
+        headers["Idempotency-Key"] = "create-2"
+        other = client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+        assert other.json()["id"] != first.json()["id"]
+
+    def test_retried_cell_update_writes_one_version(self, client, db_session, test_users, planowanie_payload):
+        """Test that a retried PATCH does not create another version."""
+        user = test_users[0]
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload(user),
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        headers = {"Authorization": str(user.id), "Idempotency-Key": "update-1"}
+        update = {"field": "nazwa_projektu", "value": "Updated", "expected_version": 1}
+
+        first = client.patch(f"/api/planowanie_budzetu/{planowanie_id}", json=update, headers=headers)
+        # Without the key the retry would now be a conflict, as version 1 is stale
+        retry = client.patch(f"/api/planowanie_budzetu/{planowanie_id}", json=update, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.json()["version"] == 2
+        assert db_session.query(VersionedStringField).filter_by(
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name="nazwa_projektu"
+        ).count() == 2
+
+    def test_key_reused_for_different_request(self, client, db_session, test_users, planowanie_payload):
+        """Test that a key cannot be reused with another body, but other users have their own keys."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id), "Idempotency-Key": "same-key"}
+
+        client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+        response = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload(user, nazwa_projektu="Other"),
+            headers=headers
+        )
+        assert response.status_code == 422
+
+        other_user = test_users[2]
+        response = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload(other_user),
+            headers={"Authorization": str(other_user.id), "Idempotency-Key": "same-key"}
+        )
+        assert response.status_code == 200
+        assert db_session.query(PlanowanieBudzetu).count() == 2
+
+    def test_failed_request_is_not_stored(self, client, db_session, test_users, planowanie_payload):
+        """Test that an error response does not use up the key."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id), "Idempotency-Key": "failing"}
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload(user),
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "grupa_wydatkow_id", "value": "abc"},
+            headers=headers
+        )
+        assert response.status_code == 400
+        db_session.rollback()
+        assert db_session.query(IdempotencyKey).count() == 0
+
+    def test_expired_key_is_handled_again(self, client, db_session, test_users, planowanie_payload):
+        """Test that a retry after the TTL creates a new row."""
+        user = test_users[0]
+        headers = {"Authorization": str(user.id), "Idempotency-Key": "old"}
+
+        first = client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+        stored = db_session.get(IdempotencyKey, (user.id, "old"))
+        stored.created_at = datetime.utcnow() - timedelta(days=2)
+        db_session.commit()
+
+        retry = client.post("/api/planowanie_budzetu", json=planowanie_payload(user), headers=headers)
+
+        assert retry.json()["id"] != first.json()["id"]
+        assert "Idempotent-Replayed" not in retry.headers
@@ -1,4 +1,6 @@
+import json
 import pytest
+from datetime import datetime, timezone
 from src.schemas.planowanie_budzetu import PlanowanieBudzetu
 from src.schemas.rok_budzetowy import RokBudzetowy
 from src.schemas.versioned_fields import (
@@ -71,6 +73,36 @@ class TestPlanowanieBudzetuEndpoints:
         assert len(grupa_versions) == 1
         assert grupa_versions[0].value_int == 1
 
+    def test_create_planowanie_budzetu_query_count(self, client, db_session, test_users, query_counter):
+        """Test that initial versions are written with one insert per versioned table."""
+        user = test_users[0]
+        
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        query_counter.clear()
+        response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        inserts = [q for q in query_counter if q.startswith("INSERT INTO versioned_")]
+        assert len(inserts) == 2
+        
+        planowanie_id = response.json()["id"]
+        assert db_session.query(VersionedStringField).filter_by(entity_id=planowanie_id).count() == 4
+        assert db_session.query(VersionedForeignKeyField).filter_by(entity_id=planowanie_id).count() == 8
+
     def test_update_string_field(self, client, db_session, test_users):
         """Test updating a string field."""
         user = test_users[0]
@@ -265,47 +297,11 @@ class TestPlanowanieBudzetuEndpoints:
         assert versions[0].value == "Original justification"
         assert versions[1].value is None
 
-    def test_get_all_planowanie_budzetu(self, client, db_session, test_users):
-        """Test getting all planowanie_budzetu records with latest versions."""
-        user = test_users[0]
-        
-        # Create 2 records
-        for i in range(2):
-            payload = {
-                "nazwa_projektu": f"Project {i+1}",
-                "budzet": "2024",
-                "czesc_budzetowa_kod": "75",
-                "dzial_kod": "750",
-                "rozdzial_kod": "75011",
-                "paragraf_kod": "4210",
-                "zrodlo_finansowania_kod": "1",
-                "grupa_wydatkow_id": 1,
-                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
-            }
-            client.post(
-                "/api/planowanie_budzetu",
-                json=payload,
-                headers={"Authorization": str(user.id)}
-            )
-
-        response = client.get(
-            "/api/planowanie_budzetu",
-            headers={"Authorization": str(user.id)}
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2
-        assert all("id" in item for item in data)
-        assert all("nazwa_projektu" in item for item in data)
-
-    def test_get_single_planowanie_budzetu(self, client, db_session, test_users):
-        """Test getting a single planowanie_budzetu record."""
+    def test_update_with_same_value_is_noop(self, client, db_session, test_users):
+        """Test that re-saving the current value writes no version."""
         user = test_users[0]
-        
         payload = {
-            "nazwa_projektu": "Single Project",
-            "nazwa_zadania": "Task",
+            "nazwa_projektu": "Project",
             "budzet": "2024",
             "czesc_budzetowa_kod": "75",
             "dzial_kod": "750",
@@ -315,32 +311,47 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = create_response.json()["id"]
+        ).json()["id"]
 
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}",
+        for field, value in [("nazwa_projektu", "Project"), ("grupa_wydatkow_id", "1"), ("nazwa_zadania", None)]:
+            response = client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json={"field": field, "value": value, "expected_version": 1},
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.status_code == 200
+            assert response.json()["changed"] is False
+            assert response.json()["version"] == 1
+
+        response = client.patch(
+            "/api/planowanie_budzetu:batch",
+            json={"updates": [
+                {"id": planowanie_id, "field": "dzial_kod", "value": "750"},
+                {"id": planowanie_id, "field": "budzet", "value": "2025"},
+            ]},
             headers={"Authorization": str(user.id)}
         )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["id"] == planowanie_id
-        assert data["nazwa_projektu"] == "Single Project"
-        assert data["nazwa_zadania"] == "Task"
+        assert [r["status"] for r in response.json()["results"]] == ["unchanged", "updated"]
 
-    def test_get_field_history_string_field(self, client, db_session, test_users):
-        """Test getting history for a specific string field."""
+        assert db_session.query(VersionedStringField).filter_by(entity_id=planowanie_id).count() == 5
+        assert db_session.query(VersionedForeignKeyField).filter_by(entity_id=planowanie_id).count() == 8
+        fields = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        ).json()["fields"]
+        assert fields["nazwa_projektu"] is False
+        assert fields["budzet"] is True
+
+    def test_update_with_stale_timestamp(self, client, db_session, test_users):
+        """Test that a stale last_known_timestamp is rejected with the newer versions only."""
         user = test_users[0]
-        
-        # Create record
+        other_user = test_users[1]
         payload = {
-            "nazwa_projektu": "Original Project",
-            "nazwa_zadania": "Original Task",
+            "nazwa_projektu": "Project",
             "budzet": "2024",
             "czesc_budzetowa_kod": "75",
             "dzial_kod": "750",
@@ -350,49 +361,38 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = create_response.json()["id"]
+        ).json()["id"]
 
-        # Update nazwa_projektu several times
-        for i in range(3):
-            update_payload = {
-                "field": "nazwa_projektu",
-                "value": f"Updated Project {i+1}"
-            }
+        for field, value in (("nazwa_projektu", "Theirs"), ("budzet", "2025"), ("grupa_wydatkow_id", 2)):
             client.patch(
                 f"/api/planowanie_budzetu/{planowanie_id}",
-                json=update_payload,
-                headers={"Authorization": str(user.id)}
+                json={"field": field, "value": value},
+                headers={"Authorization": str(other_user.id)}
             )
 
-        # Get field history
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/field_history/nazwa_projektu",
-            headers={"Authorization": str(user.id)}
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["field_name"] == "nazwa_projektu"
-        assert "history" in data
-        
-        history = data["history"]
-        assert len(history) == 4  # Original + 3 updates
-        assert history[0]["value"] == "Updated Project 3"  # Most recent
-        assert history[-1]["value"] == "Original Project"  # Original
-        
-        # Verify all have timestamps
-        assert all("timestamp" in item for item in history)
-
-    def test_get_field_history_fk_string_field(self, client, db_session, test_users):
-        """Test getting history for a foreign key string field."""
+        for field, value in (("nazwa_projektu", "Theirs"), ("grupa_wydatkow_id", 2)):
+            response = client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json={"field": field, "value": 3 if field == "grupa_wydatkow_id" else "Mine",
+                      "last_known_timestamp": "2000-01-01T00:00:00"},
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.status_code == 409
+            changes = response.json()["detail"]["changes"]
+            assert [(c["value"], c["user_id"]) for c in changes] == [(value, other_user.id), (
+                "Project" if field == "nazwa_projektu" else 1, user.id
+            )]
+            assert [c["version"] for c in changes] == [2, 1]
+            assert set(changes[0]) == {"value", "timestamp", "user_id", "version"}
+
+    def test_update_with_expected_version(self, client, db_session, test_users):
+        """Test that a stale expected_version is rejected with the newer versions."""
         user = test_users[0]
-        
-        # Create record
+        other_user = test_users[1]
         payload = {
             "nazwa_projektu": "Project",
             "budzet": "2024",
@@ -404,46 +404,56 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=payload,
             headers={"Authorization": str(user.id)}
+        ).json()["id"]
+
+        row = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            headers={"Authorization": str(user.id)}
+        ).json()
+        assert row["versions"]["nazwa_projektu"] == 1
+
+        # Another user saves the cell first
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Theirs", "expected_version": 1},
+            headers={"Authorization": str(other_user.id)}
         )
-        planowanie_id = create_response.json()["id"]
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
 
-        # Update dzial_kod
-        for kod in ["801", "802"]:
-            update_payload = {
-                "field": "dzial_kod",
-                "value": kod
-            }
-            client.patch(
-                f"/api/planowanie_budzetu/{planowanie_id}",
-                json=update_payload,
-                headers={"Authorization": str(user.id)}
-            )
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Mine", "expected_version": 1},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 409
+        detail = response.json()["detail"]
+        assert detail["field"] == "nazwa_projektu"
+        assert [(c["value"], c["version"], c["user_id"]) for c in detail["changes"]] == [("Theirs", 2, other_user.id)]
 
-        # Get field history
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/field_history/dzial_kod",
+        # After reloading, the write goes through
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Mine", "expected_version": 2},
             headers={"Authorization": str(user.id)}
         )
-        
         assert response.status_code == 200
-        data = response.json()
-        assert data["field_name"] == "dzial_kod"
-        
-        history = data["history"]
-        assert len(history) == 3  # Original + 2 updates
-        assert history[0]["value"] == "802"
-        assert history[1]["value"] == "801"
-        assert history[2]["value"] == "750"
+        assert response.json()["version"] == 3
 
-    def test_get_field_history_fk_int_field(self, client, db_session, test_users):
-        """Test getting history for a foreign key integer field."""
+        versions = db_session.query(VersionedStringField).filter_by(
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name="nazwa_projektu"
+        ).order_by(VersionedStringField.version_number).all()
+        assert [(v.value, v.version_number) for v in versions] == [("Project", 1), ("Theirs", 2), ("Mine", 3)]
+
+    def test_update_version_taken_concurrently(self, client, db_session, test_users):
+        """Test that a version number written by a concurrent transaction results in 409."""
         user = test_users[0]
-        
-        # Create record
         payload = {
             "nazwa_projektu": "Project",
             "budzet": "2024",
@@ -455,46 +465,41 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = create_response.json()["id"]
+        ).json()["id"]
 
-        # Update grupa_wydatkow_id
-        for value in [2, 3]:
-            update_payload = {
-                "field": "grupa_wydatkow_id",
-                "value": value
-            }
-            client.patch(
-                f"/api/planowanie_budzetu/{planowanie_id}",
-                json=update_payload,
-                headers={"Authorization": str(user.id)}
-            )
+        # Version 2 committed by another writer after this request read version 1
+        db_session.add(VersionedStringField(
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name="nazwa_projektu",
+            value="Concurrent",
+            version_number=2,
+            timestamp=datetime.utcnow()
+        ))
+        db_session.commit()
 
-        # Get field history
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/field_history/grupa_wydatkow_id",
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Mine"},
             headers={"Authorization": str(user.id)}
         )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["field_name"] == "grupa_wydatkow_id"
-        
-        history = data["history"]
-        assert len(history) == 3
-        assert history[0]["value"] == 3
-        assert history[1]["value"] == 2
-        assert history[2]["value"] == 1
+        assert response.status_code == 409
 
-    def test_get_field_history_unknown_field(self, client, db_session, test_users):
-        """Test getting history for a field that doesn't exist."""
+        versions = db_session.query(VersionedStringField).filter_by(
+            entity_type="planowanie_budzetu",
+            entity_id=planowanie_id,
+            field_name="nazwa_projektu"
+        ).all()
+        assert sorted(v.value for v in versions) == ["Concurrent", "Project"]
+
+    def test_batch_update_cells(self, client, db_session, test_users, query_counter):
+        """Test updating many cells in one request with per-cell results."""
         user = test_users[0]
         
-        # Create record
         payload = {
             "nazwa_projektu": "Project",
             "budzet": "2024",
@@ -506,35 +511,58 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
-            "/api/planowanie_budzetu",
-            json=payload,
-            headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = create_response.json()["id"]
-
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/field_history/non_existent_field",
-            headers={"Authorization": str(user.id)}
-        )
-        
-        assert response.status_code == 400
-        assert "Unknown field" in response.json()["detail"]
-
-    def test_get_field_history_nonexistent_record(self, client, test_users):
-        """Test getting field history for a record that doesn't exist."""
-        user = test_users[0]
-        
-        response = client.get(
-            "/api/planowanie_budzetu/99999/field_history/nazwa_projektu",
+        ids = [
+            client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            ).json()["id"]
+            for _ in range(3)
+        ]
+        
+        updates = [
+            {"id": planowanie_id, "field": "nazwa_projektu", "value": f"Pasted {planowanie_id}"}
+            for planowanie_id in ids
+        ] + [
+            {"id": ids[0], "field": "grupa_wydatkow_id", "value": 2},
+            {"id": ids[1], "field": "dzial_kod", "value": None},
+            {"id": ids[1], "field": "unknown_field", "value": "x"},
+            {"id": ids[2], "field": "budzet", "value": "2025", "last_known_timestamp": "2000-01-01T00:00:00"},
+            {"id": ids[2], "field": "rozdzial_kod", "value": "75012", "expected_version": 0},
+        ]
+        query_counter.clear()
+        response = client.patch(
+            "/api/planowanie_budzetu:batch",
+            json={"updates": updates},
             headers={"Authorization": str(user.id)}
         )
         
-        assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
-
-    def test_update_unknown_field(self, client, db_session, test_users):
-        """Test updating a field that doesn't exist."""
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["status"] for r in results] == ["updated"] * 4 + ["error", "error", "conflict", "conflict"]
+        assert results[5]["message"] == "Unknown field: unknown_field"
+        assert results[6]["changes"][0]["value"] == "2024"
+        assert [(c["value"], c["version"]) for c in results[7]["changes"]] == [("75011", 1)]
+        assert [r["version"] for r in results[:4]] == [2, 2, 2, 2]
+        
+        # Versions of all cells are written with one insert per versioned table
+        inserts = [q for q in query_counter if q.startswith("INSERT INTO versioned_")]
+        assert len(inserts) == 2
+
+        for planowanie_id in ids:
+            response = client.get(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                headers={"Authorization": str(user.id)}
+            )
+            data = response.json()
+            assert data["nazwa_projektu"] == f"Pasted {planowanie_id}"
+            assert data["dzial_kod"] == "750"
+            assert data["budzet"] == "2024"
+            assert data["rozdzial_kod"] == "75011"
+            assert data["grupa_wydatkow_id"] == (2 if planowanie_id == ids[0] else 1)
+
+    def test_batch_update_same_cell_twice(self, client, db_session, test_users):
+        """Test that repeated updates of a cell in one batch write the last value once."""
         user = test_users[0]
         
         payload = {
@@ -548,45 +576,465 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=payload,
             headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        
+        updates = [
+            {"id": planowanie_id, "field": "nazwa_projektu", "value": "First", "expected_version": 1},
+            {"id": planowanie_id, "field": "budzet", "value": "2025"},
+            {"id": planowanie_id, "field": "nazwa_projektu", "value": "Second", "expected_version": 2},
+            {"id": planowanie_id, "field": "budzet", "value": "2026"},
+        ]
+        response = client.patch(
+            "/api/planowanie_budzetu:batch",
+            json={"updates": updates},
+            headers={"Authorization": str(user.id)}
         )
-        planowanie_id = create_response.json()["id"]
-
-        update_payload = {
-            "field": "non_existent_field",
-            "value": "some value"
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [(r["field"], r["status"], r["value"], r["version"]) for r in results] == [
+            ("nazwa_projektu", "updated", "Second", 2),
+            ("budzet", "updated", "2026", 2),
+            ("nazwa_projektu", "updated", "Second", 2),
+            ("budzet", "updated", "2026", 2),
+        ]
+        
+        data = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            headers={"Authorization": str(user.id)}
+        ).json()
+        assert (data["nazwa_projektu"], data["budzet"]) == ("Second", "2026")
+        assert data["versions"]["budzet"] == 2
+        
+        # The first expected_version of the cell is checked
+        updates = [
+            {"id": planowanie_id, "field": "nazwa_projektu", "value": "Third", "expected_version": 1},
+            {"id": planowanie_id, "field": "nazwa_projektu", "value": "Fourth", "expected_version": 2},
+        ]
+        response = client.patch(
+            "/api/planowanie_budzetu:batch",
+            json={"updates": updates},
+            headers={"Authorization": str(user.id)}
+        )
+        assert [r["status"] for r in response.json()["results"]] == ["conflict", "conflict"]
+
+    def test_batch_update_cells_from_different_komorka(self, client, db_session, test_users):
+        """Test that a batch touching another komorka's planowanie is rejected as a whole."""
+        user = test_users[0]
+        other_user = test_users[2]
+        
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
+        own_id = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        other_id = client.post(
+            "/api/planowanie_budzetu",
+            json={**payload, "komorka_organizacyjna_id": other_user.komorka_organizacyjna_id},
+            headers={"Authorization": str(other_user.id)}
+        ).json()["id"]
+        
         response = client.patch(
-            f"/api/planowanie_budzetu/{planowanie_id}",
-            json=update_payload,
+            "/api/planowanie_budzetu:batch",
+            json={"updates": [
+                {"id": own_id, "field": "nazwa_projektu", "value": "Mine"},
+                {"id": other_id, "field": "nazwa_projektu", "value": "Theirs"},
+            ]},
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 403
+        versions = db_session.query(VersionedStringField).filter_by(
+            entity_type="planowanie_budzetu",
+            field_name="nazwa_projektu",
+            value="Mine"
+        ).count()
+        assert versions == 0
+
+    def test_get_all_planowanie_budzetu(self, client, db_session, test_users):
+        """Test getting all planowanie_budzetu records with latest versions."""
+        user = test_users[0]
+        
+        # Create 2 records
+        for i in range(2):
+            payload = {
+                "nazwa_projektu": f"Project {i+1}",
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            )
+
+        response = client.get(
+            "/api/planowanie_budzetu",
             headers={"Authorization": str(user.id)}
         )
         
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 2
+        assert all("id" in item for item in data)
+        assert all("nazwa_projektu" in item for item in data)
+
+    def test_get_all_planowanie_budzetu_query_count(self, client, db_session, test_users, query_counter):
+        """Test that listing planowanie_budzetu runs a constant number of queries."""
+        user = test_users[0]
+
+        def create_records(count):
+            for i in range(count):
+                payload = {
+                    "nazwa_projektu": f"Project {i+1}",
+                    "budzet": "2024",
+                    "czesc_budzetowa_kod": "75",
+                    "dzial_kod": "750",
+                    "rozdzial_kod": "75011",
+                    "paragraf_kod": "4210",
+                    "zrodlo_finansowania_kod": "1",
+                    "grupa_wydatkow_id": 1,
+                    "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+                }
+                client.post(
+                    "/api/planowanie_budzetu",
+                    json=payload,
+                    headers={"Authorization": str(user.id)}
+                )
+
+        def count_list_queries():
+            query_counter.clear()
+            response = client.get(
+                "/api/planowanie_budzetu",
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.status_code == 200
+            return len(response.json()), len(query_counter)
+
+        create_records(2)
+        rows_small, queries_small = count_list_queries()
+
+        create_records(5)
+        rows_large, queries_large = count_list_queries()
+
+        assert rows_small == 2
+        assert rows_large == 7
+        assert queries_large == queries_small
+        assert queries_small <= 5
+
+    def test_get_all_planowanie_budzetu_include_lata(self, client, db_session, test_users, query_counter):
+        """Test embedding lata_budzetowe with a constant number of queries."""
+        user = test_users[0]
+
+        def create_records(count):
+            for i in range(count):
+                payload = {
+                    "nazwa_projektu": f"Project {i+1}",
+                    "budzet": "2024",
+                    "czesc_budzetowa_kod": "75",
+                    "dzial_kod": "750",
+                    "rozdzial_kod": "75011",
+                    "paragraf_kod": "4210",
+                    "zrodlo_finansowania_kod": "1",
+                    "grupa_wydatkow_id": 1,
+                    "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+                }
+                planowanie_id = client.post(
+                    "/api/planowanie_budzetu",
+                    json=payload,
+                    headers={"Authorization": str(user.id)}
+                ).json()["id"]
+                for rok in (2027, 2026):
+                    client.post(
+                        "/api/rok_budzetowy",
+                        json={"planowanie_budzetu_id": planowanie_id, "rok": rok, "limit": 100.0, "potrzeba": rok},
+                        headers={"Authorization": str(user.id)}
+                    )
+
+        def list_with_lata():
+            query_counter.clear()
+            response = client.get(
+                "/api/planowanie_budzetu",
+                params={"include": "lata"},
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.status_code == 200
+            return response.json(), len(query_counter)
+
+        create_records(1)
+        data_small, queries_small = list_with_lata()
+
+        create_records(4)
+        data_large, queries_large = list_with_lata()
+
+        assert len(data_large) == 5
+        assert queries_large == queries_small
+        for row in data_large:
+            assert [rok["rok"] for rok in row["lata_budzetowe"]] == [2026, 2027]
+            assert all(rok["planowanie_budzetu_id"] == row["id"] for rok in row["lata_budzetowe"])
+            assert row["lata_budzetowe"][0]["potrzeba"] == 2026.0
+            assert row["lata_budzetowe"][0]["limit"] == 100.0
+
+        # Without include the rows do not carry lata_budzetowe
+        response = client.get(
+            f"/api/planowanie_budzetu/{data_large[0]['id']}",
+            headers={"Authorization": str(user.id)}
+        )
+        assert "lata_budzetowe" not in response.json()
+
+        response = client.get(
+            f"/api/planowanie_budzetu/{data_large[0]['id']}",
+            params={"include": "lata"},
+            headers={"Authorization": str(user.id)}
+        )
+        assert len(response.json()["lata_budzetowe"]) == 2
+
+        response = client.get(
+            "/api/planowanie_budzetu",
+            params={"include": "years"},
+            headers={"Authorization": str(user.id)}
+        )
         assert response.status_code == 400
-        assert "Unknown field" in response.json()["detail"]
 
-    def test_get_nonexistent_record(self, client, test_users):
-        """Test getting a record that doesn't exist."""
+    def test_get_all_planowanie_budzetu_keyset_pagination(self, client, db_session, test_users):
+        """Test paging through planowanie_budzetu sorted by a versioned field."""
+        user = test_users[0]
+        
+        names = ["Beta", None, "Alpha", "Beta", None, "Gamma"]
+        for name in names:
+            payload = {
+                "nazwa_projektu": name,
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            )
+
+        for sort in ("nazwa_projektu", "-nazwa_projektu", "-id"):
+            full = client.get(
+                "/api/planowanie_budzetu",
+                params={"sort": sort},
+                headers={"Authorization": str(user.id)}
+            ).json()
+            
+            pages = []
+            after = None
+            while True:
+                params = {"sort": sort, "limit": 2}
+                if after:
+                    params["after"] = after
+                response = client.get(
+                    "/api/planowanie_budzetu",
+                    params=params,
+                    headers={"Authorization": str(user.id)}
+                )
+                assert response.status_code == 200
+                assert len(response.json()) <= 2
+                pages.extend(response.json())
+                after = response.headers.get("X-Next-Cursor")
+                if not after:
+                    break
+            
+            assert pages == full
+            assert len(pages) == len(names)
+
+        ascending = client.get(
+            "/api/planowanie_budzetu",
+            params={"sort": "nazwa_projektu"},
+            headers={"Authorization": str(user.id)}
+        ).json()
+        assert [row["nazwa_projektu"] for row in ascending] == ["Alpha", "Beta", "Beta", "Gamma", None, None]
+
+    def test_get_all_planowanie_budzetu_invalid_sort_or_cursor(self, client, db_session, test_users):
+        """Test that unknown sort fields and malformed cursors are rejected."""
         user = test_users[0]
         
         response = client.get(
-            "/api/planowanie_budzetu/99999",
+            "/api/planowanie_budzetu",
+            params={"sort": "user_id"},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 400
+        
+        response = client.get(
+            "/api/planowanie_budzetu",
+            params={"after": "not-a-cursor"},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 400
+
+        # Well-formed cursors with values that do not fit the sort column
+        from src.pagination import encode_cursor
+        for url, sort, value in (
+            ("/api/planowanie_budzetu", "nazwa_projektu", {"a": 1}),
+            ("/api/planowanie_budzetu", "nazwa_projektu", 5),
+            ("/api/planowanie_budzetu", "grupa_wydatkow_id", "abc"),
+            ("/api/rok_budzetowy", "limit", "abc"),
+            ("/api/rok_budzetowy", "-potrzeba", "NaN"),
+            ("/api/rok_budzetowy", "potrzeba", [1]),
+        ):
+            response = client.get(
+                url,
+                params={"sort": sort, "after": encode_cursor(sort, value, 1)},
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Invalid cursor"
+
+        response = client.get(
+            "/api/rok_budzetowy",
+            params={"sort": "limit", "after": encode_cursor("limit", "10.50", 1)},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 200
+
+    def test_get_single_planowanie_budzetu(self, client, db_session, test_users):
+        """Test getting a single planowanie_budzetu record."""
+        user = test_users[0]
+        
+        payload = {
+            "nazwa_projektu": "Single Project",
+            "nazwa_zadania": "Task",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
             headers={"Authorization": str(user.id)}
         )
         
+        assert response.status_code == 200
+        data = response.json()
+        assert data["id"] == planowanie_id
+        assert data["nazwa_projektu"] == "Single Project"
+        assert data["nazwa_zadania"] == "Task"
+
+    def test_get_planowanie_budzetu_as_of(self, client, db_session, test_users):
+        """Test reading planowanie_budzetu as it stood at a past moment."""
+        user = test_users[0]
+        
+        def create(name):
+            payload = {
+                "nazwa_projektu": name,
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            return client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            ).json()["id"]
+
+        planowanie_id = create("Submitted")
+        deadline = datetime.utcnow()
+
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Changed"},
+            headers={"Authorization": str(user.id)}
+        )
+        create("Late")
+
+        response = client.get(
+            "/api/planowanie_budzetu",
+            params={"as_of": deadline.isoformat()},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [row["id"] for row in data] == [planowanie_id]
+        assert data[0]["nazwa_projektu"] == "Submitted"
+        assert data[0]["dzial_kod"] == "750"
+        assert data[0]["komorka_organizacyjna_id"] == user.komorka_organizacyjna_id
+
+        # Timezone-aware timestamps are compared in UTC
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            params={"as_of": deadline.replace(tzinfo=timezone.utc).isoformat()},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 200
+        assert response.json()["nazwa_projektu"] == "Submitted"
+
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.json()["nazwa_projektu"] == "Changed"
+
+        # Before the planowanie was created
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            params={"as_of": "2000-01-01T00:00:00"},
+            headers={"Authorization": str(user.id)}
+        )
         assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
 
-    def test_get_fields_history_status_no_history(self, client, db_session, test_users):
-        """Test getting fields history status when no fields have been updated."""
+        # Other komorka does not see the snapshot either
+        response = client.get(
+            "/api/planowanie_budzetu",
+            params={"as_of": deadline.isoformat()},
+            headers={"Authorization": str(test_users[2].id)}
+        )
+        assert response.json() == []
+
+    def test_get_field_history_string_field(self, client, db_session, test_users):
+        """Test getting history for a specific string field."""
         user = test_users[0]
         
         # Create record
         payload = {
-            "nazwa_projektu": "Project",
+            "nazwa_projektu": "Original Project",
+            "nazwa_zadania": "Original Task",
             "budzet": "2024",
             "czesc_budzetowa_kod": "75",
             "dzial_kod": "750",
@@ -603,23 +1051,269 @@ class TestPlanowanieBudzetuEndpoints:
         )
         planowanie_id = create_response.json()["id"]
 
-        # Get fields history status
+        # Update nazwa_projektu several times
+        for i in range(3):
+            update_payload = {
+                "field": "nazwa_projektu",
+                "value": f"Updated Project {i+1}"
+            }
+            client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json=update_payload,
+                headers={"Authorization": str(user.id)}
+            )
+
+        # Get field history
         response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+            f"/api/planowanie_budzetu/{planowanie_id}/field_history/nazwa_projektu",
             headers={"Authorization": str(user.id)}
         )
         
         assert response.status_code == 200
         data = response.json()
-        assert "fields" in data
+        assert data["field_name"] == "nazwa_projektu"
+        assert "history" in data
         
-        fields = data["fields"]
-        # All fields should have False since nothing was updated
-        assert fields["nazwa_projektu"] is False
-        assert fields["nazwa_zadania"] is False
-        assert fields["szczegolowe_uzasadnienie_realizacji"] is False
-        assert fields["budzet"] is False
-        assert fields["czesc_budzetowa_kod"] is False
+        history = data["history"]
+        assert len(history) == 4  # Original + 3 updates
+        assert history[0]["value"] == "Updated Project 3"  # Most recent
+        assert history[-1]["value"] == "Original Project"  # Original
+        
+        # Verify all have timestamps
+        assert all("timestamp" in item for item in history)
+
+    def test_get_field_history_fk_string_field(self, client, db_session, test_users):
+        """Test getting history for a foreign key string field."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        # Update dzial_kod
+        for kod in ["801", "802"]:
+            update_payload = {
+                "field": "dzial_kod",
+                "value": kod
+            }
+            client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json=update_payload,
+                headers={"Authorization": str(user.id)}
+            )
+
+        # Get field history
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/field_history/dzial_kod",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["field_name"] == "dzial_kod"
+        
+        history = data["history"]
+        assert len(history) == 3  # Original + 2 updates
+        assert history[0]["value"] == "802"
+        assert history[1]["value"] == "801"
+        assert history[2]["value"] == "750"
+
+    def test_get_field_history_fk_int_field(self, client, db_session, test_users):
+        """Test getting history for a foreign key integer field."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        # Update grupa_wydatkow_id
+        for value in [2, 3]:
+            update_payload = {
+                "field": "grupa_wydatkow_id",
+                "value": value
+            }
+            client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json=update_payload,
+                headers={"Authorization": str(user.id)}
+            )
+
+        # Get field history
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/field_history/grupa_wydatkow_id",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["field_name"] == "grupa_wydatkow_id"
+        
+        history = data["history"]
+        assert len(history) == 3
+        assert history[0]["value"] == 3
+        assert history[1]["value"] == 2
+        assert history[2]["value"] == 1
+
+    def test_get_field_history_unknown_field(self, client, db_session, test_users):
+        """Test getting history for a field that doesn't exist."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/field_history/non_existent_field",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 400
+        assert "Unknown field" in response.json()["detail"]
+
+    def test_get_field_history_nonexistent_record(self, client, test_users):
+        """Test getting field history for a record that doesn't exist."""
+        user = test_users[0]
+        
+        response = client.get(
+            "/api/planowanie_budzetu/99999/field_history/nazwa_projektu",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 404
+        assert "not found" in response.json()["detail"].lower()
+
+    def test_update_unknown_field(self, client, db_session, test_users):
+        """Test updating a field that doesn't exist."""
+        user = test_users[0]
+        
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        update_payload = {
+            "field": "non_existent_field",
+            "value": "some value"
+        }
+        response = client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json=update_payload,
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 400
+        assert "Unknown field" in response.json()["detail"]
+
+    def test_get_nonexistent_record(self, client, test_users):
+        """Test getting a record that doesn't exist."""
+        user = test_users[0]
+        
+        response = client.get(
+            "/api/planowanie_budzetu/99999",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 404
+        assert "not found" in response.json()["detail"].lower()
+
+    def test_get_fields_history_status_no_history(self, client, db_session, test_users):
+        """Test getting fields history status when no fields have been updated."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        # Get fields history status
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert "fields" in data
+        
+        fields = data["fields"]
+        # All fields should have False since nothing was updated
+        assert fields["nazwa_projektu"] is False
+        assert fields["nazwa_zadania"] is False
+        assert fields["szczegolowe_uzasadnienie_realizacji"] is False
+        assert fields["budzet"] is False
+        assert fields["czesc_budzetowa_kod"] is False
         assert fields["dzial_kod"] is False
         assert fields["rozdzial_kod"] is False
         assert fields["paragraf_kod"] is False
@@ -627,14 +1321,509 @@ class TestPlanowanieBudzetuEndpoints:
         assert fields["grupa_wydatkow_id"] is False
         assert fields["komorka_organizacyjna_id"] is False
 
-    def test_get_fields_history_status_with_updates(self, client, db_session, test_users):
-        """Test getting fields history status after some fields have been updated."""
+    def test_get_fields_history_status_with_updates(self, client, db_session, test_users):
+        """Test getting fields history status after some fields have been updated."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Original Project",
+            "nazwa_zadania": "Original Task",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        # Update some fields
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Updated Project"},
+            headers={"Authorization": str(user.id)}
+        )
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "dzial_kod", "value": "801"},
+            headers={"Authorization": str(user.id)}
+        )
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "grupa_wydatkow_id", "value": 2},
+            headers={"Authorization": str(user.id)}
+        )
+
+        # Get fields history status
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert "fields" in data
+        
+        fields = data["fields"]
+        # Updated fields should have True
+        assert fields["nazwa_projektu"] is True
+        assert fields["dzial_kod"] is True
+        assert fields["grupa_wydatkow_id"] is True
+        
+        # Non-updated fields should have False
+        assert fields["nazwa_zadania"] is False
+        assert fields["szczegolowe_uzasadnienie_realizacji"] is False
+        assert fields["budzet"] is False
+        assert fields["czesc_budzetowa_kod"] is False
+        assert fields["rozdzial_kod"] is False
+        assert fields["paragraf_kod"] is False
+        assert fields["zrodlo_finansowania_kod"] is False
+        assert fields["komorka_organizacyjna_id"] is False
+
+    def test_get_fields_history_status_multiple_updates_same_field(self, client, db_session, test_users):
+        """Test that field shows history status even after multiple updates."""
+        user = test_users[0]
+        
+        # Create record
+        payload = {
+            "nazwa_projektu": "Original",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        create_response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = create_response.json()["id"]
+
+        # Update the same field multiple times
+        for i in range(5):
+            client.patch(
+                f"/api/planowanie_budzetu/{planowanie_id}",
+                json={"field": "nazwa_projektu", "value": f"Version {i+1}"},
+                headers={"Authorization": str(user.id)}
+            )
+
+        # Get fields history status
+        response = client.get(
+            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        fields = data["fields"]
+        
+        # Should still show True (has more than 1 version)
+        assert fields["nazwa_projektu"] is True
+
+    def test_get_fields_history_status_nonexistent_record(self, client, test_users):
+        """Test getting fields history status for non-existent record."""
+        user = test_users[0]
+        
+        response = client.get(
+            "/api/planowanie_budzetu/99999/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 404
+        assert "not found" in response.json()["detail"].lower()
+
+
+    def test_get_fields_history_status_bulk(self, client, db_session, test_users, query_counter):
+        """Test getting fields history status for many records in one request."""
+        user = test_users[0]
+        
+        ids = []
+        for i in range(3):
+            payload = {
+                "nazwa_projektu": f"Project {i}",
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            create_response = client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            )
+            ids.append(create_response.json()["id"])
+
+        client.patch(
+            f"/api/planowanie_budzetu/{ids[0]}",
+            json={"field": "nazwa_projektu", "value": "Changed"},
+            headers={"Authorization": str(user.id)}
+        )
+        client.patch(
+            f"/api/planowanie_budzetu/{ids[2]}",
+            json={"field": "dzial_kod", "value": "801"},
+            headers={"Authorization": str(user.id)}
+        )
+
+        query_counter.clear()
+        response = client.get(
+            "/api/planowanie_budzetu/fields_history_status",
+            params={"ids": ids},
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        entities = response.json()["entities"]
+        assert set(entities) == {str(i) for i in ids}
+        assert [name for name, changed in entities[str(ids[0])].items() if changed] == ["nazwa_projektu"]
+        assert not any(entities[str(ids[1])].values())
+        assert [name for name, changed in entities[str(ids[2])].items() if changed] == ["dzial_kod"]
+        # One grouped query per versioned table holding planowanie fields
+        assert len([q for q in query_counter if "versioned_" in q]) == 2
+
+    def test_get_fields_history_status_bulk_from_different_komorka(self, client, db_session, test_users):
+        """Test that bulk history status is denied when any record belongs to another komorka."""
+        user1 = test_users[0]
+        user2 = test_users[2]
+        
+        ids = []
+        for user in (user1, user2):
+            payload = {
+                "nazwa_projektu": "Project",
+                "budzet": "2024",
+                "czesc_budzetowa_kod": "75",
+                "dzial_kod": "750",
+                "rozdzial_kod": "75011",
+                "paragraf_kod": "4210",
+                "zrodlo_finansowania_kod": "1",
+                "grupa_wydatkow_id": 1,
+                "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+            }
+            create_response = client.post(
+                "/api/planowanie_budzetu",
+                json=payload,
+                headers={"Authorization": str(user.id)}
+            )
+            ids.append(create_response.json()["id"])
+
+        response = client.get(
+            "/api/planowanie_budzetu/fields_history_status",
+            params={"ids": ids},
+            headers={"Authorization": str(user1.id)}
+        )
+        assert response.status_code == 403
+
+        response = client.get(
+            "/api/planowanie_budzetu/fields_history_status",
+            params={"ids": [ids[0], 99999]},
+            headers={"Authorization": str(user1.id)}
+        )
+        assert response.status_code == 404
+
+
+class TestRokBudzetowyEndpoints:
+    """Tests for rok_budzetowy endpoints."""
+
+    def test_create_rok_budzetowy(self, client, db_session, test_users):
+        """Test creating a new rok_budzetowy record."""
+        user = test_users[0]
+        
+        # First create planowanie_budzetu
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        planowanie_response = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = planowanie_response.json()["id"]
+
+        # Create rok_budzetowy
+        payload = {
+            "planowanie_budzetu_id": planowanie_id,
+            "limit": 50000.00,
+            "potrzeba": 75000.00
+        }
+        response = client.post(
+            "/api/rok_budzetowy",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert "id" in data
+        
+        rok_id = data["id"]
+
+        # Verify in database
+        rok = db_session.query(RokBudzetowy).filter_by(id=rok_id).first()
+        assert rok is not None
+        assert rok.planowanie_budzetu_id == planowanie_id
+
+        # Check versioned numeric fields
+        limit_versions = db_session.query(VersionedNumericField).filter_by(
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name="limit"
+        ).all()
+        assert len(limit_versions) == 1
+        assert float(limit_versions[0].value) == 50000.00
+
+        potrzeba_versions = db_session.query(VersionedNumericField).filter_by(
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name="potrzeba"
+        ).all()
+        assert len(potrzeba_versions) == 1
+        assert float(potrzeba_versions[0].value) == 75000.00
+
+    def test_update_numeric_field(self, client, db_session, test_users):
+        """Test updating a numeric field."""
+        user = test_users[0]
+        
+        # Create planowanie_budzetu and rok_budzetowy
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        planowanie_response = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        )
+        planowanie_id = planowanie_response.json()["id"]
+
+        rok_payload = {
+            "planowanie_budzetu_id": planowanie_id,
+            "limit": 50000.00,
+            "potrzeba": 75000.00
+        }
+        rok_response = client.post(
+            "/api/rok_budzetowy",
+            json=rok_payload,
+            headers={"Authorization": str(user.id)}
+        )
+        rok_id = rok_response.json()["id"]
+
+        # Update limit
+        update_payload = {
+            "field": "limit",
+            "value": 60000.00
+        }
+        response = client.patch(
+            f"/api/rok_budzetowy/{rok_id}",
+            json=update_payload,
+            headers={"Authorization": str(user.id)}
+        )
+        
+        assert response.status_code == 200
+
+        # Verify versions
+        versions = db_session.query(VersionedNumericField).filter_by(
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name="limit"
+        ).order_by(VersionedNumericField.timestamp).all()
+        
+        assert len(versions) == 2
+        assert float(versions[0].value) == 50000.00
+        assert float(versions[1].value) == 60000.00
+
+    def test_update_numeric_field_with_same_value_is_noop(self, client, db_session, test_users):
+        """Test that a numeric value equal to the stored one writes no version."""
+        user = test_users[0]
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        rok_id = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 50000.0, "potrzeba": 100.5},
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+
+        for field, value, changed in [("limit", 50000, False), ("potrzeba", "100.50", False), ("potrzeba", 100.51, True)]:
+            response = client.patch(
+                f"/api/rok_budzetowy/{rok_id}",
+                json={"field": field, "value": value},
+                headers={"Authorization": str(user.id)}
+            )
+            assert response.json()["changed"] is changed
+
+        assert db_session.query(VersionedNumericField).filter_by(entity_id=rok_id).count() == 3
+
+    def test_update_numeric_field_coalesced(self, client, db_session, test_users, monkeypatch):
+        """Test that quick successive edits of a cell by one user are kept as one version."""
+        monkeypatch.setattr("src.versioning_utils.VERSION_COALESCE_SECONDS", 60)
+        user = test_users[0]
+        other_user = test_users[1]
+
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        rok_id = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 100.0, "potrzeba": 100.0},
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+
+        def update(value, by=user, expected_version=None):
+            return client.patch(
+                f"/api/rok_budzetowy/{rok_id}",
+                json={"field": "limit", "value": value, "expected_version": expected_version},
+                headers={"Authorization": str(by.id)}
+            )
+
+        # The initial version is kept, the corrections replace each other
+        assert update(110.0).json()["version"] == 2
+        assert update(120.0).json()["version"] == 3
+        response = update(130.0, expected_version=3)
+        assert response.status_code == 200
+        assert response.json()["version"] == 4
+        # Another user's edit is never merged into the pending one
+        update(140.0, by=other_user)
+
+        versions = db_session.query(VersionedNumericField).filter_by(
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name="limit"
+        ).order_by(VersionedNumericField.version_number).all()
+        assert [(float(v.value), v.version_number) for v in versions] == [(100.0, 1), (130.0, 4), (140.0, 5)]
+
+        history = client.get(
+            f"/api/rok_budzetowy/{rok_id}/field_history/limit",
+            headers={"Authorization": str(user.id)}
+        ).json()
+        assert len(history["history"]) == 3
+
+    def test_update_coalesced_back_to_previous_value(self, client, db_session, test_users, monkeypatch):
+        """Test that a quick edit undone within the coalescing window leaves one version, numbered after it."""
+        monkeypatch.setattr("src.versioning_utils.VERSION_COALESCE_SECONDS", 60)
+        user = test_users[0]
+
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        planowanie_id = client.post(
+            "/api/planowanie_budzetu",
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        rok_id = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 100.0, "potrzeba": 100.0},
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+
+        def update(value, expected_version=None):
+            return client.patch(
+                f"/api/rok_budzetowy/{rok_id}",
+                json={"field": "limit", "value": value, "expected_version": expected_version},
+                headers={"Authorization": str(user.id)}
+            )
+
+        assert update(110.0).json()["version"] == 2
+        seen_at = datetime.utcnow().isoformat()
+        response = update(100.0, expected_version=2)
+        assert response.status_code == 200
+        assert response.json()["version"] == 3
+
+        rok = client.get(f"/api/rok_budzetowy/{rok_id}", headers={"Authorization": str(user.id)}).json()
+        assert (rok["limit"], rok["versions"]["limit"]) == (100.0, 3)
+        fields = client.get(
+            f"/api/rok_budzetowy/{rok_id}/fields_history_status",
+            headers={"Authorization": str(user.id)}
+        ).json()["fields"]
+        assert fields["limit"] is False
+
+        # Clients that saw the undone edit, by version or by time, get a conflict
+        assert update(130.0, expected_version=2).status_code == 409
+        stale = client.patch(
+            f"/api/rok_budzetowy/{rok_id}",
+            json={"field": "limit", "value": 130.0, "last_known_timestamp": seen_at},
+            headers={"Authorization": str(test_users[1].id)}
+        )
+        assert stale.status_code == 409
+
+        # The version before the undone edit is kept when the cell is edited again
+        assert update(120.0, expected_version=3).json()["version"] == 4
+        versions = db_session.query(VersionedNumericField).filter_by(
+            entity_type="rok_budzetowy",
+            entity_id=rok_id,
+            field_name="limit"
+        ).order_by(VersionedNumericField.version_number).all()
+        assert [(float(v.value), v.version_number) for v in versions] == [(100.0, 3), (120.0, 4)]
+
+    def test_put_lata_budzetowe(self, client, db_session, test_users, query_counter):
+        """Test creating and updating all years of a planowanie in one request."""
         user = test_users[0]
-        
-        # Create record
-        payload = {
-            "nazwa_projektu": "Original Project",
-            "nazwa_zadania": "Original Task",
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
             "budzet": "2024",
             "czesc_budzetowa_kod": "75",
             "dzial_kod": "750",
@@ -644,63 +1833,83 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
-            json=payload,
+            json=planowanie_payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = create_response.json()["id"]
+        ).json()["id"]
+        existing_id = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 100.0, "potrzeba": 100.0},
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
 
-        # Update some fields
-        client.patch(
-            f"/api/planowanie_budzetu/{planowanie_id}",
-            json={"field": "nazwa_projektu", "value": "Updated Project"},
+        lata = [{"rok": 2026 + i, "limit": 100.0, "potrzeba": 200.0 + i} for i in range(4)]
+        query_counter.clear()
+        response = client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": lata},
             headers={"Authorization": str(user.id)}
         )
-        client.patch(
-            f"/api/planowanie_budzetu/{planowanie_id}",
-            json={"field": "dzial_kod", "value": "801"},
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [(r["rok"], r["limit"], r["potrzeba"]) for r in data] == [
+            (2026, 100.0, 200.0), (2027, 100.0, 201.0), (2028, 100.0, 202.0), (2029, 100.0, 203.0)
+        ]
+        assert data[0]["id"] == existing_id
+        assert data[0]["versions"] == {"limit": 1, "potrzeba": 2}
+        # The planowanie is locked, then one insert of the new years and one of all their versions
+        assert len([q for q in query_counter if q.rstrip().endswith("FOR UPDATE")]) == 1
+        assert len([q for q in query_counter if q.startswith("INSERT INTO rok_budzetowy ")]) == 1
+        assert len([q for q in query_counter if q.startswith("INSERT INTO versioned_")]) == 1
+        assert db_session.query(RokBudzetowy).filter_by(planowanie_budzetu_id=planowanie_id).count() == 4
+
+        # Repeating the request changes nothing
+        response = client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": lata},
             headers={"Authorization": str(user.id)}
         )
-        client.patch(
-            f"/api/planowanie_budzetu/{planowanie_id}",
-            json={"field": "grupa_wydatkow_id", "value": 2},
+        assert response.json() == data
+        assert db_session.query(VersionedNumericField).filter_by(entity_type="rok_budzetowy").count() == 9
+
+        response = client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": [lata[0], lata[0]]},
             headers={"Authorization": str(user.id)}
         )
+        assert response.status_code == 400
 
-        # Get fields history status
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
-            headers={"Authorization": str(user.id)}
+        response = client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": lata},
+            headers={"Authorization": str(test_users[2].id)}
         )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "fields" in data
-        
-        fields = data["fields"]
-        # Updated fields should have True
-        assert fields["nazwa_projektu"] is True
-        assert fields["dzial_kod"] is True
-        assert fields["grupa_wydatkow_id"] is True
-        
-        # Non-updated fields should have False
-        assert fields["nazwa_zadania"] is False
-        assert fields["szczegolowe_uzasadnienie_realizacji"] is False
-        assert fields["budzet"] is False
-        assert fields["czesc_budzetowa_kod"] is False
-        assert fields["rozdzial_kod"] is False
-        assert fields["paragraf_kod"] is False
-        assert fields["zrodlo_finansowania_kod"] is False
-        assert fields["komorka_organizacyjna_id"] is False
+        assert response.status_code == 403
 
-    def test_get_fields_history_status_multiple_updates_same_field(self, client, db_session, test_users):
-        """Test that field shows history status even after multiple updates."""
+        # A version written concurrently (not in the projection yet) takes the next version_number
+        db_session.add(VersionedNumericField(
+            entity_type="rok_budzetowy",
+            entity_id=existing_id,
+            field_name="limit",
+            value=150.0,
+            version_number=2,
+            created_by_user_id=test_users[1].id
+        ))
+        db_session.commit()
+        response = client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": [{**lata[0], "limit": 120.0}]},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 409
+
+    def test_create_rok_budzetowy_existing_year(self, client, db_session, test_users, query_counter):
+        """Test that a year is created only once per planowanie, also next to lata_budzetowe."""
         user = test_users[0]
-        
-        # Create record
-        payload = {
-            "nazwa_projektu": "Original",
+        planowanie_payload = {
+            "nazwa_projektu": "Project",
             "budzet": "2024",
             "czesc_budzetowa_kod": "75",
             "dzial_kod": "750",
@@ -710,55 +1919,39 @@ class TestPlanowanieBudzetuEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        create_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
-            json=payload,
+            json=planowanie_payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        client.put(
+            f"/api/planowanie_budzetu/{planowanie_id}/lata_budzetowe",
+            json={"lata": [{"rok": 2026, "limit": 100.0, "potrzeba": 100.0}]},
             headers={"Authorization": str(user.id)}
         )
-        planowanie_id = create_response.json()["id"]
-
-        # Update the same field multiple times
-        for i in range(5):
-            client.patch(
-                f"/api/planowanie_budzetu/{planowanie_id}",
-                json={"field": "nazwa_projektu", "value": f"Version {i+1}"},
-                headers={"Authorization": str(user.id)}
-            )
 
-        # Get fields history status
-        response = client.get(
-            f"/api/planowanie_budzetu/{planowanie_id}/fields_history_status",
+        query_counter.clear()
+        response = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 50.0, "potrzeba": 50.0},
             headers={"Authorization": str(user.id)}
         )
-        
-        assert response.status_code == 200
-        data = response.json()
-        fields = data["fields"]
-        
-        # Should still show True (has more than 1 version)
-        assert fields["nazwa_projektu"] is True
 
-    def test_get_fields_history_status_nonexistent_record(self, client, test_users):
-        """Test getting fields history status for non-existent record."""
-        user = test_users[0]
-        
-        response = client.get(
-            "/api/planowanie_budzetu/99999/fields_history_status",
+        assert response.status_code == 409
+        # Takes the same lock as lata_budzetowe before looking for the year
+        assert len([q for q in query_counter if q.rstrip().endswith("FOR UPDATE")]) == 1
+        response = client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2027, "limit": 50.0, "potrzeba": 50.0},
             headers={"Authorization": str(user.id)}
         )
-        
-        assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
-
-
-class TestRokBudzetowyEndpoints:
-    """Tests for rok_budzetowy endpoints."""
+        assert response.status_code == 200
+        assert db_session.query(RokBudzetowy).filter_by(planowanie_budzetu_id=planowanie_id).count() == 2
 
-    def test_create_rok_budzetowy(self, client, db_session, test_users):
-        """Test creating a new rok_budzetowy record."""
+    def test_get_rok_budzetowy_as_of(self, client, db_session, test_users):
+        """Test reading rok_budzetowy as it stood at a past moment."""
         user = test_users[0]
         
-        # First create planowanie_budzetu
         planowanie_payload = {
             "nazwa_projektu": "Project",
             "budzet": "2024",
@@ -770,58 +1963,67 @@ class TestRokBudzetowyEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        planowanie_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=planowanie_payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = planowanie_response.json()["id"]
+        ).json()["id"]
 
-        # Create rok_budzetowy
-        payload = {
+        rok_payload = {
             "planowanie_budzetu_id": planowanie_id,
+            "rok": 2026,
             "limit": 50000.00,
             "potrzeba": 75000.00
         }
-        response = client.post(
+        rok_id = client.post(
             "/api/rok_budzetowy",
-            json=payload,
+            json=rok_payload,
+            headers={"Authorization": str(user.id)}
+        ).json()["id"]
+        deadline = datetime.utcnow()
+
+        client.patch(
+            f"/api/rok_budzetowy/{rok_id}",
+            json={"field": "limit", "value": 60000.00},
+            headers={"Authorization": str(user.id)}
+        )
+        client.post(
+            "/api/rok_budzetowy",
+            json={**rok_payload, "rok": 2027},
+            headers={"Authorization": str(user.id)}
+        )
+
+        response = client.get(
+            "/api/rok_budzetowy",
+            params={"as_of": deadline.isoformat(), "sort": "-limit"},
             headers={"Authorization": str(user.id)}
         )
-        
         assert response.status_code == 200
         data = response.json()
-        assert "id" in data
-        
-        rok_id = data["id"]
-
-        # Verify in database
-        rok = db_session.query(RokBudzetowy).filter_by(id=rok_id).first()
-        assert rok is not None
-        assert rok.planowanie_budzetu_id == planowanie_id
+        assert len(data) == 1
+        assert data[0]["id"] == rok_id
+        assert data[0]["rok"] == 2026
+        assert data[0]["limit"] == 50000.00
+        assert data[0]["potrzeba"] == 75000.00
 
-        # Check versioned numeric fields
-        limit_versions = db_session.query(VersionedNumericField).filter_by(
-            entity_type="rok_budzetowy",
-            entity_id=rok_id,
-            field_name="limit"
-        ).all()
-        assert len(limit_versions) == 1
-        assert float(limit_versions[0].value) == 50000.00
+        response = client.get(
+            f"/api/rok_budzetowy/{rok_id}",
+            params={"as_of": deadline.isoformat()},
+            headers={"Authorization": str(user.id)}
+        )
+        assert response.status_code == 200
+        assert response.json()["limit"] == 50000.00
 
-        potrzeba_versions = db_session.query(VersionedNumericField).filter_by(
-            entity_type="rok_budzetowy",
-            entity_id=rok_id,
-            field_name="potrzeba"
-        ).all()
-        assert len(potrzeba_versions) == 1
-        assert float(potrzeba_versions[0].value) == 75000.00
+        response = client.get(
+            "/api/rok_budzetowy",
+            headers={"Authorization": str(user.id)}
+        )
+        assert len(response.json()) == 2
 
-    def test_update_numeric_field(self, client, db_session, test_users):
-        """Test updating a numeric field."""
+    def test_batch_update_rok_budzetowy_cells(self, client, db_session, test_users):
+        """Test updating limit and potrzeba of many years in one request."""
         user = test_users[0]
         
-        # Create planowanie_budzetu and rok_budzetowy
         planowanie_payload = {
             "nazwa_projektu": "Project",
             "budzet": "2024",
@@ -833,48 +2035,41 @@ class TestRokBudzetowyEndpoints:
             "grupa_wydatkow_id": 1,
             "komorka_organizacyjna_id": user.komorka_organizacyjna_id
         }
-        planowanie_response = client.post(
+        planowanie_id = client.post(
             "/api/planowanie_budzetu",
             json=planowanie_payload,
             headers={"Authorization": str(user.id)}
-        )
-        planowanie_id = planowanie_response.json()["id"]
-
-        rok_payload = {
-            "planowanie_budzetu_id": planowanie_id,
-            "limit": 50000.00,
-            "potrzeba": 75000.00
-        }
-        rok_response = client.post(
-            "/api/rok_budzetowy",
-            json=rok_payload,
-            headers={"Authorization": str(user.id)}
-        )
-        rok_id = rok_response.json()["id"]
-
-        # Update limit
-        update_payload = {
-            "field": "limit",
-            "value": 60000.00
-        }
+        ).json()["id"]
+        
+        rok_ids = [
+            client.post(
+                "/api/rok_budzetowy",
+                json={"planowanie_budzetu_id": planowanie_id, "rok": rok, "limit": 100.0, "potrzeba": 200.0},
+                headers={"Authorization": str(user.id)}
+            ).json()["id"]
+            for rok in (2026, 2027)
+        ]
+        
         response = client.patch(
-            f"/api/rok_budzetowy/{rok_id}",
-            json=update_payload,
+            "/api/rok_budzetowy:batch",
+            json={"updates": [
+                {"id": rok_ids[0], "field": "limit", "value": 150.5},
+                {"id": rok_ids[1], "field": "potrzeba", "value": 300},
+                {"id": rok_ids[1], "field": "limit", "value": "abc"},
+            ]},
             headers={"Authorization": str(user.id)}
         )
         
         assert response.status_code == 200
-
-        # Verify versions
-        versions = db_session.query(VersionedNumericField).filter_by(
-            entity_type="rok_budzetowy",
-            entity_id=rok_id,
-            field_name="limit"
-        ).order_by(VersionedNumericField.timestamp).all()
+        assert [r["status"] for r in response.json()["results"]] == ["updated", "updated", "error"]
         
-        assert len(versions) == 2
-        assert float(versions[0].value) == 50000.00
-        assert float(versions[1].value) == 60000.00
+        rows = {
+            row["id"]: row
+            for row in client.get("/api/rok_budzetowy", headers={"Authorization": str(user.id)}).json()
+        }
+        assert rows[rok_ids[0]]["limit"] == 150.5
+        assert rows[rok_ids[1]]["potrzeba"] == 300.0
+        assert rows[rok_ids[1]]["limit"] == 100.0
 
     def test_get_rok_budzetowy_field_history_limit(self, client, db_session, test_users):
         """Test getting history for limit field."""
@@ -1310,3 +2505,161 @@ class TestRokBudzetowyEndpoints:
         
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
+
+
+class TestAdminPlanowanieBudzetuEndpoints:
+    """Tests for the admin planowanie_budzetu endpoint."""
+
+    @pytest.fixture
+    def admin_user(self, db_session, test_users):
+        from src.schemas.users import User
+
+        admin = User(
+            id=0,
+            firstname="Admin",
+            lastname="Ministerstwo",
+            email="admin@test.pl",
+            komorka_organizacyjna_id=2
+        )
+        db_session.add(admin)
+        db_session.commit()
+        db_session.refresh(admin)
+        return admin
+
+    def create_planowanie(self, client, user, nazwa_projektu):
+        payload = {
+            "nazwa_projektu": nazwa_projektu,
+            "budzet": "2024",
+            "czesc_budzetowa_kod": "75",
+            "dzial_kod": "750",
+            "rozdzial_kod": "75011",
+            "paragraf_kod": "4210",
+            "zrodlo_finansowania_kod": "1",
+            "grupa_wydatkow_id": 1,
+            "komorka_organizacyjna_id": user.komorka_organizacyjna_id
+        }
+        response = client.post(
+            "/api/planowanie_budzetu",
+            json=payload,
+            headers={"Authorization": str(user.id)}
+        )
+        return response.json()["id"]
+
+    def test_admin_sees_all_komorki(self, client, db_session, test_users, admin_user):
+        """Test that admin endpoint returns planowania of all komorki."""
+        self.create_planowanie(client, test_users[0], "Komorka 0")
+        self.create_planowanie(client, test_users[2], "Komorka 1")
+
+        response = client.get(
+            "/api/admin/planowanie_budzetu",
+            headers={"Authorization": str(admin_user.id)}
+        )
+
+        assert response.status_code == 200
+        assert [row["nazwa_projektu"] for row in response.json()] == ["Komorka 0", "Komorka 1"]
+
+    def test_admin_response_cached_until_edit(self, client, db_session, test_users, admin_user, query_counter):
+        """Test that a repeated poll costs one query and an edit is seen on the next poll."""
+        planowanie_id = self.create_planowanie(client, test_users[0], "Komorka 0")
+        self.create_planowanie(client, test_users[2], "Komorka 1")
+        headers = {"Authorization": str(admin_user.id)}
+
+        first = client.get("/api/admin/planowanie_budzetu", params={"limit": 1}, headers=headers)
+        query_counter.clear()
+        second = client.get("/api/admin/planowanie_budzetu", params={"limit": 1}, headers=headers)
+
+        assert len(query_counter) == 1
+        assert second.content == first.content
+        assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+        assert second.json()[0]["nazwa_projektu"] == "Komorka 0"
+
+        client.patch(
+            f"/api/planowanie_budzetu/{planowanie_id}",
+            json={"field": "nazwa_projektu", "value": "Renamed"},
+            headers={"Authorization": str(test_users[0].id)}
+        )
+
+        response = client.get("/api/admin/planowanie_budzetu", params={"limit": 1}, headers=headers)
+        assert response.json()[0]["nazwa_projektu"] == "Renamed"
+        response = client.get("/api/admin/planowanie_budzetu", headers=headers)
+        assert [row["nazwa_projektu"] for row in response.json()] == ["Renamed", "Komorka 1"]
+
+    def test_admin_response_refreshed_after_undone_edit(self, client, db_session, test_users, admin_user, monkeypatch):
+        """Test that undoing an edit within the coalescing window is seen on the next poll."""
+        monkeypatch.setattr("src.versioning_utils.VERSION_COALESCE_SECONDS", 60)
+        planowanie_id = self.create_planowanie(client, test_users[0], "Komorka 0")
+        other_id = self.create_planowanie(client, test_users[2], "Komorka 1")
+        headers = {"Authorization": str(admin_user.id)}
+
+        def rename(entity_id, user, value):
+            client.patch(
+                f"/api/planowanie_budzetu/{entity_id}",
+                json={"field": "nazwa_projektu", "value": value},
+                headers={"Authorization": str(user.id)}
+            )
+
+        rename(planowanie_id, test_users[0], "Renamed")
+        rename(other_id, test_users[2], "Other")
+        response = client.get("/api/admin/planowanie_budzetu", headers=headers)
+        assert [row["nazwa_projektu"] for row in response.json()] == ["Renamed", "Other"]
+
+        rename(planowanie_id, test_users[0], "Komorka 0")
+
+        response = client.get("/api/admin/planowanie_budzetu", headers=headers)
+        assert [row["nazwa_projektu"] for row in response.json()] == ["Komorka 0", "Other"]
+
+    def test_admin_endpoint_forbidden_for_other_users(self, client, db_session, test_users, admin_user):
+        """Test that only admin can access the admin endpoint."""
+        response = client.get(
+            "/api/admin/planowanie_budzetu",
+            headers={"Authorization": str(test_users[0].id)}
+        )
+
+        assert response.status_code == 403
+
+    def test_admin_ndjson_stream(self, client, db_session, test_users, admin_user):
+        """Test streaming admin export as NDJSON."""
+        ids = [
+            self.create_planowanie(client, test_users[0], "Komorka 0"),
+            self.create_planowanie(client, test_users[2], "Komorka 1"),
+            self.create_planowanie(client, test_users[0], None),
+        ]
+
+        json_rows = client.get(
+            "/api/admin/planowanie_budzetu",
+            headers={"Authorization": str(admin_user.id)}
+        ).json()
+
+        with client.stream(
+            "GET",
+            "/api/admin/planowanie_budzetu",
+            headers={"Authorization": str(admin_user.id), "Accept": "application/x-ndjson"}
+        ) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            lines = [line for line in response.iter_lines() if line]
+
+        rows = [json.loads(line) for line in lines]
+        assert [row["id"] for row in rows] == ids
+        assert rows == json_rows
+
+    def test_admin_ndjson_stream_include_lata(self, client, db_session, test_users, admin_user):
+        """Test that streamed admin rows embed lata_budzetowe on request."""
+        planowanie_id = self.create_planowanie(client, test_users[0], "With years")
+        client.post(
+            "/api/rok_budzetowy",
+            json={"planowanie_budzetu_id": planowanie_id, "rok": 2026, "limit": 10.0, "potrzeba": 20.0},
+            headers={"Authorization": str(test_users[0].id)}
+        )
+        self.create_planowanie(client, test_users[2], "Without years")
+
+        with client.stream(
+            "GET",
+            "/api/admin/planowanie_budzetu",
+            params={"include": "lata"},
+            headers={"Authorization": str(admin_user.id), "Accept": "application/x-ndjson"}
+        ) as response:
+            rows = [json.loads(line) for line in response.iter_lines() if line]
+
+        assert [len(row["lata_budzetowe"]) for row in rows] == [1, 0]
+        assert rows[0]["lata_budzetowe"][0]["potrzeba"] == 20.0